@@ -0,0 +1,81 @@
+"""Throughput of `ChatShardedDispatcher` by worker count.
+
+The handler simulates the I/O latency of the common flows on a synthetic
+mix of `/start`, buy (MTProto session check) and payment (gateway) updates.
+
+    python -m benchmarks.bench_dispatcher
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+
+from ecommerce.bot.dispatcher import ChatShardedDispatcher, get_update_chat_id
+
+UPDATES = 600
+CHATS = 200
+# (weight, simulated latency in seconds)
+FLOWS = {
+    "start": (70, 0.005),
+    "buy": (20, 0.030),
+    "payment": (10, 0.060),
+}
+
+
+def make_updates():
+    random.seed(7)
+    names = list(FLOWS)
+    weights = [FLOWS[name][0] for name in names]
+    updates = []
+    for update_id in range(UPDATES):
+        chat_id = random.randint(1, CHATS)
+        flow = random.choices(names, weights)[0]
+        if flow == "buy":
+            update = {
+                "update_id": update_id,
+                "callback_query": {"from": {"id": chat_id}, "data": "country-us"},
+            }
+        else:
+            text = "/start" if flow == "start" else "200000"
+            update = {
+                "update_id": update_id,
+                "message": {"from": {"id": chat_id}, "chat": {"id": chat_id}, "text": text},
+            }
+        update["flow"] = flow
+        updates.append(update)
+    return updates
+
+
+def run(workers, updates):
+    processed = defaultdict(list)
+    lock = threading.Lock()
+
+    def handler(update):
+        time.sleep(FLOWS[update["flow"]][1])
+        with lock:
+            processed[get_update_chat_id(update)].append(update["update_id"])
+
+    dispatcher = ChatShardedDispatcher(handler, workers=workers)
+    dispatcher.start()
+    start = time.perf_counter()
+    for update in updates:
+        dispatcher.submit(update)
+    dispatcher.stop()
+    elapsed = time.perf_counter() - start
+
+    in_order = all(ids == sorted(ids) for ids in processed.values())
+    return len(updates) / elapsed, in_order
+
+
+def main():
+    updates = make_updates()
+    print(f"{'workers':>8} {'updates/s':>10} {'speedup':>8} {'per-chat order':>15}")
+    baseline = None
+    for workers in (1, 2, 4, 8, 16, 32):
+        throughput, in_order = run(workers, updates)
+        baseline = baseline or throughput
+        print(f"{workers:>8} {throughput:>10.1f} {throughput / baseline:>7.1f}x {str(in_order):>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Encode/decode time of the stdlib json and orjson on the payloads of the
+hot path: a webhook update, a Bot API `sendMessage` response and the
+`reply_markup` of the keyboards in `fixtures/bot.json`.
+
+    python -m benchmarks.bench_json_codec
+"""
+import json
+import timeit
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ROUNDS = 20000
+
+
+def load_messages():
+    with open("fixtures/bot.json", encoding="utf-8") as fixture:
+        return [
+            row["fields"] for row in json.load(fixture) if row["model"] == "bot.message"
+        ]
+
+
+def generate_keyboards(fields):
+    """Same layout as `BaseHandler.generate_keyboards`, without django."""
+    keys = fields["keys"].replace("\r", "").split("\n")
+    per_row = fields["keys_per_row"]
+    if fields["is_inline_keyboard"]:
+        rows = []
+        for i in range(0, len(keys), per_row):
+            row = []
+            for key in keys[i : i + per_row]:
+                if key.count(":") != 2:
+                    # Template keys, formatted by the handlers.
+                    continue
+                text, callback, url = key.replace("https://", "").split(":")
+                if callback:
+                    row.append({"text": text, "callback_data": callback})
+                else:
+                    row.append({"text": text, "url": "https://" + url})
+            rows.append(row)
+        return {"inline_keyboard": rows}
+    keyboard = [keys[i : i + per_row] for i in range(0, len(keys), per_row)]
+    return {"keyboard": keyboard, "resize_keyboard": True, "one_time_keyboard": True}
+
+
+def make_payloads():
+    messages = load_messages()
+    home = next(fields for fields in messages if fields["current_step"] == "home_page")
+    keyboards = [generate_keyboards(fields) for fields in messages if fields["keys"]]
+    chat = {"id": 111111111, "first_name": "test", "username": "test", "type": "private"}
+    update = {
+        "update_id": 700000001,
+        "message": {
+            "message_id": 1001,
+            "from": dict(chat, is_bot=False, language_code="fa"),
+            "chat": chat,
+            "date": 1718000000,
+            "text": home["keys"].split("\n")[1],
+        },
+    }
+    response = {
+        "ok": True,
+        "result": {
+            "message_id": 1002,
+            "from": {"id": 1, "is_bot": True, "first_name": "bot"},
+            "chat": chat,
+            "date": 1718000001,
+            "text": home["text"],
+            "reply_markup": max(keyboards, key=lambda keys: len(json.dumps(keys))),
+        },
+    }
+    return {
+        "update": json.dumps(update).encode(),
+        "response": json.dumps(response).encode(),
+        "keyboards": keyboards,
+    }
+
+
+def bench(name, func):
+    seconds = timeit.timeit(func, number=ROUNDS)
+    print(f"{name:<32}{seconds / ROUNDS * 1e6:>8.2f} us")
+
+
+def main():
+    payloads = make_payloads()
+    codecs = {"json": (json.loads, json.dumps)}
+    if orjson:
+        codecs["orjson"] = (orjson.loads, orjson.dumps)
+    else:
+        print("orjson is not installed, only the stdlib json is measured.")
+
+    for name, (loads, dumps) in codecs.items():
+        keyboards = payloads["keyboards"]
+        bench(f"{name} loads update", lambda: loads(payloads["update"]))
+        bench(f"{name} loads response", lambda: loads(payloads["response"]))
+        bench(
+            f"{name} dumps {len(keyboards)} keyboards",
+            lambda: [dumps(keys) for keys in keyboards],
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Time to get the serialized `reply_markup` of the keyboards in
+`fixtures/bot.json`: rendered and serialized on every send (the old
+`generate_keyboards` path) against the variants of the message catalog, and
+the `buy_phone_number` country keyboard built against cached.
+
+    python -m benchmarks.bench_keyboards
+"""
+
+import timeit
+
+from benchmarks.django_setup import setup_django
+
+ROUNDS = 2000
+COUNTRIES = 30
+
+
+def bench(name, func, per=1):
+    seconds = timeit.timeit(func, number=ROUNDS)
+    print(f"{name:<36}{seconds / ROUNDS / per * 1e6:>8.2f} us")
+
+
+def create_stock():
+    from ecommerce.product.models import AccountSession, Product
+
+    for i in range(COUNTRIES):
+        product = Product.objects.create(
+            name=f"country {i}", country_code=f"c{i}", price=10000 + i
+        )
+        AccountSession.objects.create(
+            product=product, status=AccountSession.StatusChoices.active
+        )
+
+
+def main():
+    setup_django()
+    create_stock()
+
+    from ecommerce.bot.catalog import message_catalog, render_keyboard
+    from ecommerce.bot.models import Message
+    from ecommerce.telegram.keyboard_cache import country_keyboards
+    from utils import json_codec
+
+    messages = []
+    for msg in Message.objects.exclude(keys=None).exclude(keys=""):
+        try:
+            render_keyboard(msg)
+        except (TypeError, ValueError):
+            # Template keys, formatted by the handlers.
+            continue
+        messages.append(msg)
+    keys = [(msg.current_step, msg.key) for msg in messages]
+
+    def render_each_send():
+        for msg in messages:
+            json_codec.dumps(render_keyboard(msg))
+
+    def catalog_variants():
+        for step, key in keys:
+            for variant in message_catalog.filter(step, key, language="en"):
+                variant.reply_markup_json
+
+    count = len(messages)
+    bench(f"render + dumps ({count} keyboards)", render_each_send, count)
+    bench(f"catalog variant ({count} keyboards)", catalog_variants, count)
+
+    msg = message_catalog.get("buy_phone_number", "en")
+    bench(
+        f"country keyboard build ({COUNTRIES})",
+        lambda: country_keyboards.build(msg).reply_markup_json,
+    )
+    bench(
+        f"country keyboard cached ({COUNTRIES})",
+        lambda: country_keyboards.get(msg).reply_markup_json,
+    )
+
+
+if __name__ == "__main__":
+    main()
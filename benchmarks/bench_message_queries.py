@@ -0,0 +1,62 @@
+"""SQL queries per update on the common keyboard flows, all the queries and
+the ones of the `Message` table.
+
+    python -m benchmarks.bench_message_queries
+"""
+from benchmarks.django_setup import create_users, setup_django, text_update
+
+UPDATES_PER_FLOW = 50
+FLOWS = {
+    "start": "/start",
+    "profile": "👤 پروفایل",
+    "charge": "💰 شارژ حساب",
+    "support": "☎️ پشتیبانی",
+}
+
+
+def run(client, url, user_ids):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    counts = {}
+    update_id = 0
+    for flow, text in FLOWS.items():
+        queries = message_queries = 0
+        for user_id in user_ids:
+            update_id += 1
+            with CaptureQueriesContext(connection) as context:
+                client.post(
+                    url,
+                    text_update(update_id, user_id, text),
+                    content_type="application/json",
+                )
+            queries += len(context.captured_queries)
+            message_queries += sum(
+                '"bot_message"' in query["sql"] for query in context.captured_queries
+            )
+        counts[flow] = (queries / len(user_ids), message_queries / len(user_ids))
+    return counts
+
+
+def main():
+    setup_django()
+
+    from django.test import Client
+    from django.urls import reverse
+
+    from ecommerce.telegram.telegram import Telegram
+    from utils.fake_bot_api import FakeBotAPI
+
+    api = FakeBotAPI().start()
+    Telegram.api_url = api.url
+    user_ids = create_users(UPDATES_PER_FLOW)
+    counts = run(Client(), reverse("bot:webhook"), user_ids)
+    api.stop()
+
+    print(f"{'flow':<10}{'queries':>10}{'message':>10}   per update")
+    for flow, (queries, message_queries) in counts.items():
+        print(f"{flow:<10}{queries:>10.2f}{message_queries:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
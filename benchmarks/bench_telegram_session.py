@@ -0,0 +1,53 @@
+"""Sequential `send_message` calls against the local fake Bot API, with a new
+connection per call (module-level `requests.post`, the previous client) and
+with the pooled keep-alive session of `Telegram`.
+Over the internet every new connection also pays the TLS (and SOCKS5) handshake.
+
+    python -m benchmarks.bench_telegram_session
+"""
+import os
+import time
+
+import django
+
+CALLS = 500
+
+
+def send_without_pool(bot, chat_id, text):
+    """`Telegram.bot` before the pooled session."""
+    import requests
+
+    url = f"{bot.api_url}/bot{bot.token}/sendMessage"
+    data = {"chat_id": chat_id, "text": text, "parse_mode": "html"}
+    return requests.post(url, data=data, timeout=100, headers=bot.headers).json()
+
+
+def run(name, send):
+    started_at = time.perf_counter()
+    for index in range(CALLS):
+        send(111111111, f"message {index}")
+    elapsed = time.perf_counter() - started_at
+    print(f"{name:<12}{CALLS / elapsed:>8.0f} calls/s  {elapsed / CALLS * 1000:.2f} ms/call")
+
+
+def main():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
+
+    from ecommerce.telegram.telegram import Telegram
+    from utils.fake_bot_api import FakeBotAPI
+    from utils.load_env import config
+
+    api = FakeBotAPI().start()
+    Telegram.api_url = api.url
+    bot = Telegram()
+    bot.token = config.TOKEN
+    try:
+        run("no pool", lambda chat_id, text: send_without_pool(bot, chat_id, text))
+        run("session", bot.send_message)
+    finally:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main()
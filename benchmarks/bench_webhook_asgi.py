@@ -0,0 +1,66 @@
+"""Requests/sec of the sync webhook (one WSGI worker, serial requests) and the
+async webhook (one ASGI worker, concurrent requests) on `/start` updates, with
+a fake Bot API that answers after `LATENCY` seconds.
+
+    python -m benchmarks.bench_webhook_asgi
+"""
+import asyncio
+import time
+
+from benchmarks.django_setup import create_users, setup_django, text_update
+
+REQUESTS = 200
+CONCURRENCY = 100
+LATENCY = 0.05
+
+
+def main():
+    setup_django()
+
+    from django.test import AsyncClient, Client
+    from django.urls import reverse
+
+    from ecommerce.telegram.async_telegram import AsyncTelegram
+    from ecommerce.telegram.telegram import Telegram
+    from utils.fake_bot_api import FakeBotAPI
+
+    api = FakeBotAPI(latency=LATENCY).start()
+    Telegram.api_url = api.url
+    AsyncTelegram.api_url = api.url
+    user_ids = create_users(REQUESTS)
+
+    client = Client()
+    url = reverse("bot:webhook")
+    start = time.perf_counter()
+    for update_id, user_id in enumerate(user_ids):
+        client.post(url, text_update(update_id, user_id), content_type="application/json")
+    sync_rps = REQUESTS / (time.perf_counter() - start)
+
+    async def run_async():
+        client = AsyncClient()
+        url = reverse("bot:async-webhook")
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+
+        async def post(update_id, user_id):
+            async with semaphore:
+                await client.post(
+                    url, text_update(update_id, user_id), content_type="application/json"
+                )
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(post(REQUESTS + i, user_id) for i, user_id in enumerate(user_ids))
+        )
+        return REQUESTS / (time.perf_counter() - start)
+
+    async_rps = asyncio.run(run_async())
+    api.stop()
+
+    print(f"bot api latency: {LATENCY * 1000:.0f}ms, requests: {REQUESTS}")
+    print(f"sync webhook  (WSGI, serial):            {sync_rps:8.1f} req/s")
+    print(f"async webhook (ASGI, {CONCURRENCY} in flight):      {async_rps:8.1f} req/s")
+    print(f"sendMessage calls: {len(api.calls_of('sendMessage'))}")
+
+
+if __name__ == "__main__":
+    main()
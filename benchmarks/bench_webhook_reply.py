@@ -0,0 +1,64 @@
+"""Outbound Bot API requests per update on the common keyboard flows, with
+the webhook reply mode off and on (`WEBHOOK_REPLY_MODE`).
+
+    python -m benchmarks.bench_webhook_reply
+"""
+from benchmarks.django_setup import create_users, setup_django, text_update
+
+UPDATES_PER_FLOW = 50
+FLOWS = {
+    "start": "/start",
+    "profile": "👤 پروفایل",
+    "charge": "💰 شارژ حساب",
+    "support": "☎️ پشتیبانی",
+}
+
+
+def run(client, url, user_ids, api, first_update_id):
+    counts = {}
+    update_id = first_update_id
+    for flow, text in FLOWS.items():
+        calls = len(api.calls)
+        for user_id in user_ids:
+            update_id += 1
+            client.post(
+                url, text_update(update_id, user_id, text), content_type="application/json"
+            )
+        counts[flow] = (len(api.calls) - calls) / len(user_ids)
+    return counts
+
+
+def main():
+    setup_django()
+
+    from django.test import Client
+    from django.urls import reverse
+
+    from ecommerce.telegram.telegram import Telegram
+    from utils.fake_bot_api import FakeBotAPI
+    from utils.load_env import config
+
+    api = FakeBotAPI().start()
+    Telegram.api_url = api.url
+    # Separate users per run, the anti-spam middleware limits 10 messages per user.
+    user_ids = create_users(UPDATES_PER_FLOW)
+    reply_user_ids = create_users(UPDATES_PER_FLOW, first_user_id=2_000_000)
+    client = Client()
+    url = reverse("bot:webhook")
+
+    config.WEBHOOK_REPLY_MODE = "off"
+    before = run(client, url, user_ids, api, 0)
+    config.WEBHOOK_REPLY_MODE = "on"
+    after = run(client, url, reply_user_ids, api, 10_000)
+    api.stop()
+
+    print(f"{'flow':<10}{'reply off':>12}{'reply on':>12}   requests per update")
+    for flow in FLOWS:
+        print(f"{flow:<10}{before[flow]:>12.2f}{after[flow]:>12.2f}")
+    total_before = sum(before.values()) / len(FLOWS)
+    total_after = sum(after.values()) / len(FLOWS)
+    print(f"{'mean':<10}{total_before:>12.2f}{total_after:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Set up django with a throw-away test database and local-memory cache for
+the benchmarks that run the real handler chain (requires the `.env.ini`).
+"""
+import os
+
+import django
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
+
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+    settings.ALLOWED_HOSTS = ["*"]
+    settings.DEBUG = False
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    call_command("loaddata", "fixtures/bot.json", verbosity=0)
+
+    # The benchmarks measure the bot, not the outbound Bot API limits.
+    from ecommerce.telegram.rate_limiter import outbound_limiter
+
+    outbound_limiter.enabled = False
+
+
+def create_users(count, language="fa", first_user_id=1_000_000):
+    from ecommerce.account.models import User
+
+    User.objects.bulk_create(
+        User(
+            username=f"user-{user_id}",
+            user_id=user_id,
+            language=language,
+            step="home_page",
+        )
+        for user_id in range(first_user_id, first_user_id + count)
+    )
+    return list(range(first_user_id, first_user_id + count))
+
+
+def text_update(update_id, chat_id, text="/start"):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "from": {"id": chat_id},
+            "chat": {"id": chat_id, "first_name": "bench"},
+            "text": text,
+        },
+    }
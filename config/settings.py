@@ -41,6 +41,7 @@ INSTALLED_APPS += [
 ]
 
 MIDDLEWARE = [
+    "utils.middleware.WebhookSecretTokenMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
@@ -112,6 +113,15 @@ CACHES = {
     }
 }
 
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "ecommerce": {"handlers": ["console"], "level": config.get("LOG_LEVEL", "INFO")},
+    },
+}
+
 from django.utils.translation import gettext_lazy as _
 
 # Languages
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccountConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ecommerce.account'
+
+    def ready(self):
+        # Connect the signals that drop the cached user states.
+        from ecommerce.account import state_cache  # noqa: F401
@@ -0,0 +1,268 @@
+import threading
+import time
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_delete, post_save
+from redis.exceptions import ResponseError
+
+from ecommerce.account.models import User
+from utils.load_env import config as CONFIG
+from utils.metrics import Counter
+from utils.redis_client import get_redis
+
+# The `User` fields of the cached state, read on every update.
+STATE_FIELDS = ("id", "step", "language", "is_active", "is_staff", "balance")
+
+user_state_lookups = Counter(
+    "bot_user_state_cache_total",
+    "User state lookups served by redis (hit) or the DB (miss).",
+)
+user_steps_flushed = Counter(
+    "bot_user_steps_flushed_total", "Step transitions written to the DB in batches."
+)
+
+
+class UserState:
+    """The cached state of a bot user, used by the handlers like the `User`.
+    The `balance` is a snapshot for display, the purchases read and write
+    the DB. The other attributes (`orders`, `username`, ...) load the `User`
+    on first use.
+    """
+
+    def __init__(self, user_id, fields: dict):
+        self._user = None
+        self.user_id = int(user_id)
+        self.set_fields(fields)
+
+    def set_fields(self, fields: dict):
+        self.id = self.pk = int(fields["id"])
+        self.step = fields["step"]
+        # Redis has no None, the users that did not choose a language have "".
+        self.language = fields["language"] or None
+        self.is_active = fields["is_active"] in (True, "1")
+        self.is_staff = fields["is_staff"] in (True, "1")
+        self.balance = int(fields["balance"])
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserState":
+        state = cls(
+            user.user_id, {field: getattr(user, field) for field in STATE_FIELDS}
+        )
+        state._user = user
+        return state
+
+    def get_user(self) -> User:
+        if self._user is None:
+            self._user = User.objects.get(pk=self.id)
+        return self._user
+
+    def __getattr__(self, name):
+        # Only called for the attributes that are not in the state.
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.get_user(), name)
+
+    def refresh_from_db(self):
+        self._user = None
+        self.set_fields(user_states.load(self.user_id))
+
+    async def arefresh_from_db(self):
+        await sync_to_async(self.refresh_from_db)()
+
+
+class UserStateCache:
+    """Cache of the `UserState` of the users in the `bot:user:{user_id}` redis
+    hashes (`USER_STATE_TTL` seconds), so the browsing updates run without
+    queries.
+    The steps are written behind: `set_step` updates the hash and adds the
+    step to `bot:users:dirty`, a thread of the process writes them to the DB
+    every `USER_STATE_FLUSH_INTERVAL` seconds, one query per step, under a
+    redis lock shared by the processes. A state loaded from the DB takes the
+    step that is not flushed yet.
+    The other fields are written to the DB right away and drop the hash.
+    When redis is down the DB is used directly.
+    """
+
+    key = "bot:user:{}"
+    dirty_key = "bot:users:dirty"
+    flushing_key = "bot:users:flushing"
+    lock_key = "bot:users:flush-lock"
+    flush_chunk_size = 500
+
+    def __init__(self, ttl=None, flush_interval=None):
+        self.ttl = int(ttl or CONFIG.get("USER_STATE_TTL", 3600))
+        self.flush_interval = float(
+            flush_interval or CONFIG.get("USER_STATE_FLUSH_INTERVAL", 1)
+        )
+        self.flusher = None
+        self.lock = threading.Lock()
+
+    def get_pending_step(self, user_id) -> Optional[str]:
+        pipeline = get_redis().pipeline(transaction=False)
+        pipeline.hget(self.dirty_key, user_id)
+        pipeline.hget(self.flushing_key, user_id)
+        # The dirty step is newer than the one being flushed.
+        for step in pipeline.execute():
+            if step is not None:
+                return step.decode()
+        return None
+
+    def load(self, user_id) -> Optional[dict]:
+        """Read the state from the DB and cache it, None for the unknown users."""
+        fields = User.objects.filter(user_id=user_id).values(*STATE_FIELDS).first()
+        if fields is None:
+            return None
+
+        try:
+            fields["step"] = self.get_pending_step(user_id) or fields["step"]
+            mapping = {
+                field: int(value) if isinstance(value, bool) else value
+                for field, value in fields.items()
+            }
+            mapping["language"] = fields["language"] or ""
+            pipeline = get_redis().pipeline(transaction=False)
+            pipeline.hset(self.key.format(user_id), mapping=mapping)
+            pipeline.expire(self.key.format(user_id), self.ttl)
+            pipeline.execute()
+        except Exception as error:
+            print("Error in UserStateCache: ", error)
+        return fields
+
+    def get(self, user_id) -> Optional[UserState]:
+        try:
+            cached = get_redis().hgetall(self.key.format(user_id))
+        except Exception as error:
+            print("Error in UserStateCache: ", error)
+            cached = {}
+
+        fields = {key.decode(): value.decode() for key, value in cached.items()}
+        # A hash with missing fields was expired and re-created by `set_step`.
+        if all(field in fields for field in STATE_FIELDS):
+            user_state_lookups.inc(result="hit")
+            return UserState(user_id, fields)
+
+        user_state_lookups.inc(result="miss")
+        fields = self.load(user_id)
+        return UserState(user_id, fields) if fields else None
+
+    async def aget(self, user_id) -> Optional[UserState]:
+        return await sync_to_async(self.get)(user_id)
+
+    def set_step(self, user_id, step):
+        """Write the step to redis, the DB is updated by the next flush."""
+        try:
+            pipeline = get_redis().pipeline(transaction=False)
+            pipeline.hset(self.key.format(user_id), "step", step)
+            pipeline.expire(self.key.format(user_id), self.ttl)
+            pipeline.hset(self.dirty_key, user_id, step)
+            pipeline.execute()
+        except Exception as error:
+            print("Error in UserStateCache: ", error)
+            User.objects.filter(user_id=user_id).update(step=step)
+            return
+        self.start()
+
+    def update(self, user_id, **fields):
+        if "step" in fields:
+            self.set_step(user_id, fields.pop("step"))
+        if fields:
+            User.objects.filter(user_id=user_id).update(**fields)
+            self.invalidate(user_id)
+
+    def invalidate(self, user_id):
+        """Drop the state now and after the commit, the next update reloads it."""
+
+        def delete():
+            try:
+                get_redis().delete(self.key.format(user_id))
+            except Exception as error:
+                print("Error in UserStateCache: ", error)
+
+        delete()
+        transaction.on_commit(delete)
+
+    def flush(self) -> int:
+        """Write the pending steps to the DB, return their count."""
+        redis = get_redis()
+        if not redis.set(self.lock_key, 1, nx=True, ex=60):
+            return 0
+
+        try:
+            # The steps of a crashed flush are written first.
+            if not redis.exists(self.flushing_key):
+                try:
+                    redis.rename(self.dirty_key, self.flushing_key)
+                except ResponseError:
+                    # No pending steps.
+                    return 0
+
+            user_ids_by_step = {}
+            for user_id, step in redis.hgetall(self.flushing_key).items():
+                user_ids_by_step.setdefault(step.decode(), []).append(int(user_id))
+
+            count = 0
+            with transaction.atomic():
+                for step, user_ids in user_ids_by_step.items():
+                    for i in range(0, len(user_ids), self.flush_chunk_size):
+                        chunk = user_ids[i : i + self.flush_chunk_size]
+                        User.objects.filter(user_id__in=chunk).update(step=step)
+                        count += len(chunk)
+            redis.delete(self.flushing_key)
+            user_steps_flushed.inc(count)
+            return count
+        finally:
+            redis.delete(self.lock_key)
+
+    def start(self):
+        """Start the flush thread of the process, once."""
+        if self.flusher is not None:
+            return
+
+        with self.lock:
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._run, daemon=True)
+                self.flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as error:
+                print("Error in UserStateCache: ", error)
+            finally:
+                close_old_connections()
+
+
+user_states = UserStateCache()
+
+
+class CachedUserQuerySet:
+    """The `User.objects.filter(user_id=...)` of the handlers (`user_qs`),
+    its `update(step=...)` goes through the `user_states` cache.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+    def first(self) -> Optional[UserState]:
+        return user_states.get(self.user_id)
+
+    async def afirst(self) -> Optional[UserState]:
+        return await user_states.aget(self.user_id)
+
+    def update(self, **fields):
+        user_states.update(self.user_id, **fields)
+
+    async def aupdate(self, **fields):
+        await sync_to_async(user_states.update)(self.user_id, **fields)
+
+
+def invalidate_user_state(sender, instance, **kwargs):
+    user_states.invalidate(instance.user_id)
+
+
+post_save.connect(invalidate_user_state, sender=User)
+post_delete.connect(invalidate_user_state, sender=User)
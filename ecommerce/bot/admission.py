@@ -0,0 +1,104 @@
+import threading
+import time
+
+from ecommerce.bot.catalog import message_catalog
+from ecommerce.bot.update_queue import get_update_queue
+from ecommerce.telegram.handlers.user_handlers import UserCallbackHandler
+from utils.load_env import config as CONFIG
+from utils.metrics import Counter, Gauge, Histogram
+
+CRITICAL = "critical"
+NORMAL = "normal"
+LOW = "low"
+
+# Keyboard steps that are only browsing, shed first under load.
+LOW_PRIORITY_STEPS = ("home_page", "user_profile")
+# Purchase callbacks (`country-`, `login_code`, ...) are never shed.
+PURCHASE_CALLBACKS = tuple(UserCallbackHandler().callback_handlers)
+
+queue_depth = Gauge("bot_update_queue_depth", "Pending updates in the webhook queue.")
+shed_updates = Counter(
+    "bot_shed_updates_total", "Updates rejected by the admission control."
+)
+update_latency = Histogram(
+    "bot_update_latency_seconds", "Processing time of the updates by class."
+)
+
+
+def get_low_priority_keys() -> set:
+    return {
+        key
+        for key, step in message_catalog.get_key_steps().items()
+        if step in LOW_PRIORITY_STEPS
+    }
+
+
+def classify_update(update: dict) -> str:
+    """Return the class of the update: critical, normal or low (sheddable)."""
+    if callback_query := update.get("callback_query"):
+        data = callback_query.get("data") or ""
+        return CRITICAL if data.startswith(PURCHASE_CALLBACKS) else NORMAL
+
+    text = (update.get("message") or {}).get("text") or ""
+    if "/start" in text:
+        return LOW
+    # The labels of the english users are mapped like `_localize_update_text`.
+    text = message_catalog.localize(text)
+    return LOW if text in get_low_priority_keys() else NORMAL
+
+
+class AdmissionController:
+    """Shed the low priority updates while the update queue is deeper than
+    `LOAD_SHED_QUEUE_DEPTH`, the purchase and other updates keep flowing.
+    The shed updates get the cached `bot-busy-msg` reply as the webhook
+    response (no extra Bot API call), or are dropped if it does not exist.
+    The queue depth is read at most once per `depth_interval` seconds.
+    """
+
+    def __init__(self, max_depth=None, depth_interval=1.0):
+        self.max_depth = int(
+            max_depth if max_depth is not None else CONFIG.get("LOAD_SHED_QUEUE_DEPTH", 1000)
+        )
+        self.depth_interval = depth_interval
+        self.depth = 0
+        self.depth_checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def queue_depth(self) -> int:
+        now = time.monotonic()
+        with self.lock:
+            if now - self.depth_checked_at < self.depth_interval:
+                return self.depth
+            self.depth_checked_at = now
+
+        try:
+            self.depth = get_update_queue().depth()
+        except Exception as error:
+            print("Error in AdmissionController: ", error)
+        queue_depth.set(self.depth)
+        return self.depth
+
+    def busy_reply(self, update: dict):
+        """Return the webhook reply of the shed update, None to drop it."""
+        message = update.get("message") or {}
+        chat_id = message.get("chat", {}).get("id")
+        msgs = message_catalog.filter(current_step="bot-busy-msg")
+        text = msgs[0].text if msgs else ""
+        if not text or not chat_id:
+            return None
+        return {"method": "sendMessage", "chat_id": chat_id, "text": text}
+
+    def admit(self, update: dict):
+        """Return `(admitted, reply)`, the reply is sent as the webhook response."""
+        if not self.max_depth or self.queue_depth() < self.max_depth:
+            return True, None
+
+        if classify_update(update) != LOW:
+            return True, None
+
+        reply = self.busy_reply(update)
+        shed_updates.inc(action="replied" if reply else "dropped")
+        return False, reply
+
+
+admission_controller = AdmissionController()
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class BotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ecommerce.bot'
+
+    def ready(self):
+        # Connect the signals that invalidate the message catalog and the
+        # cached bot status.
+        from ecommerce.bot import services  # noqa: F401
@@ -0,0 +1,268 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+from django.contrib.auth import get_user_model
+
+from ecommerce.bot.catalog import message_catalog
+from ecommerce.bot.services import MessageService
+from ecommerce.telegram.async_telegram import AsyncTelegram, run_sync
+from ecommerce.telegram.rate_limiter import outbound_limiter
+from ecommerce.telegram.telegram import Telegram
+from utils.load_env import config as CONFIG
+from utils.metrics import Counter
+from utils.redis_client import get_redis
+
+User = get_user_model()
+
+# Kind of the broadcast content.
+COPY = "copy"
+TEMPLATE = "template"
+
+# The prefix of the admin post that broadcasts a `Message` template.
+TEMPLATE_PREFIX = "template:"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ABORTED = "aborted"
+STATUS_LABELS = {
+    QUEUED: "در صف ارسال ⏳",
+    RUNNING: "در حال ارسال 🔄",
+    DONE: "ارسال شد ✅",
+    ABORTED: "ارسال متوقف شد ❌",
+}
+
+DELIVERED = "delivered"
+BLOCKED = "blocked"
+FAILED = "failed"
+RESULTS = (DELIVERED, BLOCKED, FAILED)
+
+broadcast_messages = Counter(
+    "bot_broadcast_messages_total", "Broadcast messages sent to the users by result."
+)
+
+
+def get_recipients():
+    """The users that receive the broadcasts: the active users that did not
+    opt out of the ads (`is_send_ads`).
+    """
+    return User.objects.filter(is_active=True, is_send_ads=True)
+
+
+def get_delivery_result(result) -> str:
+    if isinstance(result, dict) and result.get("ok"):
+        return DELIVERED
+    # The user blocked the bot or deleted the account.
+    if isinstance(result, dict) and result.get("error_code") == 403:
+        return BLOCKED
+    return FAILED
+
+
+def get_status_text(broadcast: dict) -> str:
+    msg = message_catalog.get("admin-broadcast-status")
+    status = broadcast.get("status", QUEUED)
+    return msg.text.format(
+        status=STATUS_LABELS.get(status, status),
+        total=broadcast.get("total", 0),
+        delivered=broadcast.get(DELIVERED, 0),
+        blocked=broadcast.get(BLOCKED, 0),
+        failed=broadcast.get(FAILED, 0),
+    )
+
+
+class BroadcastStore:
+    """State of the broadcasts in redis:
+    - `bot:broadcast:{id}`: hash of the content, the status message of the admin,
+      the checkpoint (`cursor`, the last user pk sent) and the result counts.
+    - `bot:broadcasts`: list of the queued broadcast ids.
+    - `bot:broadcasts:running`: the broadcasts taken by the runner, pushed back
+      to the queue by `recover` when the runner is restarted.
+    """
+
+    key = "bot:broadcast:{}"
+
+    def __init__(self, name="bot:broadcasts"):
+        self.redis = get_redis()
+        self.queue_key = name
+        self.running_key = f"{name}:running"
+        self.id_key = f"{name}:id"
+
+    def create(self, **fields) -> int:
+        broadcast_id = self.redis.incr(self.id_key)
+        fields.update(status=QUEUED, cursor=0, **{result: 0 for result in RESULTS})
+        fields = {key: value for key, value in fields.items() if value is not None}
+        pipeline = self.redis.pipeline()
+        pipeline.hset(self.key.format(broadcast_id), mapping=fields)
+        pipeline.lpush(self.queue_key, broadcast_id)
+        pipeline.execute()
+        return broadcast_id
+
+    def get(self, broadcast_id) -> dict:
+        broadcast = self.redis.hgetall(self.key.format(broadcast_id))
+        return {key.decode(): value.decode() for key, value in broadcast.items()}
+
+    def update(self, broadcast_id, **fields):
+        """Save the fields at once, e.g. the cursor and the counts of a checkpoint."""
+        self.redis.hset(self.key.format(broadcast_id), mapping=fields)
+
+    def next(self, timeout: int = 5) -> Optional[int]:
+        """Take the oldest queued broadcast, None after `timeout` seconds."""
+        broadcast_id = self.redis.blmove(
+            self.queue_key, self.running_key, timeout, "RIGHT", "LEFT"
+        )
+        return int(broadcast_id) if broadcast_id is not None else None
+
+    def finish(self, broadcast_id, status=DONE):
+        pipeline = self.redis.pipeline()
+        pipeline.hset(self.key.format(broadcast_id), "status", status)
+        pipeline.lrem(self.running_key, 1, broadcast_id)
+        pipeline.execute()
+
+    def recover(self) -> int:
+        count = 0
+        while self.redis.lmove(self.running_key, self.queue_key, "RIGHT", "RIGHT"):
+            count += 1
+        return count
+
+
+class Broadcaster:
+    """Send a broadcast to all the users.
+    The users are read in keyset paginated batches (`pk > cursor`) of
+    `BROADCAST_BATCH_SIZE`, so only one batch is in memory. The sends of a batch
+    run concurrently on the `AsyncTelegram` pool, paced by the `BROADCAST_RATE`
+    messages per second bucket of the outbound rate limiter, which stays under
+    the global Bot API limit and leaves room for the handlers replies.
+    The cursor and the counts are saved after every batch, a restarted runner
+    resumes from there (the users of an interrupted batch may get it twice).
+    """
+
+    def __init__(self, store=None, batch_size=None, rate=None, status_interval=None):
+        self.store = store or BroadcastStore()
+        self.batch_size = int(batch_size or CONFIG.get("BROADCAST_BATCH_SIZE", 500))
+        self.rate = float(rate or CONFIG.get("BROADCAST_RATE", 25))
+        self.status_interval = float(
+            status_interval or CONFIG.get("BROADCAST_STATUS_INTERVAL", 5)
+        )
+        self.bot = AsyncTelegram()
+
+    def get_batch(self, cursor: int) -> list:
+        return list(
+            get_recipients()
+            .filter(pk__gt=cursor)
+            .order_by("pk")
+            .values_list("pk", "user_id", "language")[: self.batch_size]
+        )
+
+    def get_contents(self, broadcast: dict) -> Optional[dict]:
+        """Render the template once per language, None for the copied posts."""
+        if broadcast.get("kind") != TEMPLATE:
+            return None
+
+        contents = {}
+        for language in User.LanguageChoices.values:
+            msg = MessageService(SimpleNamespace(language=language)).get(
+                broadcast["step"]
+            )
+            contents[language] = (msg.text, msg.reply_markup_json)
+        return contents
+
+    async def send(self, broadcast: dict, contents, user_id, language) -> str:
+        if contents is None:
+            result = await self.bot.copy_message(
+                user_id, broadcast["from_chat_id"], broadcast["message_id"]
+            )
+        else:
+            text, reply_markup = contents.get(language) or contents["fa"]
+            result = await self.bot.send_message(
+                user_id, text, reply_markup=reply_markup
+            )
+        return get_delivery_result(result)
+
+    async def send_batch(self, broadcast: dict, contents, users: list) -> list:
+        tasks = []
+        for _, user_id, language in users:
+            await outbound_limiter.aacquire_bucket("broadcast", self.rate)
+            tasks.append(
+                asyncio.create_task(self.send(broadcast, contents, user_id, language))
+            )
+        return await asyncio.gather(*tasks)
+
+    def report(self, broadcast: dict):
+        """Edit the status message of the admin with the current counts."""
+        if not broadcast.get("status_message_id"):
+            return
+
+        Telegram().edit_message_text(
+            broadcast["admin_chat_id"],
+            broadcast["status_message_id"],
+            get_status_text(broadcast),
+        )
+
+    def run(self, broadcast_id, stop_event=None) -> bool:
+        """Send the broadcast from its checkpoint, return False if stopped before
+        the end (it stays in the running list to be recovered).
+        """
+        broadcast = self.store.get(broadcast_id)
+        if not broadcast or broadcast.get("status") == DONE:
+            self.store.finish(broadcast_id)
+            return True
+
+        broadcast["status"] = RUNNING
+        self.store.update(broadcast_id, status=RUNNING)
+        contents = self.get_contents(broadcast)
+        cursor = int(broadcast.get("cursor") or 0)
+        counts = {result: int(broadcast.get(result) or 0) for result in RESULTS}
+        reported_at = 0
+
+        while users := self.get_batch(cursor):
+            results = run_sync(self.send_batch(broadcast, contents, users))
+            for result in results:
+                counts[result] += 1
+                broadcast_messages.inc(result=result)
+
+            cursor = users[-1][0]
+            self.store.update(broadcast_id, cursor=cursor, **counts)
+            broadcast.update(cursor=cursor, **counts)
+
+            if time.monotonic() - reported_at >= self.status_interval:
+                self.report(broadcast)
+                reported_at = time.monotonic()
+
+            if stop_event is not None and stop_event.is_set():
+                return False
+
+        self.store.finish(broadcast_id)
+        broadcast["status"] = DONE
+        self.report(broadcast)
+        return True
+
+    def abort(self, broadcast_id):
+        """Take the failed broadcast out of the running list and tell the admin,
+        it is not resumed.
+        """
+        self.store.finish(broadcast_id, status=ABORTED)
+        broadcast = self.store.get(broadcast_id)
+        if broadcast.get("status_message_id"):
+            self.report(broadcast)
+        elif broadcast.get("admin_chat_id"):
+            Telegram().send_message(
+                broadcast["admin_chat_id"], get_status_text(broadcast)
+            )
+
+
+def queue_broadcast(bot, admin_chat_id, text, message_id) -> int:
+    """Queue the admin post: a copy of the message, or the `Message` template
+    of the step if the text is `template:<step>`. The admin gets the status
+    message that is edited with the progress.
+    """
+    fields = {"admin_chat_id": admin_chat_id, "total": get_recipients().count()}
+    if text.startswith(TEMPLATE_PREFIX):
+        fields.update(kind=TEMPLATE, step=text[len(TEMPLATE_PREFIX) :].strip())
+    else:
+        fields.update(kind=COPY, from_chat_id=admin_chat_id, message_id=message_id)
+
+    result = bot.send_message(admin_chat_id, get_status_text(fields)) or {}
+    fields["status_message_id"] = (result.get("result") or {}).get("message_id")
+    return BroadcastStore().create(**fields)
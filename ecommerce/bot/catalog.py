@@ -0,0 +1,334 @@
+import asyncio
+import dataclasses
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.translation import gettext, override, trans_real
+
+from ecommerce.bot.models import Message
+from utils import json_codec
+from utils.load_env import config as CONFIG
+from utils.metrics import Counter
+from utils.redis_client import get_redis
+
+# The language of the `Message` table, the other ones come from `locale/`.
+SOURCE_LANGUAGE = "fa"
+
+catalog_loads = Counter(
+    "bot_message_catalog_loads_total", "Loads of the in-process Message catalog."
+)
+
+
+def render_keyboard(msg) -> Optional[dict]:
+    """Return the `reply_markup` of the message keys, None without keys."""
+    if not msg.keys:
+        return None
+
+    keys = msg.fetch_keys
+    if msg.is_inline_keyboard:
+        inline_keyboard = []
+        for i in range(0, len(keys), msg.keys_per_row):
+            inner_keys = []
+            for key in keys[i : i + msg.keys_per_row]:
+                text, callback, url = key.replace("https://", "").split(
+                    ":"
+                )  # TODO: check to see is there problem?
+                if callback:
+                    inner_keys += [{"text": text, "callback_data": callback}]
+                else:
+                    inner_keys += [{"text": text, "url": "https://" + url}]
+            inline_keyboard.append(inner_keys)
+        return {"inline_keyboard": inline_keyboard}
+    else:
+        keyboard = [
+            keys[i : i + msg.keys_per_row]
+            for i in range(0, len(keys), msg.keys_per_row)
+        ]
+        return {
+            "keyboard": keyboard,
+            "resize_keyboard": True,
+            "one_time_keyboard": True,
+        }
+
+
+@dataclasses.dataclass(frozen=True)
+class MessageVariant:
+    """A `Message` translated to one language with its rendered keyboard,
+    also serialized as the `reply_markup` field of the Bot API calls.
+    The variants are shared by all the handlers, `replace` returns a changed
+    copy (e.g. formatted keys) with its keyboard rendered again.
+    """
+
+    pk: int
+    current_step: str
+    key: Optional[str]
+    text: str
+    keys: Optional[str]
+    keys_per_row: Optional[int]
+    is_inline_keyboard: bool
+    language: str
+    reply_markup: Optional[dict] = None
+    reply_markup_json: Optional[str] = None
+
+    @property
+    def fetch_keys(self):
+        return self.keys.split("\n")
+
+    def render(self) -> "MessageVariant":
+        reply_markup = render_keyboard(self)
+        return dataclasses.replace(
+            self,
+            reply_markup=reply_markup,
+            reply_markup_json=json_codec.dumps(reply_markup) if reply_markup else None,
+        )
+
+    def replace(self, **changes) -> "MessageVariant":
+        return dataclasses.replace(self, **changes).render()
+
+
+def translate(text, language):
+    if not text or language == SOURCE_LANGUAGE:
+        return text
+    with override(language):
+        return gettext(text)
+
+
+def build_variant(msg, language) -> MessageVariant:
+    """Build the variant of a `Message`, or of a source language variant."""
+    variant = MessageVariant(
+        pk=msg.pk,
+        current_step=msg.current_step,
+        key=msg.key,
+        text=translate(msg.text, language),
+        keys=translate(msg.keys, language),
+        keys_per_row=msg.keys_per_row,
+        is_inline_keyboard=msg.is_inline_keyboard,
+        language=language,
+    )
+    try:
+        return variant.render()
+    except (TypeError, ValueError) as error:
+        # Malformed keys of one message must not break the catalog.
+        print("Error in MessageCatalog: ", msg.current_step, error)
+        return variant
+
+
+class MessageIndex:
+    """The variants of one language, by step and by (source language) key."""
+
+    def __init__(self, variants):
+        self.variants = variants
+        self.by_step = {}
+        self.by_key = {}
+        for variant in variants:
+            self.by_step.setdefault(variant.current_step, []).append(variant)
+            if variant.key:
+                self.by_key.setdefault(variant.key, []).append(variant)
+        # The step the users are moved to by the key, its last message.
+        self.key_steps = {
+            key: variants[-1].current_step for key, variants in self.by_key.items()
+        }
+
+
+def get_translations(language):
+    """Return the (msgid, msgstr) of the `.mo` catalog of the language."""
+    catalog = getattr(trans_real.translation(language), "_catalog", None) or {}
+    return [
+        (msgid, msgstr)
+        for msgid, msgstr in catalog.items()
+        if isinstance(msgid, str) and msgid and isinstance(msgstr, str)
+    ]
+
+
+def build_labels(keys, languages) -> dict:
+    """Return `{button label: key}` of the keys in every language, from the
+    entries of the `.mo` catalogs that translate a key, or that translate a
+    label to a key, line by line for the entries of a whole keyboard.
+    """
+    labels = {key: key for key in keys}
+    for language in languages:
+        for msgid, msgstr in get_translations(language):
+            source_lines, lines = msgid.split("\n"), msgstr.split("\n")
+            if len(source_lines) != len(lines):
+                continue
+            for source_line, line in zip(source_lines, lines):
+                if source_line in keys:
+                    labels.setdefault(line, source_line)
+                elif line in keys:
+                    labels.setdefault(source_line, line)
+    return labels
+
+
+def on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class MessageCatalog:
+    """In-process copy of the `Message` table (~100 rows, edited only in the
+    django admin), indexed by `current_step` and by `key`, so the handlers
+    look the messages up without queries.
+    The messages are served as immutable `MessageVariant`s, built once per
+    language when the catalog loads: the `LANGUAGES` of the settings right
+    away, the other ones on their first lookup. The button labels of the
+    `LANGUAGES` are mapped back to their key, see `localize`.
+    A save or delete of a `Message` bumps the `bot:messages:version` redis key,
+    every process compares it with its loaded version at most once every
+    `MESSAGE_CATALOG_CHECK_INTERVAL` seconds and reloads when it changed.
+    The async code checks it with `MessageService.arefresh`, the lookups on
+    the event loop use the loaded catalog and never query.
+    """
+
+    version_key = "bot:messages:version"
+
+    def __init__(self, check_interval=None):
+        self.check_interval = float(
+            check_interval or CONFIG.get("MESSAGE_CATALOG_CHECK_INTERVAL", 1)
+        )
+        # {language: MessageIndex}, replaced as a whole on every load.
+        self.indexes = {}
+        self.labels = {}
+        self.version = None
+        self.checked_at = 0
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def get_version(self):
+        try:
+            return int(get_redis().get(self.version_key) or 0)
+        except Exception as error:
+            print("Error in MessageCatalog: ", error)
+            return None
+
+    def load(self, version=None):
+        messages = list(Message.objects.order_by("pk"))
+        languages = {SOURCE_LANGUAGE, *dict(settings.LANGUAGES)}
+        indexes = {
+            language: MessageIndex([build_variant(msg, language) for msg in messages])
+            for language in languages
+        }
+
+        self.labels = build_labels(indexes[SOURCE_LANGUAGE].by_key, languages)
+        self.indexes = indexes
+        self.version = version
+        self.loaded = True
+        catalog_loads.inc()
+
+    def needs_check(self) -> bool:
+        return (
+            not self.loaded or time.monotonic() - self.checked_at >= self.check_interval
+        )
+
+    def refresh(self):
+        """Load the catalog on first use or when its version changed."""
+        if not self.needs_check():
+            return
+        # Checked by `arefresh` outside of the loop, the next one reloads it.
+        if self.loaded and on_event_loop():
+            return
+
+        with self.lock:
+            if not self.needs_check():
+                return
+
+            version = self.get_version()
+            # Redis is down: keep the loaded catalog.
+            if not self.loaded or (version is not None and version != self.version):
+                self.load(version)
+            self.checked_at = time.monotonic()
+
+    def clear(self):
+        """Reload the catalog on the next lookup of this process."""
+        self.loaded = False
+
+    def invalidate(self):
+        """Reload the catalog in this process now and in the others after the commit."""
+        self.clear()
+
+        def bump_version():
+            try:
+                get_redis().incr(self.version_key)
+            except Exception as error:
+                print("Error in MessageCatalog: ", error)
+
+        transaction.on_commit(bump_version)
+
+    def get_index(self, language=None) -> MessageIndex:
+        self.refresh()
+        indexes = self.indexes
+        # The users that did not choose a language see the source messages.
+        language = language or SOURCE_LANGUAGE
+        index = indexes.get(language)
+        if index is None:
+            variants = [
+                build_variant(variant, language)
+                for variant in indexes[SOURCE_LANGUAGE].variants
+            ]
+            index = indexes.setdefault(language, MessageIndex(variants))
+        return index
+
+    def get(self, step, language=None) -> MessageVariant:
+        """Return the message of the step, raise like `Message.objects.get`."""
+        variants = self.get_index(language).by_step.get(step, [])
+        if not variants:
+            raise Message.DoesNotExist(
+                f"Message matching step {step!r} does not exist."
+            )
+        if len(variants) > 1:
+            raise Message.MultipleObjectsReturned(
+                f"get() returned more than one Message -- it returned {len(variants)}!"
+            )
+        return variants[0]
+
+    def filter(self, current_step=None, key=None, language=None) -> list:
+        """Return the messages of the step and/or key, ordered by pk."""
+        index = self.get_index(language)
+        if key is not None:
+            variants = index.by_key.get(key, [])
+            if current_step is not None:
+                variants = [
+                    variant
+                    for variant in variants
+                    if variant.current_step == current_step
+                ]
+        elif current_step is not None:
+            variants = index.by_step.get(current_step, [])
+        else:
+            variants = index.variants
+        return list(variants)
+
+    def exists(self, step) -> bool:
+        return step in self.get_index().by_step
+
+    def localize(self, text):
+        """Return the key of a button label of any language, else the text."""
+        self.refresh()
+        if not isinstance(text, str):
+            return text
+        return self.labels.get(text, text)
+
+    def get_step(self, key):
+        """Return the step of the keyboard key, None if it is not a key."""
+        variants = self.get_index().by_key.get(self.localize(key))
+        return variants[0].current_step if variants else None
+
+    def get_key_steps(self) -> dict:
+        return self.get_index().key_steps
+
+
+message_catalog = MessageCatalog()
+
+
+def invalidate_message_catalog(sender, **kwargs):
+    message_catalog.invalidate()
+
+
+post_save.connect(invalidate_message_catalog, sender=Message)
+post_delete.connect(invalidate_message_catalog, sender=Message)
@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from utils.load_env import config as CONFIG
+from utils.metrics import Counter
+
+duplicate_updates = Counter(
+    "bot_duplicate_updates_total", "Re-delivered telegram updates dropped by update_id."
+)
+
+
+class UpdateDeduplicator:
+    """Drop the updates that telegram re-delivers when the webhook is slow.
+    The `update_id` is claimed with redis SETNX (`cache.add`) and a TTL, when
+    redis is down a bounded local LRU of the recent update ids is used instead.
+    The claim is released when the update could not be accepted, so the
+    re-delivery of telegram is processed.
+    """
+
+    key = "bot:update:{}"
+
+    def __init__(self, ttl=None, local_size=10000):
+        self.ttl = int(ttl or CONFIG.get("UPDATE_DEDUP_TTL", 3600))
+        self.local_size = local_size
+        self.local_ids = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _claim_local(self, update_id) -> bool:
+        with self.lock:
+            if update_id in self.local_ids:
+                self.local_ids.move_to_end(update_id)
+                return False
+
+            self.local_ids[update_id] = True
+            if len(self.local_ids) > self.local_size:
+                self.local_ids.popitem(last=False)
+            return True
+
+    def is_duplicate(self, update_id) -> bool:
+        """Claim the `update_id` and return True if it was processed before."""
+        if update_id is None:
+            return False
+
+        try:
+            claimed = cache.add(self.key.format(update_id), 1, timeout=self.ttl)
+        except Exception:
+            claimed = self._claim_local(update_id)
+
+        if not claimed:
+            duplicate_updates.inc()
+        return not claimed
+
+    async def ais_duplicate(self, update_id) -> bool:
+        if update_id is None:
+            return False
+
+        try:
+            claimed = await cache.aadd(self.key.format(update_id), 1, timeout=self.ttl)
+        except Exception:
+            claimed = self._claim_local(update_id)
+
+        if not claimed:
+            duplicate_updates.inc()
+        return not claimed
+
+    def _release_local(self, update_id):
+        with self.lock:
+            self.local_ids.pop(update_id, None)
+
+    def release(self, update_id):
+        """Forget the `update_id`, its next delivery is not a duplicate."""
+        if update_id is None:
+            return
+
+        self._release_local(update_id)
+        try:
+            cache.delete(self.key.format(update_id))
+        except Exception as error:
+            print("Error in UpdateDeduplicator: ", error)
+
+    async def arelease(self, update_id):
+        if update_id is None:
+            return
+
+        self._release_local(update_id)
+        try:
+            await cache.adelete(self.key.format(update_id))
+        except Exception as error:
+            print("Error in UpdateDeduplicator: ", error)
+
+
+update_deduplicator = UpdateDeduplicator()
@@ -0,0 +1,70 @@
+import queue
+import threading
+import traceback
+from typing import Callable, Optional
+
+_STOP = object()
+
+
+def get_update_chat_id(update: dict) -> Optional[int]:
+    """Return the id of the user who sent the update.
+    The handlers store the state (`User.step`) per user, so the updates of a
+    user must be processed in the same shard.
+    """
+    if message := update.get("message"):
+        return message.get("from", {}).get("id") or message.get("chat", {}).get("id")
+
+    if callback_query := update.get("callback_query"):
+        return callback_query.get("from", {}).get("id")
+
+    return None
+
+
+class ChatShardedDispatcher:
+    """Dispatch the updates to `workers` threads, sharded by the chat id.
+    Every shard has its own FIFO queue and a single thread, so the updates of one
+    chat are processed strictly in order while different chats run in parallel.
+    """
+
+    def __init__(self, handler: Callable[[dict], object], workers=4, max_pending=100):
+        self.handler = handler
+        self.queues = [queue.Queue(maxsize=max_pending) for _ in range(workers)]
+        self.threads = []
+
+    def start(self):
+        for shard_queue in self.queues:
+            thread = threading.Thread(target=self._run, args=(shard_queue,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, update: dict, on_done: Optional[Callable[[], None]] = None):
+        """Put the update in the chat shard queue, blocks while the shard is full.
+        `on_done` is called after the update is processed (e.g. queue ack).
+        """
+        chat_id = get_update_chat_id(update) or 0
+        shard_queue = self.queues[hash(chat_id) % len(self.queues)]
+        shard_queue.put((update, on_done))
+
+    def stop(self, wait=True):
+        """Process the remaining updates and stop the workers."""
+        for shard_queue in self.queues:
+            shard_queue.put(_STOP)
+        if wait:
+            for thread in self.threads:
+                thread.join()
+        self.threads = []
+
+    def _run(self, shard_queue: queue.Queue):
+        while True:
+            item = shard_queue.get()
+            if item is _STOP:
+                return
+
+            update, on_done = item
+            try:
+                self.handler(update)
+            except Exception:
+                print(traceback.format_exc().strip())
+            finally:
+                if on_done:
+                    on_done()
@@ -0,0 +1,70 @@
+from ecommerce.account.state_cache import user_states
+from ecommerce.bot.catalog import message_catalog
+from ecommerce.bot.dispatcher import get_update_chat_id
+from ecommerce.bot.update_queue import ADMIN, BROWSING, LANES, PURCHASE
+from ecommerce.telegram.handlers.admin_handlers import (
+    AdminCallbackHandler,
+    AdminStepHandler,
+)
+from ecommerce.telegram.handlers.user_handlers import (
+    UserCallbackHandler,
+    UserInputHandler,
+)
+
+PURCHASE_CALLBACKS = tuple(UserCallbackHandler().callback_handlers)
+ADMIN_CALLBACKS = tuple(AdminCallbackHandler().callback_handlers)
+PAYMENT_STEPS = frozenset(UserInputHandler().steps)
+ADMIN_STEPS = frozenset(AdminStepHandler().steps)
+
+
+def step_lane(step) -> str:
+    if step in PAYMENT_STEPS:
+        return PURCHASE
+    if step in ADMIN_STEPS or (step or "").startswith("admin"):
+        return ADMIN
+    return BROWSING
+
+
+def classify_lane(update: dict) -> str:
+    """Return the lane of the update:
+    - purchase: the `UserCallbackHandler` callbacks and the inputs of the
+      payment steps (`UserInputHandler.steps`).
+    - admin: the `AdminCallbackHandler` callbacks and the admin steps.
+    - browsing: `/start`, the keyboards and the rest.
+    The queue keeps a chat in the lane of its oldest pending update, so the
+    step of the user is only used when its previous updates are processed.
+    """
+    if callback_query := update.get("callback_query"):
+        data = callback_query.get("data") or ""
+        if data.startswith(PURCHASE_CALLBACKS):
+            return PURCHASE
+        if data.startswith(ADMIN_CALLBACKS):
+            return ADMIN
+        return BROWSING
+
+    message = update.get("message") or {}
+    text = message.get("text") or ""
+    if "/start" in text:
+        return BROWSING
+
+    # The labels of the english users are mapped like `_localize_update_text`.
+    key_step = message_catalog.get_key_steps().get(message_catalog.localize(text))
+    if key_step:
+        return step_lane(key_step)
+
+    # Free text (amounts, evouchers, session files) depends on the user step.
+    user_id = message.get("from", {}).get("id") or message.get("chat", {}).get("id")
+    user_state = user_states.get(user_id)
+    return step_lane(user_state.step if user_state else None)
+
+
+def order_by_lane(updates: list) -> list:
+    """Order the updates by the lane of the oldest update of their chat, the
+    updates of one chat keep their order.
+    """
+    priorities = {}
+    for update in updates:
+        chat_id = get_update_chat_id(update)
+        if chat_id not in priorities:
+            priorities[chat_id] = LANES.index(classify_lane(update))
+    return sorted(updates, key=lambda update: priorities[get_update_chat_id(update)])
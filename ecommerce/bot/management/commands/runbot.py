@@ -0,0 +1,60 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ecommerce.bot.dispatcher import ChatShardedDispatcher
+from ecommerce.bot.polling import PollingRunner
+from ecommerce.bot.workers import process_update
+from ecommerce.telegram.telegram import Telegram
+from utils.load_env import config as CONFIG
+
+
+class Command(BaseCommand):
+    help = "Run the bot with long polling (getUpdates) instead of the webhook."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--polling", action="store_true", help="Receive updates with getUpdates."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=int(CONFIG.get("POLLING_BATCH_SIZE", 100)),
+            help="Number of updates per getUpdates call (1-100).",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=int,
+            default=int(CONFIG.get("POLLING_TIMEOUT", 30)),
+            help="Long polling timeout in seconds.",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Number of worker threads."
+        )
+
+    def handle(self, *args, **options):
+        if not options["polling"]:
+            raise CommandError("Only the --polling mode is supported.")
+
+        stop_event = threading.Event()
+        signal.signal(signal.SIGINT, lambda *args: stop_event.set())
+        signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+
+        bot = Telegram()
+        # getUpdates doesn't work while a webhook is set.
+        bot.delete_webhook()
+
+        dispatcher = ChatShardedDispatcher(process_update, workers=options["workers"])
+        dispatcher.start()
+        runner = PollingRunner(
+            bot,
+            dispatcher,
+            batch_size=min(max(options["batch_size"], 1), 100),
+            timeout=options["timeout"],
+        )
+        self.stdout.write(f"Polling started with {options['workers']} workers")
+        runner.run(stop_event)
+
+        dispatcher.stop()
+        self.stdout.write("Polling stopped")
@@ -0,0 +1,61 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from ecommerce.bot.broadcast import Broadcaster
+
+
+class Command(BaseCommand):
+    help = "Send the broadcasts queued by the admins, one at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Users read and sent per checkpoint (BROADCAST_BATCH_SIZE).",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=None,
+            help="Broadcast messages per second (BROADCAST_RATE).",
+        )
+
+    def handle(self, *args, **options):
+        self.stop_event = threading.Event()
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        broadcaster = Broadcaster(batch_size=options["batch_size"], rate=options["rate"])
+        # Only one runner must run, the broadcasts it was sending are resumed.
+        if recovered := broadcaster.store.recover():
+            self.stdout.write(f"Resuming {recovered} interrupted broadcasts")
+
+        while not self.stop_event.is_set():
+            broadcast_id = broadcaster.store.next(timeout=1)
+            if broadcast_id is None:
+                continue
+
+            self.stdout.write(f"Sending broadcast {broadcast_id}")
+            try:
+                if broadcaster.run(broadcast_id, self.stop_event):
+                    self.stdout.write(f"Broadcast {broadcast_id} finished")
+            except Exception as error:
+                print("Error in runbroadcasts: ", error)
+                self.abort(broadcaster, broadcast_id)
+
+        self.stdout.write("Broadcasts stopped")
+
+    def abort(self, broadcaster, broadcast_id):
+        try:
+            broadcaster.abort(broadcast_id)
+        except Exception as error:
+            # Kept in the running list, resumed on the next start.
+            print("Error in runbroadcasts: ", error)
+        else:
+            self.stderr.write(f"Broadcast {broadcast_id} aborted")
+
+    def stop(self, *args):
+        self.stop_event.set()
@@ -0,0 +1,94 @@
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ecommerce.bot.dispatcher import ChatShardedDispatcher
+from ecommerce.bot.update_queue import get_update_queue
+from ecommerce.bot.workers import process_update
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the worker pool that drains the webhook update queue. The updates "
+        "of a chat are processed strictly in order only with a single worker "
+        "process, every process needs its own --consumer."
+    )
+    # Seconds of the consumer lease, renewed while the workers run.
+    consumer_ttl = 30
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Number of worker threads."
+        )
+        parser.add_argument(
+            "--consumer",
+            default="default",
+            help=(
+                "Consumer name, owned by one process at a time. The un-acked "
+                "updates of the same consumer are recovered on start."
+            ),
+        )
+        parser.add_argument(
+            "--max-pending",
+            type=int,
+            default=10,
+            help="Updates buffered per worker, the rest wait in the queue lanes.",
+        )
+
+    def handle(self, *args, **options):
+        self.stop_event = threading.Event()
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        update_queue = get_update_queue(consumer=options["consumer"])
+        owner = f"{socket.gethostname()}:{os.getpid()}"
+        # The in-flight updates of a running process must not be recovered.
+        if not update_queue.acquire_consumer(owner, self.consumer_ttl):
+            raise CommandError(
+                f"The consumer {options['consumer']!r} is used by a running "
+                "process, start this one with another --consumer."
+            )
+        if recovered := update_queue.recover():
+            self.stdout.write(f"Recovered {recovered} un-acked updates")
+
+        # Updates of a chat are processed in order, different chats in parallel.
+        dispatcher = ChatShardedDispatcher(
+            process_update,
+            workers=options["workers"],
+            max_pending=options["max_pending"],
+        )
+        dispatcher.start()
+        self.stdout.write(f"Started {options['workers']} workers")
+
+        threading.Thread(
+            target=self.renew_consumer, args=(update_queue, owner), daemon=True
+        ).start()
+        while not self.stop_event.is_set():
+            item = update_queue.get(timeout=1)
+            if item is None:
+                continue
+
+            token, update = item
+            dispatcher.submit(update, on_done=lambda token=token: update_queue.ack(token))
+
+        dispatcher.stop()
+        update_queue.release_consumer(owner)
+        self.stdout.write("Workers stopped")
+
+    def renew_consumer(self, update_queue, owner):
+        while not self.stop_event.wait(self.consumer_ttl / 3):
+            try:
+                renewed = update_queue.acquire_consumer(owner, self.consumer_ttl)
+            except Exception as error:
+                # Redis is down, the next renewal retries before the lease expires.
+                print("Error in runworkers: ", error)
+                continue
+            if not renewed:
+                self.stderr.write("Lost the consumer lease, stopping")
+                self.stop_event.set()
+
+    def stop(self, *args):
+        self.stop_event.set()
@@ -0,0 +1,56 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from ecommerce.telegram.telegram import Telegram
+from utils.load_env import config as CONFIG
+
+
+class Command(BaseCommand):
+    help = "Register the bot webhook url with the WEBHOOK_SECRET_TOKEN."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url", help="Webhook url, defaults to BASE_SITE_URL + bot/webhook/."
+        )
+        parser.add_argument(
+            "--async",
+            action="store_true",
+            dest="use_async",
+            help="Register the async (ASGI) webhook url.",
+        )
+        parser.add_argument(
+            "--max-connections",
+            type=int,
+            default=40,
+            help="Max simultaneous connections of telegram to the webhook (1-100).",
+        )
+        parser.add_argument(
+            "--drop-pending-updates",
+            action="store_true",
+            help="Drop the updates that are waiting to be delivered.",
+        )
+
+    def handle(self, *args, **options):
+        secret_token = CONFIG.get("WEBHOOK_SECRET_TOKEN", "")
+        if not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", secret_token):
+            raise CommandError(
+                "WEBHOOK_SECRET_TOKEN must be 1-256 characters of A-Z, a-z, 0-9, _ and -"
+            )
+
+        url = options["url"]
+        if not url:
+            path = reverse("bot:async-webhook" if options["use_async"] else "bot:webhook")
+            url = f"{CONFIG.BASE_SITE_URL.rstrip('/')}{path}"
+
+        result = Telegram().set_webhook(
+            url,
+            secret_token=secret_token,
+            max_connections=options["max_connections"],
+            allowed_updates=["message", "callback_query", "chat_member"],
+            drop_pending_updates=options["drop_pending_updates"],
+        )
+        if not result or not result.get("ok"):
+            raise CommandError(f"setWebhook failed: {result}")
+        self.stdout.write(self.style.SUCCESS(f"Webhook registered: {url}"))
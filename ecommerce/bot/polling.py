@@ -0,0 +1,60 @@
+import time
+
+from ecommerce.bot.deduplication import update_deduplicator
+from ecommerce.bot.dispatcher import ChatShardedDispatcher
+from ecommerce.bot.lanes import order_by_lane
+from ecommerce.telegram.telegram import Telegram
+
+
+class PollingRunner:
+    """Fetch the updates with `getUpdates` in batches and feed them to the
+    dispatcher, the alternative of the webhook for the private-network nodes.
+    The offset is advanced after every batch, so telegram confirms the fetched
+    updates on the next call.
+    """
+
+    allowed_updates = ["message", "callback_query", "chat_member"]
+
+    def __init__(
+        self,
+        bot: Telegram,
+        dispatcher: ChatShardedDispatcher,
+        batch_size=100,
+        timeout=30,
+        retry_delay=3,
+    ):
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.offset = None
+
+    def poll_once(self) -> int:
+        """Fetch and dispatch one batch, return the number of fetched updates."""
+        updates = self.bot.get_updates(
+            offset=self.offset,
+            limit=self.batch_size,
+            timeout=self.timeout,
+            allowed_updates=self.allowed_updates,
+        )
+        if updates is None:
+            # Network or api error, retry after a delay.
+            time.sleep(self.retry_delay)
+            return 0
+
+        if updates:
+            self.offset = updates[-1]["update_id"] + 1
+        new_updates = [
+            update
+            for update in updates
+            if not update_deduplicator.is_duplicate(update["update_id"])
+        ]
+        # Dispatch the chats of the purchase and admin updates of the batch first.
+        for update in order_by_lane(new_updates):
+            self.dispatcher.submit(update)
+        return len(updates)
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            self.poll_once()
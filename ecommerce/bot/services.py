@@ -1,50 +1,78 @@
-from django.utils.translation import gettext, override
+from typing import Optional
 
-from ecommerce.bot.models import Message
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models.signals import post_save
+
+from ecommerce.bot.catalog import MessageVariant, message_catalog
+from ecommerce.bot.models import BotUpdateStatus
 
 
 class MessageService:
+    """Look up the messages of the user language in the `message_catalog`."""
+
     def __init__(self, user) -> None:
         self.user = user
 
-    def transalte(self, msg):
-        if self.user.language != "fa":
-            with override(self.user.language):
-                if keys := msg.keys:
-                    msg.keys = gettext(keys)
-                if text := msg.text:
-                    msg.text = gettext(text)
+    @staticmethod
+    async def arefresh():
+        # The catalog is loaded or checked outside of the event loop.
+        if message_catalog.needs_check():
+            await sync_to_async(message_catalog.refresh)()
 
-        return msg
+    def get(self, step) -> MessageVariant:
+        return message_catalog.get(step, self.user.language)
 
-    def get(self, step) -> Message:
-        msg = Message.objects.get(current_step=step)
-        msg = self.transalte(msg)
-        return msg
+    async def aget(self, step) -> MessageVariant:
+        await self.arefresh()
+        return self.get(step)
 
     def filter_user_msgs(self, **kwargs) -> list:
-        msgs = Message.objects.filter(**kwargs).exclude(
-            current_step__startswith="admin"
-        )
-        translated_msgs = []
-        for msg in msgs:
-            translated_msgs.append(self.transalte(msg))
+        msgs = message_catalog.filter(language=self.user.language, **kwargs)
+        return [msg for msg in msgs if not msg.current_step.startswith("admin")]
 
-        return translated_msgs
+    async def afilter_user_msgs(self, **kwargs) -> list:
+        await self.arefresh()
+        return self.filter_user_msgs(**kwargs)
 
     def filter_admin_msgs(self, **kwargs) -> list:
-        msgs = Message.objects.filter(current_step__startswith="admin", **kwargs)
-        translated_msgs = []
-        for msg in msgs:
-            translated_msgs.append(self.transalte(msg))
-
-        return translated_msgs
+        msgs = message_catalog.filter(language=self.user.language, **kwargs)
+        return [msg for msg in msgs if msg.current_step.startswith("admin")]
 
     @staticmethod
     def get_step(key) -> str:
-        step = (
-            Message.objects.filter(key=key)
-            .values_list("current_step", flat=True)
-            .first()
-        )
-        return step
+        return message_catalog.get_step(key)
+
+    @staticmethod
+    async def aget_step(key) -> str:
+        await MessageService.arefresh()
+        return message_catalog.get_step(key)
+
+
+class BotStatusService:
+    """The update mode of the bot (`BotUpdateStatus`), checked on every update
+    of the non-staff users, cached until it is changed.
+    """
+
+    key = "bot:update-status"
+
+    def get(self) -> Optional[BotUpdateStatus]:
+        status = cache.get(self.key)
+        if status is None:
+            # False caches a missing row.
+            status = BotUpdateStatus.objects.first() or False
+            cache.set(self.key, status, timeout=300)
+        return status or None
+
+    async def aget(self) -> Optional[BotUpdateStatus]:
+        return await sync_to_async(self.get)()
+
+    def invalidate(self):
+        cache.delete(self.key)
+
+
+def invalidate_bot_status(sender, **kwargs):
+    BotStatusService().invalidate()
+
+
+post_save.connect(invalidate_bot_status, sender=BotUpdateStatus)
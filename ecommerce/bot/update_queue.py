@@ -0,0 +1,302 @@
+import threading
+from collections import deque
+from typing import Optional, Tuple
+
+from ecommerce.bot.dispatcher import get_update_chat_id
+from utils import json_codec
+from utils.load_env import config as CONFIG
+from utils.redis_client import get_redis
+
+Token = bytes | int
+QueueItem = Tuple[Token, dict]
+
+# Lanes in the order of priority, see `ecommerce.bot.lanes.classify_lane`.
+PURCHASE = "purchase"
+ADMIN = "admin"
+BROWSING = "browsing"
+LANES = (PURCHASE, ADMIN, BROWSING)
+
+# KEYS: the chat lanes hash, the chat pending counts hash, the signal list,
+# then the lane lists in the order of `LANES`.
+# ARGV: the chat id ("" for none), the lane index (1-based), the update and
+# the signals bound. A chat with pending updates keeps the lane of the oldest.
+PUT_SCRIPT = """
+local index = tonumber(ARGV[2])
+if ARGV[1] ~= '' then
+    index = tonumber(redis.call('HGET', KEYS[1], ARGV[1])) or index
+    redis.call('HSET', KEYS[1], ARGV[1], index)
+    redis.call('HINCRBY', KEYS[2], ARGV[1], 1)
+end
+redis.call('LPUSH', KEYS[3 + index], ARGV[3])
+redis.call('LPUSH', KEYS[3], 1)
+redis.call('LTRIM', KEYS[3], 0, tonumber(ARGV[4]) - 1)
+return index
+"""
+
+# KEYS: the chat lanes and pending counts hashes. ARGV: the chat id.
+# Unpin the chat after its last pending update.
+DONE_SCRIPT = """
+if redis.call('HINCRBY', KEYS[2], ARGV[1], -1) <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('HDEL', KEYS[2], ARGV[1])
+end
+"""
+
+
+def get_lane_weights() -> dict:
+    """Parse `UPDATE_LANE_WEIGHTS` e.g. `purchase:6,admin:3,browsing:1`."""
+    weights = {PURCHASE: 6, ADMIN: 3, BROWSING: 1}
+    for item in CONFIG.get("UPDATE_LANE_WEIGHTS", "").split(","):
+        lane, _, weight = item.partition(":")
+        if lane.strip() in weights and weight.strip().isdigit():
+            weights[lane.strip()] = int(weight)
+    return weights
+
+
+class WeightedLaneScheduler:
+    """Smooth weighted round robin over the lanes.
+    `order` returns the lanes to try for the next update: the lane picked by
+    weight first, then the others by priority, so no worker idles while any
+    lane has updates and a backlogged lane gets its share of the workers.
+    """
+
+    def __init__(self, weights: Optional[dict] = None):
+        weights = weights or get_lane_weights()
+        self.weights = {lane: weights[lane] for lane in LANES if weights.get(lane)}
+        self.total = sum(self.weights.values())
+        self.current = dict.fromkeys(self.weights, 0)
+        self.lock = threading.Lock()
+
+    def order(self) -> list:
+        with self.lock:
+            for lane, weight in self.weights.items():
+                self.current[lane] += weight
+            picked = max(self.current, key=self.current.get)
+            self.current[picked] -= self.total
+        return [picked] + [lane for lane in LANES if lane != picked]
+
+
+class BaseUpdateQueue:
+    """The webhook puts the raw telegram updates in the queue and the
+    workers (`manage.py runworkers`) drain it through the handler chain.
+    Every item returned from `get` must be `ack`-ed after processing.
+    The updates are FIFO per lane, the lanes are drained by weight. A chat
+    is pinned to the lane of its oldest update until all its updates are
+    acked, so the updates of one chat are never reordered. The chat is
+    processed strictly in order only by a single worker process, the
+    processes of the other consumers may take its next update meanwhile.
+    """
+
+    def put(self, update: dict, lane: str = BROWSING) -> None:
+        raise NotImplementedError
+
+    def get(self, timeout: int = 5) -> Optional[QueueItem]:
+        raise NotImplementedError
+
+    def ack(self, token: Token) -> None:
+        raise NotImplementedError
+
+    def recover(self) -> int:
+        """Move the un-acked items of the previous run back to the queue."""
+        return 0
+
+    def acquire_consumer(self, owner: str, ttl: int = 30) -> bool:
+        """Own the consumer (its processing list) for `ttl` seconds, False while
+        another live process owns it. The owner renews it by calling again.
+        """
+        return True
+
+    def release_consumer(self, owner: str) -> None:
+        pass
+
+    def depth(self) -> int:
+        raise NotImplementedError
+
+
+class RedisUpdateQueue(BaseUpdateQueue):
+    """Durable queue based on the redis `reliable queue` pattern.
+    - `put`: LPUSH the serialized update to the lane list and a wake-up signal.
+    - `get`: LMOVE the oldest item of the scheduled lane to the consumer
+      processing list, BLPOP the signal list while all the lanes are empty.
+    - `ack`: LREM the item from the processing list.
+    If a worker dies the update stays in the processing list and is pushed back
+    (to the head of its lane) by `recover` on the next start of the same consumer.
+    A consumer is owned by one process at a time (`{name}:consumer:{consumer}`
+    lease), so a second process can not recover the in-flight updates of a
+    running one.
+    The lane and the count of the queued or processing updates of every chat
+    are kept in the `{name}:chats:lane` and `{name}:chats:pending` hashes.
+    """
+
+    # Bound of the wake-up signals left by the items taken without waiting.
+    max_signals = 1000
+
+    def __init__(self, name="bot:updates", consumer="default", scheduler=None):
+        self.redis = get_redis()
+        # The browsing lane keeps the name of the single list queue.
+        self.lane_keys = {
+            PURCHASE: f"{name}:purchase",
+            ADMIN: f"{name}:admin",
+            BROWSING: name,
+        }
+        self.signal_key = f"{name}:signal"
+        self.processing_key = f"{name}:processing:{consumer}"
+        self.consumer_key = f"{name}:consumer:{consumer}"
+        self.chat_lanes_key = f"{name}:chats:lane"
+        self.chat_pending_key = f"{name}:chats:pending"
+        self.scheduler = scheduler or WeightedLaneScheduler()
+        self.put_script = self.redis.register_script(PUT_SCRIPT)
+        self.done_script = self.redis.register_script(DONE_SCRIPT)
+
+    def put(self, update: dict, lane: str = BROWSING) -> None:
+        chat_id = get_update_chat_id(update)
+        lane = lane if lane in self.lane_keys else BROWSING
+        self.put_script(
+            keys=[
+                self.chat_lanes_key,
+                self.chat_pending_key,
+                self.signal_key,
+                *(self.lane_keys[name] for name in LANES),
+            ],
+            args=[
+                "" if chat_id is None else chat_id,
+                LANES.index(lane) + 1,
+                json_codec.dumps_bytes(update),
+                self.max_signals,
+            ],
+        )
+
+    def _move_next(self):
+        for lane in self.scheduler.order():
+            raw = self.redis.lmove(
+                self.lane_keys[lane], self.processing_key, "RIGHT", "LEFT"
+            )
+            if raw is not None:
+                return raw
+        return None
+
+    def get(self, timeout: int = 5) -> Optional[QueueItem]:
+        raw = self._move_next()
+        if raw is None and timeout:
+            if self.redis.blpop(self.signal_key, timeout) is None:
+                return None
+            raw = self._move_next()
+        if raw is None:
+            return None
+        return raw, json_codec.loads(raw)
+
+    def ack(self, token: Token) -> None:
+        if self.redis.lrem(self.processing_key, 1, token):
+            chat_id = get_update_chat_id(json_codec.loads(token))
+            if chat_id is not None:
+                self.done_script(
+                    keys=[self.chat_lanes_key, self.chat_pending_key], args=[chat_id]
+                )
+
+    def recover(self) -> int:
+        count = 0
+        # The chat updates are still pending, they go back before the newer ones.
+        # The newest is moved first, so the oldest ends at the consume end.
+        while (raw := self.redis.lindex(self.processing_key, 0)) is not None:
+            lane_key = self.lane_keys[LANES[0]]
+            chat_id = get_update_chat_id(json_codec.loads(raw))
+            if chat_id is not None:
+                index = self.redis.hget(self.chat_lanes_key, chat_id)
+                if index is not None:
+                    lane_key = self.lane_keys[LANES[int(index) - 1]]
+            self.redis.lmove(self.processing_key, lane_key, "LEFT", "RIGHT")
+            count += 1
+        return count
+
+    def acquire_consumer(self, owner: str, ttl: int = 30) -> bool:
+        if self.redis.set(self.consumer_key, owner, nx=True, ex=ttl):
+            return True
+        if self.redis.get(self.consumer_key) == owner.encode():
+            return bool(self.redis.expire(self.consumer_key, ttl))
+        return False
+
+    def release_consumer(self, owner: str) -> None:
+        if self.redis.get(self.consumer_key) == owner.encode():
+            self.redis.delete(self.consumer_key)
+
+    def depth(self) -> int:
+        pipeline = self.redis.pipeline(transaction=False)
+        for key in self.lane_keys.values():
+            pipeline.llen(key)
+        return sum(pipeline.execute())
+
+
+class MemoryUpdateQueue(BaseUpdateQueue):
+    """In-process stand-in of the redis queue, used in tests and on single
+    process deployments where the webhook and workers share the same process.
+    """
+
+    def __init__(self, scheduler=None):
+        self.lanes = {lane: deque() for lane in LANES}
+        self.processing = {}
+        # {chat_id: [lane, count of the queued or processing updates]}
+        self.chats = {}
+        self.condition = threading.Condition()
+        self.counter = 0
+        self.scheduler = scheduler or WeightedLaneScheduler()
+
+    def put(self, update: dict, lane: str = BROWSING) -> None:
+        lane = lane if lane in self.lanes else BROWSING
+        with self.condition:
+            chat_id = get_update_chat_id(update)
+            if chat_id is not None:
+                chat = self.chats.setdefault(chat_id, [lane, 0])
+                lane = chat[0]
+                chat[1] += 1
+            self.lanes[lane].append(update)
+            self.condition.notify()
+
+    def get(self, timeout: int = 5) -> Optional[QueueItem]:
+        with self.condition:
+            if not self.condition.wait_for(self.depth, timeout):
+                return None
+
+            for lane in self.scheduler.order():
+                if self.lanes[lane]:
+                    update = self.lanes[lane].popleft()
+                    break
+            self.counter += 1
+            token = self.counter
+            self.processing[token] = update
+        return token, update
+
+    def ack(self, token: Token) -> None:
+        with self.condition:
+            update = self.processing.pop(token, None)
+            chat_id = get_update_chat_id(update) if update else None
+            if chat_id in self.chats:
+                chat = self.chats[chat_id]
+                chat[1] -= 1
+                if chat[1] <= 0:
+                    del self.chats[chat_id]
+
+    def recover(self) -> int:
+        with self.condition:
+            updates, self.processing = list(self.processing.values()), {}
+            for update in reversed(updates):
+                chat = self.chats.get(get_update_chat_id(update))
+                self.lanes[chat[0] if chat else LANES[0]].appendleft(update)
+            self.condition.notify_all()
+        return len(updates)
+
+    def depth(self) -> int:
+        return sum(len(lane) for lane in self.lanes.values())
+
+
+_update_queue = None
+
+
+def get_update_queue(consumer="default") -> BaseUpdateQueue:
+    """Return the configured (`UPDATE_QUEUE_BACKEND`) update queue."""
+    global _update_queue
+    if _update_queue is None:
+        if CONFIG.get("UPDATE_QUEUE_BACKEND", "redis") == "memory":
+            _update_queue = MemoryUpdateQueue()
+        else:
+            _update_queue = RedisUpdateQueue(consumer=consumer)
+    return _update_queue
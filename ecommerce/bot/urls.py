@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import webhook
+from .views import async_webhook, metrics_view, webhook
 
 
 app_name='bot'
 urlpatterns = [
-    path('webhook/', webhook, name="webhook")
+    path('webhook/', webhook, name="webhook"),
+    path('webhook/async/', async_webhook, name="async-webhook"),
+    path('metrics/', metrics_view, name="metrics"),
 ]
\ No newline at end of file
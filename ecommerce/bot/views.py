@@ -1,38 +1,177 @@
+import logging
+import random
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from ecommerce.bot.admission import admission_controller
+from ecommerce.bot.deduplication import update_deduplicator
+from ecommerce.bot.lanes import classify_lane
+from ecommerce.bot.update_queue import get_update_queue
+from ecommerce.telegram.async_telegram import AsyncTelegram
+from ecommerce.telegram.chat_member_cache import chat_member_cache
+from ecommerce.telegram.handlers.async_handlers import (
+    AsyncBaseCallbackHandler,
+    AsyncBaseHandler,
+)
 from ecommerce.telegram.handlers.base_handler import BaseCallbackHandler, BaseHandler
 from ecommerce.telegram.deserializers import (
     TextUpdateDeserializer,
     CallbackUpdateDeSerializer,
 )
 from ecommerce.telegram.telegram import Telegram
+from ecommerce.telegram.webhook_reply import awebhook_reply, webhook_reply
+from utils import metrics
+from utils.load_env import config as CONFIG
+from utils.middleware import get_request_update
 import traceback
 
+logger = logging.getLogger(__name__)
+
+
+def log_update(data: dict):
+    """Log the sampled updates (`WEBHOOK_LOG_SAMPLE_RATE`) in debug level."""
+    sample_rate = float(CONFIG.get("WEBHOOK_LOG_SAMPLE_RATE", 0))
+    if sample_rate and logger.isEnabledFor(logging.DEBUG):
+        if random.random() < sample_rate:
+            logger.debug("Telegram update: %s", data)
+
 
 @api_view(("GET", "POST"))
 def webhook(request):
-    data = request.data
-    print(data)
-    print("=" * 100)
+    data = get_request_update(request)
+    log_update(data)
+    # Telegram re-delivers the update when the webhook is slow.
+    if update_deduplicator.is_duplicate(data.get("update_id")):
+        return Response("duplicate")
+    try:
+        return process_webhook_update(data)
+    except Exception:
+        # The update is not accepted, telegram re-delivers it.
+        update_deduplicator.release(data.get("update_id"))
+        raise
+
+
+def process_webhook_update(data: dict) -> Response:
+    if chat_member := data.get("chat_member"):
+        chat_member_cache.invalidate(chat_member)
+        return Response("ok")
+
+    if CONFIG.get("WEBHOOK_MODE", "inline") == "queue":
+        # Acknowledge the update and let the `runworkers` pool process it.
+        if not data.get("message") and not data.get("callback_query"):
+            return Response("not found")
+        # Shed the browsing updates while the workers are behind.
+        admitted, reply = admission_controller.admit(data)
+        if not admitted:
+            return Response(reply or "busy")
+        enqueue_update(data)
+        return Response("ok")
+
+    if CONFIG.get("WEBHOOK_REPLY_MODE", "off") == "on":
+        # The last Bot API call of the update is answered in the response.
+        with webhook_reply() as reply:
+            status = handle_update(data)
+            return Response(reply.take() or status)
+
+    return Response(handle_update(data))
+
+
+@csrf_exempt
+async def async_webhook(request):
+    """Async counterpart of `webhook`, served by the ASGI application."""
+    data = get_request_update(request)
+    log_update(data)
+    if await update_deduplicator.ais_duplicate(data.get("update_id")):
+        return JsonResponse("duplicate", safe=False)
+    try:
+        return await aprocess_webhook_update(data)
+    except Exception:
+        await update_deduplicator.arelease(data.get("update_id"))
+        raise
+
+
+async def aprocess_webhook_update(data: dict) -> JsonResponse:
+    if chat_member := data.get("chat_member"):
+        await sync_to_async(chat_member_cache.invalidate)(chat_member)
+        return JsonResponse("ok", safe=False)
+
+    if CONFIG.get("WEBHOOK_MODE", "inline") == "queue":
+        if not data.get("message") and not data.get("callback_query"):
+            return JsonResponse("not found", safe=False)
+        admitted, reply = await sync_to_async(admission_controller.admit)(data)
+        if not admitted:
+            return JsonResponse(reply or "busy", safe=False)
+        await sync_to_async(enqueue_update)(data)
+        return JsonResponse("ok", safe=False)
+
+    if CONFIG.get("WEBHOOK_REPLY_MODE", "off") == "on":
+        async with awebhook_reply() as reply:
+            status = await ahandle_update(data)
+            return JsonResponse(reply.take() or status, safe=False)
+
+    return JsonResponse(await ahandle_update(data), safe=False)
+
+
+def enqueue_update(data: dict):
+    # Purchase and admin updates skip the `/start` floods.
+    get_update_queue().put(data, lane=classify_lane(data))
+
+
+def metrics_view(request):
+    """Expose the process metrics in the prometheus text format."""
+    if request.META.get("REMOTE_ADDR") not in settings.INTERNAL_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4")
+
+
+def handle_update(data: dict) -> str:
+    """Route the update to the related handler and return the process status."""
     try:
         if text_data := data.get("message"):
             text_handler(text_data)
 
         elif callback_data := data.get("callback_query"):
             callback_handler(callback_data)
+        elif chat_member := data.get("chat_member"):
+            # The polling runner, the webhooks handle it before the queue.
+            chat_member_cache.invalidate(chat_member)
         else:
-            return Response("not found")
+            return "not found"
 
         # Return the simple HttpResponse to handel the non returned exception
-        return Response("ok")
+        return "ok"
     except Exception:
-        msg = traceback.format_exc().strip()
-        formated_msg = (
-            f"\n{'-'*30}\n{' '*7}Your Exception:{' '*7}| \n{'-'*100}\n{msg}\n{'-'*100}"
-        )
-        print(formated_msg)
-        return Response("error")
+        print_exception()
+        return "error"
+
+
+async def ahandle_update(data: dict) -> str:
+    try:
+        if text_data := data.get("message"):
+            await atext_handler(text_data)
+
+        elif callback_data := data.get("callback_query"):
+            await acallback_handler(callback_data)
+        else:
+            return "not found"
+
+        return "ok"
+    except Exception:
+        print_exception()
+        return "error"
+
+
+def print_exception():
+    msg = traceback.format_exc().strip()
+    formated_msg = (
+        f"\n{'-'*30}\n{' '*7}Your Exception:{' '*7}| \n{'-'*100}\n{msg}\n{'-'*100}"
+    )
+    print(formated_msg)
 
 
 def callback_handler(update):
@@ -49,3 +188,15 @@ def text_handler(update):
     deserializer.deserialize()
     base_handler = BaseHandler(bot, deserializer)
     base_handler.run()
+
+
+async def acallback_handler(update):
+    deserializer = CallbackUpdateDeSerializer(update)
+    deserializer.deserialize()
+    await AsyncBaseCallbackHandler(AsyncTelegram(), deserializer).run()
+
+
+async def atext_handler(update):
+    deserializer = TextUpdateDeserializer(update)
+    deserializer.deserialize()
+    await AsyncBaseHandler(AsyncTelegram(), deserializer).run()
@@ -0,0 +1,21 @@
+import time
+
+from django.db import close_old_connections
+
+from ecommerce.bot.admission import classify_update, update_latency
+from ecommerce.bot.views import handle_update
+
+
+def process_update(update: dict) -> str:
+    """Process the update outside of the request cycle (worker threads),
+    the stale DB connections of the thread are closed like in a request.
+    """
+    close_old_connections()
+    started_at = time.perf_counter()
+    try:
+        return handle_update(update)
+    finally:
+        update_latency.observe(
+            time.perf_counter() - started_at, update_class=classify_update(update)
+        )
+        close_old_connections()
@@ -12,7 +12,7 @@ from django.utils.translation import gettext as _
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ecommerce.bot.models import Message
+from ecommerce.bot.catalog import message_catalog
 from ecommerce.payment.exception import TransactionPaidBefore
 from ecommerce.payment.models import Transaction, ZarinPalPayment
 from ecommerce.payment.permission import WhitelistIPPermission
@@ -23,7 +23,7 @@ from ecommerce.payment.services import (
 )
 from ecommerce.payment.utils.crypto_symbol_price import Nobitex
 from ecommerce.payment.utils.obfuscation import Obfuscate
-from ecommerce.telegram.telegram import Telegram
+from ecommerce.telegram.async_telegram import AsyncTelegram, run_sync
 from utils.load_env import config as CONFIG
 
 User = get_user_model()
@@ -62,25 +62,26 @@ class TransactionUtils:
                 f"[{transaction_time}] - User Id : {transaction.payer.user_id} - Pay Amount : [{transaction.amount_rial:,}]\n"
             )
 
-        admins = User.objects.filter(is_staff=True)
+        admin_ids = User.objects.filter(is_staff=True).values_list("user_id", flat=True)
         payer = transaction.payer
-        for admin in admins:
-            msg = Message.objects.get(current_step="admin-success-pay")
-            text = msg.text.format(
-                method=transaction.payment_method,
-                user_id=payer.user_id,
-                first_name=payer.first_name if payer.first_name else "❌",
-                last_name=payer.last_name if payer.first_name else "❌",
-                username=payer.username,
-                amount=transaction.amount_rial,
-                time=transaction_time,
-            )
-            Telegram().send_message(admin.user_id, text)
+        msg = message_catalog.get("admin-success-pay")
+        text = msg.text.format(
+            method=transaction.payment_method,
+            user_id=payer.user_id,
+            first_name=payer.first_name if payer.first_name else "❌",
+            last_name=payer.last_name if payer.first_name else "❌",
+            username=payer.username,
+            amount=transaction.amount_rial,
+            time=transaction_time,
+        )
+        messages = [(admin_id, text) for admin_id in admin_ids]
 
-        user_success_msg = Message.objects.get(current_step="user-success-pay")
-        Telegram().send_message(
-            payer.user_id, user_success_msg.text.format(balance=payer.balance)
+        user_success_msg = message_catalog.get("user-success-pay")
+        messages.append(
+            (payer.user_id, user_success_msg.text.format(balance=payer.balance))
         )
+        # One message per admin, sent concurrently.
+        run_sync(AsyncTelegram().send_messages(messages))
 
 
 class ZarinpalCreateTransaction(ZarinpalMetaData, TransactionUtils):
@@ -1,27 +1,40 @@
 import random
 import traceback
 
+from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import F, Q
 
+from ecommerce.account.state_cache import user_states
 from ecommerce.product.models import AccountSession, Order, Product
 from fixtures.app_info import fake_info_list
 from utils.load_env import config as CONFIG
 
+User = get_user_model()
+
 
 class OrderService:
     def create_order(self, session, user_obj):
         """Update session status and create order,
         also update the user balance
         """
+        price = session.product.price
         try:
             with transaction.atomic():
+                # The handlers have the cached user state, the balance is
+                # checked and updated on the DB row in one query, so the
+                # concurrent purchases of the user can not overdraw it.
+                paid = User.objects.filter(pk=user_obj.pk, balance__gte=price).update(
+                    balance=F("balance") - price
+                )
+                if not paid:
+                    return False
+
+                user_states.invalidate(user_obj.user_id)
                 AccountSessionService().update_session_status(session, "purchased")
                 order = Order.objects.create(
-                    user=user_obj, session=session, price=session.product.price
+                    user_id=user_obj.pk, session=session, price=price
                 )
-                user_obj.balance -= session.product.price
-                user_obj.save()
         except Exception:
             AccountSessionService().update_session_status(session, "disable")
             msg = traceback.format_exc().strip()
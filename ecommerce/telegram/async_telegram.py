@@ -0,0 +1,292 @@
+import asyncio
+import io
+import threading
+import time
+import weakref
+from typing import Optional, Union
+
+import httpx
+
+from ecommerce.telegram.circuit_breaker import get_circuit_breaker, record_call
+from ecommerce.telegram.file_id_cache import file_id_cache, is_invalid_file_id
+from ecommerce.telegram.rate_limiter import (
+    RATE_LIMITED_METHODS,
+    get_retry_after,
+    outbound_limiter,
+)
+from ecommerce.telegram.telegram import (
+    ParseMode,
+    ReplyMarkup,
+    Telegram,
+    check_file_size,
+)
+from ecommerce.telegram.webhook_reply import get_webhook_reply
+from utils import json_codec
+from utils.load_env import config
+
+# httpx clients and the concurrency limits are bound to the event loop they
+# were created in.
+_clients = weakref.WeakKeyDictionary()
+_background_loop = None
+_background_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide event loop of the sync callers (`run_sync`)."""
+    global _background_loop
+    if _background_loop is None:
+        with _background_loop_lock:
+            if _background_loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, daemon=True)
+                thread.start()
+                _background_loop = loop
+    return _background_loop
+
+
+def run_sync(coroutine):
+    """Run the coroutine from sync code (views, workers) and return its result.
+    It runs on a long-lived background loop, so the pooled connections of the
+    `AsyncTelegram` client are kept alive between the calls.
+    Must not be called from a running event loop, await the coroutine there.
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, get_background_loop()).result()
+
+
+class AsyncTelegram:
+    """Async counterpart of `Telegram` used by the ASGI webhook path and the
+    fan-out of the same call to many chats (`send_messages`).
+    The calls share a keep-alive connection pool (`TELEGRAM_ASYNC_MAX_CONNECTIONS`)
+    and at most `TELEGRAM_ASYNC_CONCURRENCY` requests are in flight per loop.
+    """
+
+    api_url: str = config.get("BOT_API_URL", "https://api.telegram.org")
+    headers: dict = {"Cache-Control": "no-cache"}
+    max_connections: int = int(config.get("TELEGRAM_ASYNC_MAX_CONNECTIONS", 50))
+    concurrency: int = int(config.get("TELEGRAM_ASYNC_CONCURRENCY", 30))
+    # The (connect, read) seconds of the sync client.
+    timeout: tuple = Telegram.timeout
+
+    def _get_loop_client(self):
+        loop = asyncio.get_running_loop()
+        loop_client = _clients.get(loop)
+        if loop_client is None:
+            proxy = f"socks5://{config.PROXY_SOCKS}" if config.PROXY_SOCKS else None
+            client = httpx.AsyncClient(
+                proxy=proxy,
+                headers=self.headers,
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            loop_client = _clients[loop] = (client, asyncio.Semaphore(self.concurrency))
+        return loop_client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._get_loop_client()[0]
+
+    async def request(self, method, url, **kwargs) -> httpx.Response:
+        client, semaphore = self._get_loop_client()
+        async with semaphore:
+            return await client.request(method, url, **kwargs)
+
+    async def bot(self, telegram_method, data, input_file=None):
+        if reply := get_webhook_reply():
+            await reply.aflush()
+            if reply.can_hold(telegram_method, input_file):
+                if telegram_method in RATE_LIMITED_METHODS:
+                    await outbound_limiter.aacquire(data.get("chat_id"))
+
+                def asend():
+                    return self._call(telegram_method, data, acquired=True)
+
+                return reply.hold(
+                    telegram_method, data, lambda: run_sync(asend()), asend
+                )
+
+        return await self._call(telegram_method, data, input_file)
+
+    async def _call(self, telegram_method, data, input_file=None, acquired=False):
+        if telegram_method not in RATE_LIMITED_METHODS:
+            return await self._request(telegram_method, data, input_file)
+
+        chat_id = data.get("chat_id")
+        for _ in range(Telegram.max_retries + 1):
+            if not acquired:
+                await outbound_limiter.aacquire(chat_id)
+            acquired = False
+            result = await self._request(telegram_method, data, input_file)
+            retry_after = get_retry_after(result)
+            if not retry_after or retry_after > Telegram.max_retry_after:
+                break
+
+            await asyncio.to_thread(outbound_limiter.block, chat_id, retry_after)
+            for file in (input_file or {}).values():
+                file.seek(0)
+        return result
+
+    async def _request(self, telegram_method, data, input_file=None):
+        if not get_circuit_breaker(telegram_method).allow():
+            print(
+                "Error in AsyncTelegram Class: ", f"{telegram_method} circuit is open"
+            )
+            return None
+
+        url = f"{self.api_url}/bot{config.TOKEN}/{telegram_method}"
+        data = {key: value for key, value in data.items() if value is not None}
+        started_at = time.perf_counter()
+        try:
+            if keys := data.get("reply_markup"):
+                if not isinstance(keys, str):
+                    data["reply_markup"] = json_codec.dumps(keys)
+
+            response = await self.request("POST", url, data=data, files=input_file)
+        except Exception as error:
+            record_call(telegram_method, started_at, error=error)
+            print("Error in AsyncTelegram Class: ", error)
+            return None
+
+        record_call(telegram_method, started_at, response.status_code)
+        try:
+            if response.content:
+                return json_codec.loads(response.content)
+            return {}
+        except Exception as error:
+            print("Error in AsyncTelegram Class: ", error)
+
+    async def send_messages(self, messages: list, **kwargs) -> list:
+        """Send the `(chat_id, text)` messages concurrently, return the results in order."""
+        return await asyncio.gather(
+            *(self.send_message(chat_id, text, **kwargs) for chat_id, text in messages)
+        )
+
+    async def send_message(
+        self,
+        chat_id: Union[int, str],
+        text: str,
+        parse_mode: Optional[ParseMode] = "html",
+        disable_web_page_preview: Optional[bool] = True,
+        reply_to_message_id: Optional[int] = None,
+        reply_markup: Optional[ReplyMarkup] = None,
+        **kwargs,
+    ):
+        """Send a text message, see `Telegram.send_message`."""
+        data = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": parse_mode,
+            "disable_web_page_preview": disable_web_page_preview,
+            "reply_to_message_id": reply_to_message_id,
+            "reply_markup": reply_markup,
+        }
+        data.update(**kwargs)
+        return await self.bot("sendMessage", data=data)
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        """Edit the text of the message, see `Telegram.edit_message_text`."""
+        data = {
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "text": text,
+            "parse_mode": "html",
+            "disable_web_page_preview": "true",
+        }
+        data.update(**kwargs)
+        return await self.bot("editMessageText", data=data)
+
+    async def send_answer_callback_query(self, callback_query_id, text: str, **kwargs):
+        data = {"callback_query_id": str(callback_query_id), "text": text}
+        data.update(**kwargs)
+        return await self.bot("answerCallbackQuery", data=data)
+
+    async def send_chat_action(self, chat_id, action="typing"):
+        data = {"chat_id": chat_id, "action": action}
+        return await self.bot("sendChatAction", data=data)
+
+    async def forward_message(self, chat_id, from_chat_id, message_id: int, **kwargs):
+        data = {
+            "chat_id": chat_id,
+            "from_chat_id": from_chat_id,
+            "message_id": message_id,
+        }
+        data.update(**kwargs)
+        return await self.bot("forwardMessage", data=data)
+
+    async def copy_message(self, chat_id, from_chat_id, message_id: int, **kwargs):
+        """Copy the message, see `Telegram.copy_message`."""
+        data = {
+            "chat_id": chat_id,
+            "from_chat_id": from_chat_id,
+            "message_id": message_id,
+        }
+        data.update(**kwargs)
+        return await self.bot("copyMessage", data=data)
+
+    async def download_file(self, file_id: str):
+        buffer = io.BytesIO()
+        if await self.download_file_to(file_id, buffer) is None:
+            return None
+        return buffer.getvalue()
+
+    async def download_file_to(self, file_id: str, file, max_size=None):
+        """Write the file to `file` in chunks, see `Telegram.download_file_to`."""
+        max_size = max_size or Telegram.max_download_size
+        data = {"file_id": file_id}
+        file_info = await self.bot("getFile", data=data)
+        try:
+            check_file_size(file_info["result"].get("file_size"), max_size)
+            file_path = file_info["result"]["file_path"]
+            url = f"{self.api_url}/file/bot{config.TOKEN}/{file_path}"
+            client, semaphore = self._get_loop_client()
+            async with semaphore:
+                async with client.stream("GET", url, params=data) as response:
+                    response.raise_for_status()
+                    check_file_size(response.headers.get("Content-Length"), max_size)
+                    size = 0
+                    async for chunk in response.aiter_bytes(
+                        Telegram.download_chunk_size
+                    ):
+                        size += len(chunk)
+                        check_file_size(size, max_size)
+                        file.write(chunk)
+                    return size
+        except Exception as error:
+            print("Error in AsyncTelegram Class: ", error)
+
+    async def send_document(self, chat_id, document, **kwargs):
+        """Send the `document` file path, see `Telegram.send_document`."""
+        data = {"chat_id": str(chat_id)}
+        data.update(**kwargs)
+
+        digest = await asyncio.to_thread(file_id_cache.get_digest, document)
+        if file_id := await asyncio.to_thread(file_id_cache.get, digest):
+            result = await self.bot("sendDocument", data={**data, "document": file_id})
+            if not is_invalid_file_id(result):
+                return result
+            await asyncio.to_thread(file_id_cache.delete, digest)
+
+        with open(document, "rb") as file:
+            result = await self.bot(
+                "sendDocument", data=data, input_file={"document": file}
+            )
+        await asyncio.to_thread(file_id_cache.set, digest, result)
+        return result
+
+    async def send_documents(self, chat_ids: list, document, **kwargs) -> list:
+        """Send the document to the chats with one upload: the first send caches
+        the file_id, the others are sent concurrently with it.
+        """
+        if not chat_ids:
+            return []
+
+        first = await self.send_document(chat_ids[0], document, **kwargs)
+        others = await asyncio.gather(
+            *(
+                self.send_document(chat_id, document, **kwargs)
+                for chat_id in chat_ids[1:]
+            )
+        )
+        return [first, *others]
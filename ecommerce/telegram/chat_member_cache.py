@@ -0,0 +1,108 @@
+from django.core.cache import cache
+
+from utils.load_env import config as CONFIG
+from utils.metrics import Counter, Gauge
+
+# The statuses of the users that are not in the chat.
+NOT_MEMBER_STATUSES = frozenset({"left", "kicked"})
+# The 400 descriptions of an unknown user, the other ones (e.g. chat not
+# found, the bot is not a member) are not about the user and not cached.
+USER_NOT_FOUND_ERRORS = ("user not found", "member not found")
+
+chat_member_lookups = Counter(
+    "bot_chat_member_cache_total",
+    "getChatMember lookups served by the cache (hit) or the api (miss).",
+)
+chat_member_hit_ratio = Gauge(
+    "bot_chat_member_cache_hit_ratio", "Hit ratio of the getChatMember cache."
+)
+
+
+def is_member(member) -> bool:
+    if not member:
+        return False
+    if member.get("status") == "restricted":
+        return bool(member.get("is_member"))
+    return member.get("status") not in NOT_MEMBER_STATUSES
+
+
+def is_user_not_found(result) -> bool:
+    """The user is unknown to the chat (never joined or no such user)."""
+    if not isinstance(result, dict) or result.get("error_code") != 400:
+        return False
+    description = str(result.get("description", "")).lower()
+    return any(error in description for error in USER_NOT_FOUND_ERRORS)
+
+
+class ChatMemberCache:
+    """Cache of the `getChatMember` results by (chat, user):
+    - members for `CHAT_MEMBER_TTL` seconds (short, the rights may change).
+    - not members (left, kicked, unknown user) for `CHAT_MEMBER_NEGATIVE_TTL`,
+      a join is seen right away through the `chat_member` updates.
+    The `chat_member` updates of the webhook (the bot must be a channel admin)
+    invalidate the entry of the user. When the cache is down the api is called.
+    """
+
+    key = "bot:member:{}:{}"
+
+    def __init__(self, ttl=None, negative_ttl=None):
+        self.ttl = int(ttl or CONFIG.get("CHAT_MEMBER_TTL", 60))
+        self.negative_ttl = int(
+            negative_ttl or CONFIG.get("CHAT_MEMBER_NEGATIVE_TTL", 300)
+        )
+
+    @staticmethod
+    def get_keys(chat, user_id) -> list:
+        """Keys of the chat by `@username` and by id, the api accepts both."""
+        if isinstance(chat, dict):
+            chats = [chat.get("id")]
+            if username := chat.get("username"):
+                chats.append(f"@{username}")
+        else:
+            chats = [chat]
+        return [
+            ChatMemberCache.key.format(str(chat_id).lower(), user_id)
+            for chat_id in chats
+            if chat_id
+        ]
+
+    def _count(self, result):
+        chat_member_lookups.inc(result=result)
+        hits = chat_member_lookups.value(result="hit")
+        total = hits + chat_member_lookups.value(result="miss")
+        chat_member_hit_ratio.set(round(hits / total, 4))
+
+    def get(self, chat_id, user_id):
+        """Return the cached member dict, {} for the not found users, else None."""
+        try:
+            member = cache.get(self.get_keys(chat_id, user_id)[0])
+        except Exception as error:
+            print("Error in ChatMemberCache: ", error)
+            member = None
+
+        self._count("miss" if member is None else "hit")
+        return member
+
+    def set(self, chat_id, user_id, member):
+        ttl = self.ttl if is_member(member) else self.negative_ttl
+        try:
+            cache.set(self.get_keys(chat_id, user_id)[0], member or {}, timeout=ttl)
+        except Exception as error:
+            print("Error in ChatMemberCache: ", error)
+
+    def invalidate(self, chat_member_update: dict):
+        """Drop the cached membership of the user of a `chat_member` update."""
+        chat = chat_member_update.get("chat") or {}
+        user_id = (
+            (chat_member_update.get("new_chat_member") or {}).get("user", {}).get("id")
+        )
+        if not user_id:
+            return
+
+        try:
+            cache.delete_many(self.get_keys(chat, user_id))
+        except Exception as error:
+            print("Error in ChatMemberCache: ", error)
+
+
+chat_member_cache = ChatMemberCache()
@@ -0,0 +1,111 @@
+import threading
+import time
+
+from utils.load_env import config as CONFIG
+from utils.metrics import Counter, Gauge, Histogram
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+api_latency = Histogram(
+    "bot_api_request_seconds", "Latency of the Bot API calls by method."
+)
+api_errors = Counter(
+    "bot_api_errors_total",
+    "Failed Bot API calls by method and error (exception or status).",
+)
+circuit_rejected = Counter(
+    "bot_api_circuit_rejected_total", "Bot API calls failed fast by an open circuit."
+)
+circuit_state = Gauge(
+    "bot_api_circuit_state",
+    "Circuit of the Bot API method, 0 closed, 1 half open, 2 open.",
+)
+
+
+class CircuitBreaker:
+    """Fail the calls of a Bot API method fast while it is down, instead of
+    blocking the worker threads on the timeouts:
+    - closed: the calls are sent, `CIRCUIT_BREAKER_FAILURES` consecutive
+      failures (network errors, 5xx) open the circuit.
+    - open: the calls fail right away for `CIRCUIT_BREAKER_RECOVERY` seconds.
+    - half open: one probe call is sent, its success closes the circuit and
+      a failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=None, recovery_timeout=None):
+        self.name = name
+        self.failure_threshold = int(
+            failure_threshold or CONFIG.get("CIRCUIT_BREAKER_FAILURES", 5)
+        )
+        self.recovery_timeout = float(
+            recovery_timeout or CONFIG.get("CIRCUIT_BREAKER_RECOVERY", 30)
+        )
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def _set_state(self, state):
+        self.state = state
+        circuit_state.set(STATE_VALUES[state], method=self.name)
+
+    def allow(self) -> bool:
+        """Return True if the call can be sent."""
+        with self.lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    circuit_rejected.inc(method=self.name)
+                    return False
+                self._set_state(HALF_OPEN)
+
+            if self.state == HALF_OPEN:
+                if self.probing:
+                    circuit_rejected.inc(method=self.name)
+                    return False
+                self.probing = True
+            return True
+
+    def record(self, success: bool):
+        with self.lock:
+            self.probing = False
+            if success:
+                self.failures = 0
+                if self.state != CLOSED:
+                    self._set_state(CLOSED)
+                return
+
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(telegram_method) -> CircuitBreaker:
+    breaker = _breakers.get(telegram_method)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(
+                telegram_method, CircuitBreaker(telegram_method)
+            )
+    return breaker
+
+
+def record_call(telegram_method, started_at, status_code=None, error=None):
+    """Observe the latency of the call and feed its circuit breaker."""
+    api_latency.observe(time.perf_counter() - started_at, method=telegram_method)
+    if error is not None:
+        api_errors.inc(method=telegram_method, error=type(error).__name__)
+    elif status_code >= 400:
+        api_errors.inc(method=telegram_method, error=str(status_code))
+
+    # The 4xx are errors of the call (bad request, blocked, 429), not of the api.
+    failed = error is not None or status_code >= 500
+    get_circuit_breaker(telegram_method).record(not failed)
@@ -0,0 +1,65 @@
+import hashlib
+import os
+from typing import Optional
+
+from utils.metrics import Counter
+from utils.redis_client import get_redis
+
+file_id_lookups = Counter(
+    "bot_file_id_cache_total", "Documents sent by cached file_id (hit) or uploaded (miss)."
+)
+
+
+class FileIdCache:
+    """Telegram `file_id` of the uploaded documents, by content hash, in the
+    redis hash `bot:file_ids`. A file is uploaded once, later sends of the same
+    content reuse the `file_id` (they are permanent for the bot).
+    The file name is part of the key, telegram shows the name of the upload.
+    When redis is down every send uploads the file.
+    """
+
+    key = "bot:file_ids"
+    chunk_size = 64 * 1024
+
+    def get_digest(self, path) -> str:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as file:
+            while chunk := file.read(self.chunk_size):
+                sha256.update(chunk)
+        return f"{sha256.hexdigest()}:{os.path.basename(path)}"
+
+    def get(self, digest) -> Optional[str]:
+        try:
+            file_id = get_redis().hget(self.key, digest)
+        except Exception as error:
+            print("Error in FileIdCache: ", error)
+            file_id = None
+
+        file_id_lookups.inc(result="hit" if file_id else "miss")
+        return file_id.decode() if file_id else None
+
+    def set(self, digest, result):
+        """Save the `file_id` of the sendDocument `result`."""
+        if not isinstance(result, dict) or not result.get("ok"):
+            return
+
+        file_id = result["result"].get("document", {}).get("file_id")
+        try:
+            if file_id:
+                get_redis().hset(self.key, digest, file_id)
+        except Exception as error:
+            print("Error in FileIdCache: ", error)
+
+    def delete(self, digest):
+        try:
+            get_redis().hdel(self.key, digest)
+        except Exception as error:
+            print("Error in FileIdCache: ", error)
+
+
+def is_invalid_file_id(result) -> bool:
+    """The cached file_id was rejected (e.g. the bot token changed)."""
+    return isinstance(result, dict) and result.get("error_code") == 400
+
+
+file_id_cache = FileIdCache()
@@ -1,8 +1,8 @@
 import asyncio
-import io
 import os
 import re
 import shutil
+import tempfile
 import zipfile
 from datetime import timedelta
 
@@ -14,7 +14,9 @@ from django.utils import timezone
 from pyrogram import errors
 from pyrogram.enums import SentCodeType
 
-from ecommerce.bot.models import BotUpdateStatus, Message
+from ecommerce.bot.broadcast import TEMPLATE_PREFIX, queue_broadcast
+from ecommerce.bot.catalog import MessageVariant, message_catalog
+from ecommerce.bot.models import BotUpdateStatus
 from ecommerce.payment.services import TransactionService
 from ecommerce.product.models import AccountSession, Product
 from ecommerce.product.services import AccountSessionService, OrderService
@@ -23,8 +25,9 @@ from ecommerce.telegram.account_manager import (
     TdataSessionManager,
     TMAccountManager,
 )
+from ecommerce.telegram.progress import ChatActionProgress
 from ecommerce.telegram.validators import Validators
-from ecommerce.bot.services import MessageService
+from ecommerce.bot.services import BotStatusService, MessageService
 
 User = get_user_model()
 
@@ -49,8 +52,7 @@ class AdminTextHandler:
         keys = ""
         for product in products:
             keys += f"\n{product.name}:add-session-country-{product.country_code}-{product.phone_code}:"
-        msg.keys = keys.strip()
-        return msg
+        return msg.replace(keys=keys.strip())
 
     def admin_statistics(self, msg_obj):
         now = timezone.now()
@@ -148,7 +150,7 @@ class AdminTextHandler:
 
             if update_text_method := getattr(self, msg.current_step, None):
                 text = update_text_method(msg)
-                if isinstance(text, Message):
+                if isinstance(text, MessageVariant):
                     reply_markup = self.generate_keyboards(text)
                     text = text.text
 
@@ -173,6 +175,7 @@ class AdminStepHandler:
             "admin-get-login-code-app": self.get_login_code_app_signin,
             "admin-get-login-code-sms": self.get_login_code_sms_signup,
             "admin-get-login-password": self.get_login_password,
+            "admin-get-broadcast": self.get_broadcast_post,
         }
 
     def __getattr__(self, name):
@@ -236,8 +239,16 @@ class AdminStepHandler:
         self.update_cached_data("add:session", session_id=session.id, type="add-string")
         self.user_qs.update(step="admin-get-api-id-hash")
 
-    def download_archive_session_file(self, content):
-        bytes_io = io.BytesIO(content)
+    def download_archive_session_file(self):
+        # Streamed to a temp file, the archive is not kept in memory.
+        with tempfile.TemporaryFile() as archive_file:
+            if self.bot.download_file_to(self.file_id, archive_file) is None:
+                return False, False
+
+            archive_file.seek(0)
+            return self.extract_archive_session_file(archive_file)
+
+    def extract_archive_session_file(self, archive_file):
         session_string = None
 
         if "rar" in self.file_mime_type:
@@ -245,7 +256,7 @@ class AdminStepHandler:
         else:
             archive_type = zipfile.ZipFile
 
-        with archive_type(bytes_io, "r") as rf:
+        with archive_type(archive_file, "r") as rf:
             files = rf.namelist()
             if not any(map(lambda file: "tdata" in file, files)):
                 return False, False
@@ -268,26 +279,28 @@ class AdminStepHandler:
 
         return session_string, phone
 
-    def download_normal_session_file(self, content):
+    def download_normal_session_file(self):
         download_path = f"ecommerce/bot/sessions/{self.file_name}"
         with open(download_path, "wb") as of:
-            of.write(content)
+            size = self.bot.download_file_to(self.file_id, of)
+        if size is None:
+            os.remove(download_path)
+            return False, False
 
         session_string, phone = asyncio.run(
             TMAccountManager().extract_session_string(download_path)
         )
         if not session_string:
-            os.rmdir(download_path)
+            os.remove(download_path)
 
         return session_string, phone
 
     @validators.validate_file_format
     def add_session_file(self):
-        content = self.bot.download_file(self.file_id)
         if "rar" in self.file_mime_type or "zip" in self.file_mime_type:
-            session_string, phone = self.download_archive_session_file(content)
+            session_string, phone = self.download_archive_session_file()
         else:
-            session_string, phone = self.download_normal_session_file(content)
+            session_string, phone = self.download_normal_session_file()
 
         if not session_string:
             msg = MessageService(self.user_obj).get(step="general-format-error").text
@@ -333,14 +346,13 @@ class AdminStepHandler:
     def _handel_send_login_code(self, session_type, session_id):
         global session_loop
         if session_type == "add-phone":
-            wait_msg = self.bot.send_message(self.chat_id, "⏳")
             # Create new event loop
             session_loop = asyncio.new_event_loop()
-            status, account, result = session_loop.run_until_complete(
-                SignInSignUpSessionManager(session_id).send_login_code()
-            )
+            with ChatActionProgress(self.bot, self.chat_id):
+                status, account, result = session_loop.run_until_complete(
+                    SignInSignUpSessionManager(session_id).send_login_code()
+                )
             if not status:
-                self.bot.delete_message(self.chat_id, wait_msg["result"]["message_id"])
                 msg = MessageService(self.user_obj).get(step="invalid-phone-error")
                 return self.bot.send_message(self.chat_id, msg.text)
 
@@ -354,7 +366,6 @@ class AdminStepHandler:
             else:
                 msg, keys = self.retrive_msg_and_keys("admin-get-login-code-app")
             self.bot.send_message(self.chat_id, msg.text, reply_markup=keys)
-            self.user_qs.update(step=msg.current_step)
         else:
             msg, keys = self.retrive_msg_and_keys("admin-add-session-success")
             self.bot.send_message(self.chat_id, msg.text, reply_markup=keys)
@@ -441,6 +452,19 @@ class AdminStepHandler:
 
         self.bot.send_message(self.chat_id, msg)
 
+    def get_broadcast_post(self):
+        text = self.text or ""
+        if text.startswith(TEMPLATE_PREFIX):
+            step = text[len(TEMPLATE_PREFIX) :].strip()
+            if not message_catalog.exists(step):
+                msg = MessageService(self.user_obj).get(
+                    step="admin-broadcast-template-error"
+                )
+                return self.bot.send_message(self.chat_id, msg.text)
+
+        queue_broadcast(self.bot, self.chat_id, text, self.message_id)
+        self.user_qs.update(step="admin-home")
+
     def respond_to_ticket(self):
         user_id = self.reply_to_msg["text"].split("\n")[0].split(":")[1].strip()
         self.bot.copy_message(user_id, self.chat_id, self.message_id)
@@ -516,6 +540,7 @@ class AdminCallbackHandler:
         else:
             BotUpdateStatus.objects.filter(id=1).update(is_update=True)
             text = "غیر فعال 🚫"
+        BotStatusService().invalidate()
 
         self.bot.send_answer_callback_query(self.callback_query_id, text)
 
@@ -0,0 +1,163 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from ecommerce.account.models import User
+from ecommerce.account.state_cache import CachedUserQuerySet
+from ecommerce.bot.catalog import MessageVariant
+from ecommerce.bot.services import BotStatusService, MessageService
+from ecommerce.telegram.async_telegram import AsyncTelegram
+from ecommerce.telegram.deserializers import TextUpdateDeserializer
+from ecommerce.telegram.handlers.base_handler import BaseCallbackHandler, BaseHandler
+from ecommerce.telegram.handlers.user_handlers import UserTextHandler
+from ecommerce.telegram.telegram import Telegram
+
+
+def run_sync_handler(func, *args):
+    """Run the blocking part of the handler chain (MTProto, payment gateways,
+    admin steps) in a worker thread with its own DB connection.
+    """
+
+    def wrapper():
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(wrapper, thread_sensitive=False)()
+
+
+class AsyncBaseHandler(BaseHandler):
+    """Async counterpart of `BaseHandler` for the ASGI webhook.
+    The user lookup, gates and the browsing keyboards run on the event loop
+    with the async ORM and `AsyncTelegram`, the rest of the handler chain is
+    still sync and runs in a worker thread with the sync `Telegram` client.
+    """
+
+    def __init__(self, bot: AsyncTelegram, update: TextUpdateDeserializer):
+        super().__init__(Telegram(), update)
+        self.abot = bot
+
+    async def add_new_user(self):
+        self.user_qs = CachedUserQuerySet(self.chat_id)
+        self.user_obj = await self.user_qs.afirst()
+        if self.user_obj is None:
+            await sync_to_async(super().add_new_user)()
+        self.step = self.user_obj.step
+
+    async def is_deactive_user(self):
+        if not self.user_obj.is_active:
+            await self.abot.forward_message(
+                chat_id=self.chat_id,
+                from_chat_id=self.chat_id,
+                message_id=self.message_id,
+            )
+            return True
+
+    async def is_update_mode(self):
+        if self.user_obj.is_staff:
+            return False
+
+        update_obj = await BotStatusService().aget()
+        if update_obj and update_obj.is_update:
+            await self.abot.send_message(self.chat_id, update_obj.update_msg)
+            return True
+
+        return False
+
+    async def choice_default_language(self):
+        if self.user_obj.language:
+            return True
+
+        msg = await MessageService(self.user_obj).aget(step="choice-language")
+        keys = self.generate_keyboards(msg)
+        await self.abot.send_message(self.chat_id, msg.text, reply_markup=keys)
+
+    async def text_handlers(self):
+        msg_step = await MessageService.aget_step(key=self.text)
+        if msg_step and msg_step.startswith("admin") and not self.user_obj.is_staff:
+            return
+
+        if (msg_step or "/start" in self.text) and not self.user_obj.is_staff:
+            return await AsyncUserTextHandler(self).run()
+
+        await run_sync_handler(super().text_handlers)
+
+    async def run(self):
+        await self.add_new_user()
+        await MessageService.arefresh()
+        self._localize_update_text()
+        if await self.is_update_mode():
+            return
+        if await self.is_deactive_user():
+            return
+        if not await self.choice_default_language():
+            return
+        await self.text_handlers()
+
+
+class AsyncBaseCallbackHandler(AsyncBaseHandler, BaseCallbackHandler):
+    async def retrive_user(self):
+        self.user_qs = CachedUserQuerySet(self.from_chat_id)
+        self.user_obj = await self.user_qs.afirst()
+
+    async def store_choiced_language(self):
+        if self.user_obj.language:
+            return True
+
+        match self.update.callback_data:
+            case "english":
+                await self.user_qs.aupdate(language=User.LanguageChoices.ENGLISH)
+            case "persian":
+                await self.user_qs.aupdate(language=User.LanguageChoices.PERSIAN)
+
+        await self.user_obj.arefresh_from_db()
+        msgs = await MessageService(self.user_obj).afilter_user_msgs(
+            current_step="home_page"
+        )
+        keys = self.generate_keyboards(msgs[0])
+        await self.abot.send_message(self.chat_id, msgs[0].text, reply_markup=keys)
+
+    async def run(self):
+        await self.retrive_user()
+        if await self.is_update_mode():
+            return
+        if await self.is_deactive_user():
+            return
+        if not await self.store_choiced_language():
+            return
+        # Purchase and login code callbacks block on MTProto.
+        await run_sync_handler(self.callback_handlers)
+
+
+class AsyncUserTextHandler(UserTextHandler):
+    """Async counterpart of `UserTextHandler.handler` for the keyboard messages."""
+
+    async def handler(self):
+        if "/start" in self.text:
+            self.text = "/start"
+
+        messages = await MessageService(self.user_obj).afilter_user_msgs(key=self.text)
+        if not messages:
+            return
+        await self.user_qs.aupdate(step=messages[-1].current_step)
+        # Itrate over all related step msg.
+        for msg in messages:
+            reply_markup = None
+            text = msg.text
+            if msg.keys:
+                reply_markup = self.generate_keyboards(msg)
+
+            if update_text_method := getattr(self, msg.current_step, None):
+                text = await run_sync_handler(update_text_method, msg)
+                if isinstance(text, MessageVariant):
+                    reply_markup = self.generate_keyboards(text)
+                    text = text.text
+            # 'text' might be None if the validator decorator sent the message
+            if text:
+                await self.abot.send_message(
+                    self.chat_id, text, reply_markup=reply_markup
+                )
+
+    async def run(self):
+        await self.handler()
@@ -1,9 +1,9 @@
 from django.core.cache import cache
-from django.utils.translation import gettext, override
 
 from ecommerce.account.models import User
-from ecommerce.bot.models import BotUpdateStatus
-from ecommerce.bot.services import MessageService
+from ecommerce.account.state_cache import CachedUserQuerySet, UserState
+from ecommerce.bot.catalog import MessageVariant, message_catalog, render_keyboard
+from ecommerce.bot.services import BotStatusService, MessageService
 from ecommerce.telegram.deserializers import (
     CallbackUpdateDeSerializer,
     TextUpdateDeserializer,
@@ -42,11 +42,12 @@ class BaseHandler:
         """
         This method checks if the user object exists in the DB or not.
         If the user not exist, then add them to the DB.
-        Sets the `user_qs` and `user_obj` as global variables.
+        Sets the `user_qs` and `user_obj` (the cached `UserState`) as global variables.
         If the user is new, then call the `check_referral_user` method.
         """
-        self.user_qs = User.objects.filter(user_id=self.chat_id)
-        if not self.user_qs:
+        self.user_qs = CachedUserQuerySet(self.chat_id)
+        self.user_obj = self.user_qs.first()
+        if self.user_obj is None:
             username = self.username
             dup_username = User.objects.filter(username=username)
             if dup_username:
@@ -60,11 +61,8 @@ class BaseHandler:
                 user_id=self.chat_id,
                 step="home_page",
             )
-            self.user_qs = User.objects.filter(user_id=self.chat_id)
-            self.user_obj = user
+            self.user_obj = UserState.from_user(user)
             # self.check_referral_user() #TODO: check refreall
-        else:
-            self.user_obj = self.user_qs.first()
         self.step = self.user_obj.step
 
     def is_deactive_user(self):
@@ -82,7 +80,7 @@ class BaseHandler:
         if self.user_obj.is_staff:
             return False
 
-        update_obj = BotUpdateStatus.objects.first()
+        update_obj = BotStatusService().get()
         if update_obj and update_obj.is_update:
             self.bot.send_message(self.chat_id, update_obj.update_msg)
             return True
@@ -101,37 +99,15 @@ class BaseHandler:
         if self.user_obj.language == "fa":
             return
 
-        with override("fa"):
-            transalted_text = gettext(self.update.text)
-
-        self.update.text = transalted_text
+        # The button labels of the other languages are mapped to their key.
+        self.update.text = message_catalog.localize(self.update.text)
 
     def generate_keyboards(self, msg):
-        keys = msg.fetch_keys
-        if msg.is_inline_keyboard:
-            inline_keyboard = []
-            for i in range(0, len(keys), msg.keys_per_row):
-                inner_keys = []
-                for key in keys[i : i + msg.keys_per_row]:
-                    text, callback, url = key.replace("https://", "").split(
-                        ":"
-                    )  # TODO: check to see is there problem?
-                    if callback:
-                        inner_keys += [{"text": text, "callback_data": callback}]
-                    else:
-                        inner_keys += [{"text": text, "url": "https://" + url}]
-                inline_keyboard.append(inner_keys)
-            return {"inline_keyboard": inline_keyboard}
-        else:
-            keyboard = [
-                keys[i : i + msg.keys_per_row]
-                for i in range(0, len(keys), msg.keys_per_row)
-            ]
-            return {
-                "keyboard": keyboard,
-                "resize_keyboard": True,
-                "one_time_keyboard": True,
-            }
+        # The catalog variants carry their keyboard, rendered and serialized
+        # once per (catalog version, language) when the catalog loaded.
+        if isinstance(msg, MessageVariant):
+            return msg.reply_markup_json
+        return render_keyboard(msg)
 
     def text_handlers(self):
         msg_step = MessageService(self.user_obj).get_step(key=self.text)
@@ -177,7 +153,7 @@ class BaseCallbackHandler(BaseHandler):
         )
 
     def retrive_user(self):
-        self.user_qs = User.objects.filter(user_id=self.from_chat_id)
+        self.user_qs = CachedUserQuerySet(self.from_chat_id)
         self.user_obj = self.user_qs.first()
 
     def store_choiced_language(self):
@@ -2,25 +2,22 @@ import asyncio
 
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.utils.translation import gettext, override
 
-from ecommerce.bot.models import Message
+from ecommerce.bot.catalog import MessageVariant
 from ecommerce.bot.services import MessageService
 from ecommerce.payment.services import PerfectMoneyPaymentService
 from ecommerce.payment.views import (
     CryptomusCreateTransaction,
     ZarinpalCreateTransaction,
 )
-from ecommerce.product.services import (
-    AccountSessionService,
-    OrderService,
-    ProductService,
-)
+from ecommerce.product.services import AccountSessionService, OrderService
 from ecommerce.telegram.account_manager import TMAccountManager
 from ecommerce.telegram.decorators import (
     restrict_global_payment_rate,
     restrict_user_payment_rate,
 )
+from ecommerce.telegram.keyboard_cache import country_keyboards
+from ecommerce.telegram.progress import ChatActionProgress
 from ecommerce.telegram.validators import Validators
 from utils.load_env import config as CONFIG
 
@@ -59,16 +56,7 @@ class UserTextHandler:
     @validators.validate_user_balance
     @validators.validate_exists_product
     def buy_phone_number(self, msg_obj):
-        products = ProductService().get_active_countries()
-        keys = ""
-        for product in products:
-            with override(self.user_obj.language):
-                product_name = gettext(product.name)
-            keys += (
-                f"\n{product.price:,} | {product_name}:country-{product.country_code}:"
-            )
-        msg_obj.keys = keys.strip()
-        return msg_obj
+        return country_keyboards.get(msg_obj)
 
     def select_payment_method(self, ـ):
         msg = MessageService(self.user_obj).get(step="select_payment_method")
@@ -92,7 +80,7 @@ class UserTextHandler:
 
             if update_text_method := getattr(self, msg.current_step, None):
                 text = update_text_method(msg)
-                if isinstance(text, Message):
+                if isinstance(text, MessageVariant):
                     reply_markup = self.generate_keyboards(text)
                     text = text.text
             # 'text' might be None if the validator decorator sent the message
@@ -168,7 +156,7 @@ class UserInputHandler:
     def perfectmoney_get_evoucher(self):
         evoucher = self.convert_ir_num_to_en(self.text)
         payment = PerfectMoneyPaymentService().create_payment(
-            self.user_obj, evoucher=evoucher
+            self.user_obj.get_user(), evoucher=evoucher
         )
         key = f"{self.chat_id}:perfectmoney:payment:id"
         cache.set(key, payment.id)  # TODO: Add timout.
@@ -194,19 +182,18 @@ class UserInputHandler:
     @validators.validate_min_max_pay_amount(CONFIG.MIN_DOLLAR_PAY_LIMIT, "دلار")
     def cryptomus_get_amount(self):
         amount = self.convert_ir_num_to_en(self.text)
-        wait_msg = self.bot.send_message(self.chat_id, "⏳")
-        status, data = CryptomusCreateTransaction(
-            self.user_obj, amount
-        ).create_transaction()
+        with ChatActionProgress(self.bot, self.chat_id):
+            status, data = CryptomusCreateTransaction(
+                self.user_obj.get_user(), amount
+            ).create_transaction()
         if not status:
             msg = MessageService(self.user_obj).get(step="create-payment-error").text
             return self.bot.send_message(self.chat_id, msg)
 
         msg = MessageService(self.user_obj).get(step="crypto-payment")
-        msg.keys = msg.keys.format(url=data, callback="")
+        msg = msg.replace(keys=msg.keys.format(url=data, callback=""))
         reply_markup = self.generate_keyboards(msg)
         text = msg.text.format(user_id=self.chat_id)
-        self.bot.delete_message(self.chat_id, wait_msg["result"]["message_id"])
         self.bot.send_message(self.chat_id, text, reply_markup=reply_markup)
 
     @restrict_user_payment_rate
@@ -214,19 +201,18 @@ class UserInputHandler:
     @validators.validate_min_max_pay_amount(CONFIG.MIN_RIAL_PAY_LIMIT, "ریال")
     def zarinpal_get_rial_amount(self):
         amount = self.convert_ir_num_to_en(self.text)
-        wait_msg = self.bot.send_message(self.chat_id, "⏳")
-        status, data = ZarinpalCreateTransaction(
-            self.user_obj, amount
-        ).create_transaction()
+        with ChatActionProgress(self.bot, self.chat_id):
+            status, data = ZarinpalCreateTransaction(
+                self.user_obj.get_user(), amount
+            ).create_transaction()
         if not status:
             msg = MessageService(self.user_obj).get(step="create-payment-error").text
             return self.bot.send_message(self.chat_id, msg)
 
         msg = MessageService(self.user_obj).get(step="rial-payment")
-        msg.keys = msg.keys.format(url=data, callback="")
+        msg = msg.replace(keys=msg.keys.format(url=data, callback=""))
         reply_markup = self.generate_keyboards(msg)
         text = msg.text.format(user_id=self.chat_id)
-        self.bot.delete_message(self.chat_id, wait_msg["result"]["message_id"])
         self.bot.send_message(self.chat_id, text, reply_markup=reply_markup)
 
     def handlers(self):
@@ -294,7 +280,7 @@ class UserCallbackHandler(UserTextHandler):
         cache.set(f"{self.chat_id}:order:get:login:code:{session.phone}", 1)
 
         msg = MessageService(self.user_obj).get(step="show-phone-number")
-        msg.keys = msg.keys.format(phone=session.phone)
+        msg = msg.replace(keys=msg.keys.format(phone=session.phone))
         keys = self.generate_keyboards(msg)
         self.bot.edit_message_text(
             self.chat_id,
@@ -328,7 +314,7 @@ class UserCallbackHandler(UserTextHandler):
 
         # Store login code
         OrderService().update_order(session.order.id, login_code=code)
-        msg.keys = msg.keys.format(phone=phone)
+        msg = msg.replace(keys=msg.keys.format(phone=phone))
         keys = self.generate_keyboards(msg)
         self.bot.send_message(
             self.chat_id,
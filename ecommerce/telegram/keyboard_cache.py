@@ -0,0 +1,93 @@
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.translation import gettext, override
+
+from ecommerce.bot.catalog import MessageVariant
+from ecommerce.product.models import AccountSession, Product
+from ecommerce.product.services import ProductService
+from utils.metrics import Counter
+
+country_keyboard_lookups = Counter(
+    "bot_country_keyboard_cache_total",
+    "Country keyboards served by the cache (hit) or built (miss).",
+)
+
+
+class CountryKeyboardCache:
+    """The `buy_phone_number` message with the keyboard of the countries in
+    stock, built once per (stock version, language) instead of a query and a
+    render on every request.
+    The saves and deletes of the products and of the sessions (their status
+    is the stock) bump the `bot:stock:version` key after the commit, the
+    processes check it on every lookup.
+    """
+
+    version_key = "bot:stock:version"
+
+    def __init__(self):
+        # {language: (stock version, message variant, keyboard variant)}
+        self.keyboards = {}
+        self.lock = threading.Lock()
+
+    def get_version(self):
+        try:
+            return cache.get_or_set(self.version_key, 0, timeout=None)
+        except Exception as error:
+            print("Error in CountryKeyboardCache: ", error)
+            return None
+
+    def invalidate(self):
+        """Rebuild the keyboards in this process now and in the others after the commit."""
+        self.keyboards.clear()
+
+        def bump_version():
+            try:
+                cache.incr(self.version_key)
+            except ValueError:
+                cache.set(self.version_key, 1, timeout=None)
+            except Exception as error:
+                print("Error in CountryKeyboardCache: ", error)
+
+        transaction.on_commit(bump_version)
+
+    @staticmethod
+    def build(msg: MessageVariant) -> MessageVariant:
+        keys = ""
+        for product in ProductService().get_active_countries():
+            with override(msg.language):
+                product_name = gettext(product.name)
+            keys += (
+                f"\n{product.price:,} | {product_name}:country-{product.country_code}:"
+            )
+        return msg.replace(keys=keys.strip())
+
+    def get(self, msg: MessageVariant) -> MessageVariant:
+        """Return `msg` with the keyboard of the countries in stock."""
+        version = self.get_version()
+        entry = self.keyboards.get(msg.language)
+        # A new catalog load builds new variants of the message.
+        if version is not None and entry and entry[0] == version and entry[1] is msg:
+            country_keyboard_lookups.inc(result="hit")
+            return entry[2]
+
+        country_keyboard_lookups.inc(result="miss")
+        keyboard = self.build(msg)
+        if version is not None:
+            with self.lock:
+                self.keyboards[msg.language] = (version, msg, keyboard)
+        return keyboard
+
+
+country_keyboards = CountryKeyboardCache()
+
+
+def invalidate_country_keyboards(sender, **kwargs):
+    country_keyboards.invalidate()
+
+
+for stock_model in (Product, AccountSession):
+    post_save.connect(invalidate_country_keyboards, sender=stock_model)
+    post_delete.connect(invalidate_country_keyboards, sender=stock_model)
@@ -0,0 +1,35 @@
+import threading
+
+
+class ChatActionProgress:
+    """Show the "typing..." status while a slow step (payment gateway, MTProto)
+    runs, instead of sending a "⏳" placeholder and deleting it afterwards.
+    Telegram clears the status when the next message arrives, or after 5
+    seconds, so it is re-sent every `interval` seconds until the block ends.
+
+        with ChatActionProgress(self.bot, self.chat_id):
+            status, data = create_transaction()
+        self.bot.send_message(self.chat_id, text)
+    """
+
+    def __init__(self, bot, chat_id, action="typing", interval=4.5):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.action = action
+        self.interval = interval
+        self.done = threading.Event()
+        self.thread = None
+
+    def _refresh(self):
+        while not self.done.wait(self.interval):
+            self.bot.send_chat_action(self.chat_id, self.action)
+
+    def __enter__(self):
+        self.bot.send_chat_action(self.chat_id, self.action)
+        self.thread = threading.Thread(target=self._refresh, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.done.set()
+        self.thread.join()
@@ -0,0 +1,170 @@
+import asyncio
+import time
+
+from utils.load_env import config as CONFIG
+from utils.metrics import Counter, Histogram
+from utils.redis_client import get_redis
+
+# The methods that send to a chat and count against the Bot API limits.
+RATE_LIMITED_METHODS = frozenset(
+    {
+        "sendMessage",
+        "editMessageText",
+        "copyMessage",
+        "forwardMessage",
+        "sendDocument",
+    }
+)
+
+outbound_wait = Histogram(
+    "bot_outbound_wait_seconds", "Time the Bot API calls waited for the rate limiter."
+)
+throttled_calls = Counter(
+    "bot_outbound_throttled_total", "Bot API calls answered with 429 Too Many Requests."
+)
+
+# KEYS: the bucket keys, then the global and chat `retry_after` block keys.
+# ARGV: now (ms), then the rate (tokens per ms) and capacity of every bucket.
+# Take one token of every bucket or none, return the milliseconds to wait.
+TOKEN_BUCKET_SCRIPT = """
+local buckets = #KEYS - 2
+local wait = math.max(
+    redis.call('PTTL', KEYS[buckets + 1]), redis.call('PTTL', KEYS[buckets + 2]), 0)
+if wait > 0 then
+    return wait
+end
+
+local now = tonumber(ARGV[1])
+local tokens = {}
+for i = 1, buckets do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local elapsed = math.max(now - (tonumber(state[2]) or now), 0)
+    available = math.min(capacity, available + elapsed * rate)
+    if available < 1 then
+        wait = math.max(wait, math.ceil((1 - available) / rate))
+    end
+    tokens[i] = available
+end
+if wait > 0 then
+    return wait
+end
+
+for i = 1, buckets do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    redis.call('HSET', KEYS[i], 'tokens', tokens[i] - 1, 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate) + 1000)
+end
+return 0
+"""
+
+
+class OutboundRateLimiter:
+    """Token buckets of the outgoing Bot API calls, shared by all the workers
+    and processes through redis:
+    - global: `OUTBOUND_GLOBAL_RATE` messages per second (~30).
+    - private chat: `OUTBOUND_CHAT_RATE` per second (~1), bursts of `OUTBOUND_CHAT_BURST`.
+    - group/channel: `OUTBOUND_GROUP_RATE` per minute (~20).
+    The `retry_after` of a 429 response blocks the chat (or all the calls) until
+    it expires. When redis is down the calls are not limited.
+    """
+
+    key = "bot:ratelimit:{}"
+
+    def __init__(self):
+        self.enabled = CONFIG.get("OUTBOUND_RATE_LIMIT", "on") == "on"
+        self.global_rate = float(CONFIG.get("OUTBOUND_GLOBAL_RATE", 30))
+        self.chat_rate = float(CONFIG.get("OUTBOUND_CHAT_RATE", 1))
+        self.chat_burst = float(CONFIG.get("OUTBOUND_CHAT_BURST", 3))
+        self.group_rate = float(CONFIG.get("OUTBOUND_GROUP_RATE", 20)) / 60
+        self.script = None
+
+    @staticmethod
+    def is_group(chat_id) -> bool:
+        return str(chat_id).startswith(("-", "@"))
+
+    def get_buckets(self, chat_id) -> list:
+        """Return the `(key, tokens per second, capacity)` of the chat buckets."""
+        buckets = [(self.key.format("global"), self.global_rate, self.global_rate)]
+        if chat_id is None:
+            return buckets
+        if self.is_group(chat_id):
+            buckets.append((self.key.format(f"group:{chat_id}"), self.group_rate, 3))
+        else:
+            buckets.append(
+                (self.key.format(f"chat:{chat_id}"), self.chat_rate, self.chat_burst)
+            )
+        return buckets
+
+    def try_acquire(self, chat_id=None) -> float:
+        """Take a token for the chat, return 0 or the seconds to wait before retry."""
+        return self._take(self.get_buckets(chat_id), chat_id)
+
+    def try_acquire_bucket(self, name, rate) -> float:
+        """Take a token of an extra `rate` per second bucket, e.g. to keep the
+        broadcasts under the global limit and leave room for the handlers.
+        """
+        return self._take([(self.key.format(name), rate, rate)])
+
+    def _take(self, buckets, chat_id=None) -> float:
+        keys = [key for key, _, _ in buckets]
+        keys += [self.key.format("blocked"), self.key.format(f"blocked:{chat_id}")]
+        args = [int(time.time() * 1000)]
+        for _, rate, capacity in buckets:
+            args += [rate / 1000, capacity]
+
+        try:
+            if self.script is None:
+                self.script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+            return self.script(keys=keys, args=args) / 1000
+        except Exception as error:
+            print("Error in OutboundRateLimiter: ", error)
+            return 0
+
+    def acquire(self, chat_id=None):
+        """Block until the call to the chat is allowed."""
+        if not self.enabled:
+            return
+
+        started_at = time.monotonic()
+        while wait := self.try_acquire(chat_id):
+            time.sleep(wait)
+        outbound_wait.observe(time.monotonic() - started_at)
+
+    async def aacquire(self, chat_id=None):
+        if not self.enabled:
+            return
+
+        started_at = time.monotonic()
+        while wait := await asyncio.to_thread(self.try_acquire, chat_id):
+            await asyncio.sleep(wait)
+        outbound_wait.observe(time.monotonic() - started_at)
+
+    async def aacquire_bucket(self, name, rate):
+        if not self.enabled:
+            return
+
+        while wait := await asyncio.to_thread(self.try_acquire_bucket, name, rate):
+            await asyncio.sleep(wait)
+
+    def block(self, chat_id, retry_after):
+        """Hold the calls to the chat (all chats if None) for `retry_after` seconds."""
+        throttled_calls.inc()
+        key = self.key.format(f"blocked:{chat_id}" if chat_id else "blocked")
+        try:
+            get_redis().set(key, 1, px=int(float(retry_after) * 1000))
+        except Exception as error:
+            print("Error in OutboundRateLimiter: ", error)
+
+
+def get_retry_after(result) -> float:
+    """Return the `retry_after` of a 429 Bot API response, else 0."""
+    if isinstance(result, dict) and result.get("error_code") == 429:
+        return float(result.get("parameters", {}).get("retry_after") or 1)
+    return 0
+
+
+outbound_limiter = OutboundRateLimiter()
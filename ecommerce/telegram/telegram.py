@@ -1,9 +1,23 @@
-import json
+import asyncio
+import io
+import threading
+import time
 from datetime import datetime
 from typing import NewType, Optional, Union
 
 import requests
-
+from requests.adapters import HTTPAdapter
+
+from ecommerce.telegram.chat_member_cache import chat_member_cache, is_user_not_found
+from ecommerce.telegram.circuit_breaker import get_circuit_breaker, record_call
+from ecommerce.telegram.file_id_cache import file_id_cache, is_invalid_file_id
+from ecommerce.telegram.rate_limiter import (
+    RATE_LIMITED_METHODS,
+    get_retry_after,
+    outbound_limiter,
+)
+from ecommerce.telegram.webhook_reply import get_webhook_reply
+from utils import json_codec
 from utils.load_env import config
 
 ParseMode = NewType("ParseMode", str)
@@ -16,43 +30,136 @@ ReplyMarkup = Union[
     InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove, ForceReply
 ]
 
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide keep-alive session of the Bot API calls.
+    The connections (and the SOCKS5 handshake of `PROXY_SOCKS`) are reused,
+    `TELEGRAM_POOL_SIZE` should be at least the number of worker threads.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = int(config.get("TELEGRAM_POOL_SIZE", 10))
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(Telegram.headers)
+                if config.PROXY_SOCKS:
+                    session.proxies = {
+                        "http": f"socks5h://{config.PROXY_SOCKS}",
+                        "https": f"socks5h://{config.PROXY_SOCKS}",
+                    }
+                _session = session
+    return _session
+
+
+def check_file_size(size, max_size):
+    if size and int(size) > max_size:
+        raise ValueError(f"The file is bigger than {max_size} bytes")
+
 
 class Telegram:
-    webhook_url: str = "https://api.telegram.org/bot{}/{}"
+    api_url: str = config.get("BOT_API_URL", "https://api.telegram.org")
     headers: dict = {"Cache-Control": "no-cache"}
-    proxy: dict = {}
+    # (connect, read) seconds, the read timeout covers the getUpdates long poll.
+    timeout: tuple = (
+        float(config.get("TELEGRAM_CONNECT_TIMEOUT", 10)),
+        float(config.get("TELEGRAM_READ_TIMEOUT", 100)),
+    )
+
+    # Bigger files are not downloaded, checked before the body is read.
+    max_download_size: int = int(
+        config.get("TELEGRAM_MAX_DOWNLOAD_SIZE", 50 * 1024 * 1024)
+    )
+    download_chunk_size: int = 64 * 1024
+
+    # Retries of the 429 responses, longer `retry_after`s are not waited.
+    max_retries: int = int(config.get("OUTBOUND_MAX_RETRIES", 3))
+    max_retry_after: float = float(config.get("OUTBOUND_MAX_RETRY_AFTER", 30))
+
+    @property
+    def session(self) -> requests.Session:
+        return get_session()
 
     def bot(
         self, telegram_method, data, method="GET", input_file=None, params: dict = {}
     ):
-        if config.PROXY_SOCKS:
-            self.proxy = {
-                "http": f"socks5h://{config.PROXY_SOCKS}",
-                "https": f"socks5h://{config.PROXY_SOCKS}",
-            }
-        url = self.webhook_url.format(config.TOKEN, telegram_method)
+        if reply := get_webhook_reply():
+            # Keep the order, the held call is sent before this one.
+            reply.flush()
+            if reply.can_hold(telegram_method, input_file):
+                if telegram_method in RATE_LIMITED_METHODS:
+                    outbound_limiter.acquire(data.get("chat_id"))
+
+                def send():
+                    return self._call(telegram_method, data, method, acquired=True)
+
+                return reply.hold(
+                    telegram_method, data, send, lambda: asyncio.to_thread(send)
+                )
+
+        return self._call(telegram_method, data, method, input_file, params)
+
+    def _call(
+        self, telegram_method, data, method, input_file=None, params={}, acquired=False
+    ):
+        if telegram_method not in RATE_LIMITED_METHODS:
+            return self._request(telegram_method, data, method, input_file, params)
+
+        chat_id = data.get("chat_id")
+        for _ in range(self.max_retries + 1):
+            if not acquired:
+                outbound_limiter.acquire(chat_id)
+            acquired = False
+            result = self._request(telegram_method, data, method, input_file, params)
+            retry_after = get_retry_after(result)
+            if not retry_after or retry_after > self.max_retry_after:
+                break
+
+            # Telegram throttled us, hold the chat and send the call again.
+            outbound_limiter.block(chat_id, retry_after)
+            for file in (input_file or {}).values():
+                file.seek(0)
+        return result
+
+    def _request(self, telegram_method, data, method, input_file, params):
+        # Fail fast while the method is down, see `CircuitBreaker`.
+        if not get_circuit_breaker(telegram_method).allow():
+            print("Error in Telegram Class: ", f"{telegram_method} circuit is open")
+            return None
+
+        url = f"{self.api_url}/bot{config.TOKEN}/{telegram_method}"
+        started_at = time.perf_counter()
         try:
             if keys := data.get("reply_markup"):
-                data["reply_markup"] = json.dumps(keys)
+                if not isinstance(keys, str):
+                    data["reply_markup"] = json_codec.dumps(keys)
 
             if method == "GET":
-                request = requests.get(
-                    url, params=data, proxies=self.proxy, headers=self.headers
-                )
-                return json.loads(request.text)
+                request = self.session.get(url, params=data, timeout=self.timeout)
             else:
-                request = requests.post(
+                request = self.session.post(
                     url=url,
                     data=data,
                     params=params,
                     files=input_file,
-                    timeout=100,
-                    proxies=self.proxy,
-                    headers=self.headers,
+                    timeout=self.timeout,
                 )
-                if request.text:
-                    return json.loads(request.text)
-                return {}
+        except Exception as error:
+            record_call(telegram_method, started_at, error=error)
+            print("Error in Telegram Class: ", error)
+            return None
+
+        record_call(telegram_method, started_at, request.status_code)
+        try:
+            if request.content:
+                return json_codec.loads(request.content)
+            return {}
         except Exception as error:
             print("Error in Telegram Class: ", error)
 
@@ -201,33 +308,62 @@ class Telegram:
         return result
 
     def download_file(self, file_id: str):
-        method = "GET"
+        """Return the content of the small files, stream the big ones to a
+        file with `download_file_to`.
+        """
+        buffer = io.BytesIO()
+        if self.download_file_to(file_id, buffer) is None:
+            return None
+        return buffer.getvalue()
+
+    def download_file_to(self, file_id: str, file, max_size=None) -> Optional[int]:
+        """Write the file to the binary `file` object in chunks and return its
+        size. None if the download failed or the file is bigger than `max_size`
+        (`TELEGRAM_MAX_DOWNLOAD_SIZE`).
+        """
+        max_size = max_size or self.max_download_size
         data = {"file_id": file_id}
-        file_info = self.bot("getFile", data=data, method=method)
-        file_path = file_info["result"]["file_path"]
-        if config.PROXY_SOCKS:
-            self.proxy = {
-                "http": f"socks5h://{config.PROXY_SOCKS}",
-                "https": f"socks5h://{config.PROXY_SOCKS}",
-            }
+        file_info = self.bot("getFile", data=data, method="GET")
         try:
-            url = f"https://api.telegram.org/file/bot{config.TOKEN}/{file_path}"
-            request = requests.get(
-                url, params=data, proxies=self.proxy, headers=self.headers
-            )
-            return request.content
+            check_file_size(file_info["result"].get("file_size"), max_size)
+            file_path = file_info["result"]["file_path"]
+            url = f"{self.api_url}/file/bot{config.TOKEN}/{file_path}"
+            with self.session.get(
+                url, params=data, timeout=self.timeout, stream=True
+            ) as response:
+                response.raise_for_status()
+                check_file_size(response.headers.get("Content-Length"), max_size)
+                size = 0
+                for chunk in response.iter_content(self.download_chunk_size):
+                    size += len(chunk)
+                    check_file_size(size, max_size)
+                    file.write(chunk)
+                return size
         except Exception as error:
             print("Error in Telegram Class: ", error)
 
     def get_chat_member(self, chat_id, user_id, **kwargs):
+        """Return the member dict of the user, None if the user is not found.
+        The results are cached, see `ChatMemberCache`.
+        """
         data = {
             "chat_id": chat_id if "@" in chat_id else f"@{chat_id}",
             "user_id": user_id,
         }
+        member = chat_member_cache.get(data["chat_id"], user_id)
+        if member is not None:
+            return member or None
+
         data.update(**kwargs)
         result = self.bot(telegram_method="getChatMember", data=data)
+        if not result:
+            return None
         if result["ok"]:
+            chat_member_cache.set(data["chat_id"], user_id, result["result"])
             return result["result"]
+        if is_user_not_found(result):
+            # The user is not in the chat (never joined or unknown).
+            chat_member_cache.set(data["chat_id"], user_id, None)
 
     def send_document(self, chat_id, document, **kwargs):
         """
@@ -245,12 +381,30 @@ class Telegram:
         """
         method = "POST"
         data = {"chat_id": str(chat_id)}
-        file_doc = {"document": open(document, "rb")}
-
         data.update(**kwargs)
-        result = self.bot("sendDocument", data=data, method=method, input_file=file_doc)
+
+        # The same content is uploaded once, then sent by its file_id.
+        digest = file_id_cache.get_digest(document)
+        if file_id := file_id_cache.get(digest):
+            result = self.bot(
+                "sendDocument", data={**data, "document": file_id}, method=method
+            )
+            if not is_invalid_file_id(result):
+                return result
+            file_id_cache.delete(digest)
+
+        with open(document, "rb") as file:
+            result = self.bot(
+                "sendDocument", data=data, method=method, input_file={"document": file}
+            )
+        file_id_cache.set(digest, result)
         return result
 
+    def send_chat_action(self, chat_id, action="typing"):
+        """Show the bot status (typing, upload_document, ...) for 5 seconds."""
+        data = {"chat_id": chat_id, "action": action}
+        return self.bot("sendChatAction", data=data, method="POST")
+
     def delete_message(self, chat_id, message_id: int):
         """This Method for delete_Message in telegram."""
         method = "GET"
@@ -259,6 +413,42 @@ class Telegram:
         result = self.bot("deleteMessage", data=data, method=method)
         return result
 
+    def get_updates(self, offset=None, limit=100, timeout=30, allowed_updates=None):
+        """
+        Receive the incoming updates using long polling.
+            offset -> Int : Identifier of the first update to be returned,
+                the updates with smaller id are confirmed and won't be returned again.
+            limit -> Int : 1-100
+            timeout -> Int : Long polling timeout in seconds.
+        """
+        data = {"offset": offset, "limit": limit, "timeout": timeout}
+        if allowed_updates is not None:
+            data["allowed_updates"] = json_codec.dumps(allowed_updates)
+
+        result = self.bot("getUpdates", data=data, method="POST")
+        if result and result.get("ok"):
+            return result["result"]
+
+    def set_webhook(self, url, **kwargs):
+        """
+        Register the webhook url of the bot.
+            **kwargs :
+                secret_token -> Str : Sent in the `X-Telegram-Bot-Api-Secret-Token` header.
+                max_connections -> Int : 1-100
+                allowed_updates -> List
+                drop_pending_updates -> Bool
+        """
+        data = {"url": url}
+        data.update(**kwargs)
+        if allowed_updates := data.get("allowed_updates"):
+            data["allowed_updates"] = json_codec.dumps(allowed_updates)
+        return self.bot("setWebhook", data=data, method="POST")
+
+    def delete_webhook(self, drop_pending_updates=False):
+        """Remove the webhook integration, required before using `get_updates`."""
+        data = {"drop_pending_updates": drop_pending_updates}
+        return self.bot("deleteWebhook", data=data, method="POST")
+
     def remove_inline_keyboard(self, chat_id, message_id, keyboard):
         """Remove or edit the inline keyboard from msg"""
         data = {
@@ -1,7 +1,11 @@
+from django.contrib.auth import get_user_model
 from django.core.cache import cache
 
 from ecommerce.bot.services import MessageService
 from ecommerce.product.models import AccountSession, Product
+from ecommerce.telegram.telegram import Telegram
+
+User = get_user_model()
 
 
 class Validators:
@@ -12,7 +16,11 @@ class Validators:
 
             # cache_key = f"limit-product-purchases:{self.chat_id}" # TODO: limit user to purchases the 3 account per 5 minute...;
             product = Product.objects.order_by("price").first()
-            if self.user_obj.balance < product.price:
+            # The cached user state has a snapshot of the balance, not the DB one.
+            balance = User.objects.values_list("balance", flat=True).get(
+                pk=self.user_obj.pk
+            )
+            if balance < product.price:
                 text = MessageService(self.user_obj).get(step="insufficient-balance-message").text
                 self.bot.send_message(self.chat_id, text)
                 return
@@ -187,7 +195,7 @@ class Validators:
         def wrapper(self):
             if (
                 self.file_id
-                and self.file_size > 1
+                and 1 < self.file_size <= Telegram.max_download_size
                 and (
                     "rar" in self.file_mime_type
                     or "zip" in self.file_mime_type
@@ -0,0 +1,154 @@
+import contextvars
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from utils import json_codec
+from utils.metrics import Counter
+
+# The methods telegram accepts in the webhook response body.
+REPLY_METHODS = frozenset({"sendMessage", "editMessageText", "answerCallbackQuery"})
+
+webhook_replies = Counter(
+    "bot_webhook_replies_total", "Bot API calls answered in the webhook response."
+)
+
+_webhook_reply = contextvars.ContextVar("webhook_reply", default=None)
+
+
+class DeferredResult(dict):
+    """Result of a held Bot API call. The call is sent as soon as the result
+    is read, so the handlers that use it (e.g. the `message_id`) still work.
+    The async code awaits `aresolve` before reading it, the sync read would
+    block the event loop.
+    """
+
+    def __init__(self, reply: "WebhookReply"):
+        super().__init__()
+        self.reply = reply
+        self.resolved = False
+
+    def set_result(self, result):
+        self.resolved = True
+        self.update(result or {})
+
+    def resolve(self):
+        if not self.resolved:
+            self.reply.flush()
+        return self
+
+    async def aresolve(self):
+        if not self.resolved:
+            await self.reply.aflush()
+        return self
+
+    def __getitem__(self, key):
+        return dict.__getitem__(self.resolve(), key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self.resolve(), key)
+
+    def __iter__(self):
+        return dict.__iter__(self.resolve())
+
+    def __len__(self):
+        return dict.__len__(self.resolve())
+
+    def get(self, key, default=None):
+        return dict.get(self.resolve(), key, default)
+
+    def keys(self):
+        return dict.keys(self.resolve())
+
+    def values(self):
+        return dict.values(self.resolve())
+
+    def items(self):
+        return dict.items(self.resolve())
+
+
+class WebhookReply:
+    """Hold the latest eligible Bot API call of the update and return it as
+    the webhook response, which saves an outbound request per update.
+    Only one call is held: a new call sends the held one first, so the calls
+    keep their order and the held call is always the last one of the update.
+    """
+
+    def __init__(self):
+        self.pending = None
+        self.closed = False
+
+    def can_hold(self, telegram_method, input_file=None) -> bool:
+        return not self.closed and telegram_method in REPLY_METHODS and not input_file
+
+    def hold(self, telegram_method, data, send, asend) -> DeferredResult:
+        """Hold the call, `send`/`asend` send it with the sync/async client."""
+        result = DeferredResult(self)
+        self.pending = (telegram_method, data, send, asend, result)
+        return result
+
+    def flush(self):
+        """Send the held call now (sync code)."""
+        if self.pending is not None:
+            _, _, send, _, result = self.pending
+            self.pending = None
+            result.set_result(send())
+
+    async def aflush(self):
+        if self.pending is not None:
+            _, _, _, asend, result = self.pending
+            self.pending = None
+            result.set_result(await asend())
+
+    def take(self) -> Optional[dict]:
+        """Stop holding the calls and return the webhook response of the held call."""
+        self.closed = True
+        if self.pending is None:
+            return None
+
+        telegram_method, data, _, _, result = self.pending
+        self.pending = None
+        result.set_result({"ok": True})
+        webhook_replies.inc()
+        response = {"method": telegram_method}
+        for key, value in data.items():
+            if value is None:
+                continue
+            if key == "reply_markup" and isinstance(value, str):
+                value = json_codec.loads(value)
+            response[key] = value
+        return response
+
+
+def get_webhook_reply() -> Optional[WebhookReply]:
+    return _webhook_reply.get()
+
+
+@contextmanager
+def webhook_reply():
+    """Hold the last eligible Bot API call of the handlers run in the block,
+    return it with `reply.take()` as the webhook response.
+    """
+    reply = WebhookReply()
+    token = _webhook_reply.set(reply)
+    try:
+        yield reply
+    finally:
+        _webhook_reply.reset(token)
+        reply.closed = True
+        # Not taken (error in the view), send it normally.
+        reply.flush()
+
+
+@asynccontextmanager
+async def awebhook_reply():
+    """Async counterpart of `webhook_reply`, the call that is not taken is
+    sent without blocking the event loop.
+    """
+    reply = WebhookReply()
+    token = _webhook_reply.set(reply)
+    try:
+        yield reply
+    finally:
+        _webhook_reply.reset(token)
+        reply.closed = True
+        await reply.aflush()
@@ -0,0 +1,68 @@
+from urllib.parse import urlsplit
+
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from pytest_mock.plugin import MockerFixture
+
+from ecommerce.account.state_cache import UserStateCache
+from ecommerce.bot.catalog import message_catalog
+from ecommerce.bot.update_queue import RedisUpdateQueue
+from ecommerce.telegram.async_telegram import AsyncTelegram
+from ecommerce.telegram.rate_limiter import outbound_limiter
+from ecommerce.telegram.telegram import Telegram
+from utils import redis_client
+from utils.fake_bot_api import FakeBotAPI
+from utils.load_env import config as CONFIG
+from utils.redis_client import get_redis
+
+# The tests run on their own redis DBs, `TEST_REDIS_DB` for the bot keys and
+# the next one for the django cache, so the cleanup does not touch the bot data.
+TEST_REDIS_DB = int(CONFIG.get("TEST_REDIS_DB", 14))
+
+
+def pytest_configure():
+    redis_url = urlsplit(CONFIG.get("REDIS_URL", "redis://127.0.0.1:6379/4"))
+    CONFIG.REDIS_URL = redis_url._replace(path=f"/{TEST_REDIS_DB}").geturl()
+    redis_client._connection = None
+    settings.CACHES["default"]["OPTIONS"]["db"] = str(TEST_REDIS_DB + 1)
+
+
+@pytest.fixture(autouse=True)
+def clear_redis():
+    cache.clear()
+    get_redis().flushdb()
+
+
+@pytest.fixture(autouse=True)
+def clear_message_catalog():
+    # The rollback of the test transaction does not send the Message signals.
+    message_catalog.clear()
+
+
+@pytest.fixture(autouse=True)
+def stop_user_state_flusher(mocker: MockerFixture):
+    # The steps are flushed by the tests.
+    mocker.patch.object(UserStateCache, "start")
+
+
+@pytest.fixture()
+def fake_bot_api(mocker: MockerFixture):
+    api = FakeBotAPI().start()
+    mocker.patch.object(Telegram, "api_url", api.url)
+    mocker.patch.object(AsyncTelegram, "api_url", api.url)
+    yield api
+    api.stop()
+
+
+@pytest.fixture()
+def disable_rate_limit(mocker: MockerFixture):
+    mocker.patch.object(outbound_limiter, "enabled", False)
+
+
+@pytest.fixture()
+def redis_queue():
+    update_queue = RedisUpdateQueue(name="bot:test-updates")
+    for script in (update_queue.put_script, update_queue.done_script):
+        get_redis().script_load(script.script)
+    return update_queue
@@ -0,0 +1,100 @@
+import pytest
+from django.urls import reverse
+from pytest_mock.plugin import MockerFixture
+from rest_framework.test import RequestsClient
+
+from ecommerce.bot.admission import (
+    CRITICAL,
+    LOW,
+    NORMAL,
+    AdmissionController,
+    classify_update,
+    shed_updates,
+)
+from ecommerce.bot.models import Message
+from ecommerce.bot.update_queue import MemoryUpdateQueue
+from utils.load_env import config as CONFIG
+
+
+@pytest.fixture()
+def messages():
+    Message.objects.create(text="profile", current_step="user_profile", key="👤 پروفایل")
+    Message.objects.create(text="⏳ busy", current_step="bot-busy-msg")
+
+
+@pytest.fixture()
+def full_queue(mocker: MockerFixture):
+    update_queue = MemoryUpdateQueue()
+    for update_id in range(3):
+        update_queue.put({"update_id": update_id})
+    mocker.patch("ecommerce.bot.views.get_update_queue", return_value=update_queue)
+    mocker.patch("ecommerce.bot.admission.get_update_queue", return_value=update_queue)
+    mocker.patch.object(CONFIG, "WEBHOOK_MODE", "queue", create=True)
+    mocker.patch(
+        "ecommerce.bot.views.admission_controller",
+        AdmissionController(max_depth=3, depth_interval=0),
+    )
+    return update_queue
+
+
+def text_update(update_id, text):
+    chat = {"id": 111111111}
+    return {"update_id": update_id, "message": {"chat": chat, "from": chat, "text": text}}
+
+
+def callback_update(update_id, data):
+    return {
+        "update_id": update_id,
+        "callback_query": {"id": "1", "from": {"id": 111111111}, "data": data},
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("messages")
+class TestClassifyUpdate:
+    @pytest.mark.parametrize(
+        "update, update_class",
+        [
+            (text_update(1, "/start"), LOW),
+            (text_update(2, "👤 پروفایل"), LOW),
+            (text_update(3, "200000"), NORMAL),
+            (callback_update(4, "country-us"), CRITICAL),
+            (callback_update(5, "login_code-+1555"), CRITICAL),
+            (callback_update(6, "admin-session"), NORMAL),
+        ],
+    )
+    def test_classify(self, update, update_class):
+        assert classify_update(update) == update_class
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("messages", "full_queue")
+class TestLoadShedding:
+    def test_reply_busy_to_low_priority_update(self, client: RequestsClient):
+        replied = shed_updates.value(action="replied")
+
+        url = reverse("bot:webhook")
+        response = client.post(url, data=text_update(10, "/start"), content_type="application/json")
+
+        assert response.json() == {
+            "method": "sendMessage",
+            "chat_id": 111111111,
+            "text": "⏳ busy",
+        }
+        assert shed_updates.value(action="replied") == replied + 1
+
+    def test_keep_purchase_and_payment_updates(self, full_queue, client: RequestsClient):
+        url = reverse("bot:webhook")
+        for update in (callback_update(11, "country-us"), text_update(12, "200000")):
+            response = client.post(url, data=update, content_type="application/json")
+            assert response.json() == "ok"
+
+        assert full_queue.depth() == 5
+
+    def test_admit_below_max_depth(self, full_queue, client: RequestsClient):
+        full_queue.get(timeout=0)
+
+        url = reverse("bot:webhook")
+        response = client.post(url, data=text_update(13, "/start"), content_type="application/json")
+
+        assert response.json() == "ok"
@@ -0,0 +1,85 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+from django.urls import reverse
+
+from ecommerce.account.state_cache import user_states
+from ecommerce.bot.models import Message
+
+User = get_user_model()
+
+
+@pytest.fixture()
+def default_msg_objs():
+    Message.objects.bulk_create(
+        objs=[
+            Message(text="⚠️ spam", current_step="anti-spam-msg"),
+            Message(
+                text="سلام به ربات تست خوش اومدید",
+                current_step="home_page",
+                key="/start",
+                keys="👤 پروفایل\n🛍 خرید شماره",
+            ),
+            Message(
+                text="🇮🇷 زبان",
+                current_step="choice-language",
+                keys="🇮🇷 فارسی:persian:\n🇺🇸 English:english:",
+                is_inline_keyboard=True,
+            ),
+        ]
+    )
+
+
+def start_update(update_id, chat_id=111111111):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": 1,
+            "from": {"id": chat_id},
+            "chat": {"id": chat_id, "first_name": "test"},
+            "text": "/start",
+        },
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("default_msg_objs")
+class TestAsyncWebhook:
+    url = reverse("bot:async-webhook")
+
+    def post(self, data):
+        client = AsyncClient()
+        return async_to_sync(client.post)(
+            self.url, data=data, content_type="application/json"
+        )
+
+    def test_start_command(self, fake_bot_api):
+        User.objects.create(username="test-user", user_id=111111111, language="fa")
+
+        response = self.post(start_update(7000))
+
+        assert response.json() == "ok"
+        send_message_calls = fake_bot_api.calls_of("sendMessage")
+        assert send_message_calls[0]["text"] == "سلام به ربات تست خوش اومدید"
+        assert "keyboard" in send_message_calls[0]["reply_markup"]
+        # The step is written behind, to the DB by the flush.
+        assert user_states.get(111111111).step == "home_page"
+        user_states.flush()
+        assert User.objects.get(user_id=111111111).step == "home_page"
+
+    def test_new_user_choice_language(self, fake_bot_api):
+        self.post(start_update(7001, chat_id=222222222))
+
+        assert User.objects.filter(user_id=222222222).exists()
+        send_message_calls = fake_bot_api.calls_of("sendMessage")
+        assert "inline_keyboard" in send_message_calls[0]["reply_markup"]
+
+    def test_skip_duplicate_update(self, fake_bot_api):
+        User.objects.create(username="test-user", user_id=111111111, language="fa")
+
+        self.post(start_update(7002))
+        response = self.post(start_update(7002))
+
+        assert response.json() == "duplicate"
+        assert len(fake_bot_api.calls_of("sendMessage")) == 1
@@ -0,0 +1,173 @@
+import threading
+
+import pytest
+from pytest_mock.plugin import MockerFixture
+
+from ecommerce.account.models import User
+from ecommerce.bot.broadcast import (
+    ABORTED,
+    BLOCKED,
+    DELIVERED,
+    DONE,
+    FAILED,
+    QUEUED,
+    Broadcaster,
+    BroadcastStore,
+    broadcast_messages,
+    queue_broadcast,
+)
+from ecommerce.bot.models import Message
+from ecommerce.telegram.telegram import Telegram
+
+pytestmark = pytest.mark.usefixtures("disable_rate_limit")
+
+
+@pytest.fixture()
+def messages():
+    Message.objects.create(
+        text="{status} {total} {delivered} {blocked} {failed}",
+        current_step="admin-broadcast-status",
+    )
+    Message.objects.create(text="news", current_step="broadcast-news")
+
+
+@pytest.fixture()
+def users():
+    for user_id in range(1, 8):
+        User.objects.create(
+            username=str(user_id),
+            user_id=user_id,
+            language="en" if user_id % 2 else "fa",
+            is_active=user_id != 7,
+            is_send_ads=True,
+        )
+    # Opted out of the ads.
+    User.objects.create(username="8", user_id=8)
+    return list(range(1, 7))
+
+
+def sent_chat_ids(api, method):
+    return sorted(int(params["chat_id"]) for params in api.calls_of(method))
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("messages")
+class TestBroadcaster:
+    def test_copy_post_to_active_users(self, fake_bot_api, users):
+        store = BroadcastStore()
+        store.create(kind="copy", from_chat_id=100, message_id=5, admin_chat_id=100)
+        broadcast_id = store.next(timeout=1)
+
+        assert Broadcaster(store, batch_size=4).run(broadcast_id)
+
+        assert sent_chat_ids(fake_bot_api, "copyMessage") == users
+        broadcast = store.get(broadcast_id)
+        assert broadcast["status"] == DONE
+        assert broadcast[DELIVERED] == "6"
+        assert broadcast["cursor"] == str(User.objects.get(user_id=6).pk)
+        assert store.recover() == 0
+
+    def test_count_blocked_and_failed(self, fake_bot_api, users):
+        fake_bot_api.set_response(
+            "copyMessage",
+            403,
+            {"ok": False, "error_code": 403, "description": "bot was blocked"},
+            times=2,
+        )
+        store = BroadcastStore()
+        broadcast_id = store.create(kind="copy", from_chat_id=100, message_id=5)
+        blocked = broadcast_messages.value(result=BLOCKED)
+
+        Broadcaster(store, batch_size=10).run(broadcast_id)
+
+        broadcast = store.get(broadcast_id)
+        assert (broadcast[DELIVERED], broadcast[BLOCKED], broadcast[FAILED]) == (
+            "4",
+            "2",
+            "0",
+        )
+        assert broadcast_messages.value(result=BLOCKED) == blocked + 2
+
+    def test_resume_from_checkpoint(self, fake_bot_api, users):
+        store = BroadcastStore()
+        store.create(kind="copy", from_chat_id=100, message_id=5)
+        broadcast_id = store.next(timeout=1)
+        stop_event = threading.Event()
+        stop_event.set()
+
+        # Stopped after the first batch, it stays in the running list.
+        assert not Broadcaster(store, batch_size=4).run(broadcast_id, stop_event)
+        assert store.get(broadcast_id)[DELIVERED] == "4"
+        assert store.recover() == 1
+
+        assert Broadcaster(store, batch_size=4).run(store.next(timeout=1))
+        # Every user got the post once.
+        assert sent_chat_ids(fake_bot_api, "copyMessage") == users
+        assert store.get(broadcast_id)[DELIVERED] == "6"
+
+    def test_abort_failed_broadcast(self, fake_bot_api, users, mocker: MockerFixture):
+        store = BroadcastStore()
+        store.create(kind="copy", from_chat_id=100, message_id=5, admin_chat_id=100)
+        broadcast_id = store.next(timeout=1)
+        broadcaster = Broadcaster(store)
+        mocker.patch.object(broadcaster, "send_batch", side_effect=RuntimeError())
+
+        with pytest.raises(RuntimeError):
+            broadcaster.run(broadcast_id)
+        broadcaster.abort(broadcast_id)
+
+        assert store.get(broadcast_id)["status"] == ABORTED
+        # Not resumed by the next runner.
+        assert store.recover() == 0
+        status = fake_bot_api.calls_of("sendMessage")[-1]
+        assert status["chat_id"] == "100"
+        assert status["text"] == "ارسال متوقف شد ❌ 0 0 0 0"
+
+    def test_template_per_language(self, fake_bot_api, users, mocker: MockerFixture):
+        gettext = mocker.patch(
+            "ecommerce.bot.catalog.gettext", side_effect=lambda text: f"en:{text}"
+        )
+        store = BroadcastStore()
+        broadcast_id = store.create(kind="template", step="broadcast-news")
+
+        Broadcaster(store).run(broadcast_id)
+
+        texts = {
+            int(params["chat_id"]): params["text"]
+            for params in fake_bot_api.calls_of("sendMessage")
+        }
+        assert texts == {
+            user_id: "en:news" if user_id % 2 else "news" for user_id in users
+        }
+        # The two messages are translated once when the catalog loads, not per user.
+        assert gettext.call_count == 2
+
+    def test_edit_status_message(self, fake_bot_api, users):
+        store = BroadcastStore()
+        broadcast_id = store.create(
+            kind="copy",
+            from_chat_id=100,
+            message_id=5,
+            admin_chat_id=100,
+            status_message_id=9,
+            total=6,
+        )
+
+        Broadcaster(store, status_interval=60).run(broadcast_id)
+
+        edits = fake_bot_api.calls_of("editMessageText")
+        assert [edit["message_id"] for edit in edits] == ["9", "9"]
+        assert edits[-1]["text"] == "ارسال شد ✅ 6 6 0 0"
+
+    def test_queue_broadcast(self, fake_bot_api, users):
+        broadcast_id = queue_broadcast(Telegram(), 100, "template:broadcast-news", 5)
+
+        broadcast = BroadcastStore().get(broadcast_id)
+        assert broadcast["kind"] == "template"
+        assert broadcast["step"] == "broadcast-news"
+        assert broadcast["total"] == "6"
+        assert broadcast["status"] == QUEUED
+        status = fake_bot_api.calls_of("sendMessage")[0]
+        assert broadcast["status_message_id"] == "1"
+        assert status["text"] == "در صف ارسال ⏳ 6 0 0 0"
+        assert BroadcastStore().next(timeout=1) == broadcast_id
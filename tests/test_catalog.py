@@ -0,0 +1,174 @@
+import dataclasses
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from pytest_mock.plugin import MockerFixture
+
+from ecommerce.bot.catalog import MessageCatalog, catalog_loads, message_catalog
+from ecommerce.bot.models import Message
+from ecommerce.bot.services import MessageService
+from ecommerce.telegram.async_telegram import run_sync
+from utils.redis_client import get_redis
+
+
+@pytest.fixture()
+def messages():
+    return [
+        Message.objects.create(text="home", current_step="home_page"),
+        Message.objects.create(
+            text="profile",
+            current_step="user_profile",
+            key="👤 پروفایل",
+            keys="👤 پروفایل\n🏠 خانه",
+        ),
+        Message.objects.create(text="admin", current_step="admin-home", key="🏠 خانه"),
+    ]
+
+
+@pytest.mark.django_db
+class TestMessageCatalog:
+    def test_lookups_without_queries(self, messages):
+        message_catalog.get("home_page")
+
+        with CaptureQueriesContext(connection) as context:
+            assert message_catalog.get("home_page").text == "home"
+            assert message_catalog.get_step("👤 پروفایل") == "user_profile"
+            assert message_catalog.exists("admin-home")
+            assert [msg.text for msg in message_catalog.filter(key="🏠 خانه")] == [
+                "admin"
+            ]
+
+        assert context.captured_queries == []
+
+    def test_get_errors(self, messages):
+        Message.objects.create(text="home 2", current_step="home_page")
+
+        with pytest.raises(Message.DoesNotExist):
+            message_catalog.get("unknown")
+        with pytest.raises(Message.MultipleObjectsReturned):
+            message_catalog.get("home_page")
+
+    def test_variants_are_immutable(self, messages):
+        msg = message_catalog.get("user_profile")
+
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            msg.text = "changed"
+
+        changed = msg.replace(keys="a\nb\nc")
+        assert changed.reply_markup["keyboard"] == [["a", "b"], ["c"]]
+        assert message_catalog.get("user_profile") is msg
+
+    def test_variant_per_language(self, messages, mocker: MockerFixture):
+        gettext = mocker.patch(
+            "ecommerce.bot.catalog.gettext", side_effect=lambda text: f"en:{text}"
+        )
+
+        for _ in range(3):
+            profile = message_catalog.get("user_profile", "en")
+
+        assert profile.text == "en:profile"
+        assert profile.reply_markup["keyboard"] == [["en:👤 پروفایل", "🏠 خانه"]]
+        assert message_catalog.get("user_profile", "fa").text == "profile"
+        assert message_catalog.get("user_profile", None).text == "profile"
+        # Translated when the catalog loaded, not on the lookups.
+        assert gettext.call_count == 4
+
+    def test_new_language_is_built_once(self, messages, mocker: MockerFixture):
+        message_catalog.get("home_page")
+        gettext = mocker.patch("ecommerce.bot.catalog.gettext", side_effect=str.upper)
+
+        assert message_catalog.get("user_profile", "de").text == "PROFILE"
+        message_catalog.get("home_page", "de")
+        assert gettext.call_count == 4
+
+    def test_malformed_keys(self, messages):
+        Message.objects.create(
+            text="pay", current_step="pay", keys="no-callback", is_inline_keyboard=True
+        )
+
+        assert message_catalog.get("pay").reply_markup is None
+        assert message_catalog.get("home_page").text == "home"
+
+    def test_localize_labels(self, messages, mocker: MockerFixture):
+        translations = {
+            "en": [
+                ("👤 پروفایل\n🏠 خانه", "👤 Profile\n🏠 Home"),
+                ("profile", "Profile"),
+            ],
+            "fa": [("🏠 Main menu", "🏠 خانه")],
+        }
+        mocker.patch(
+            "ecommerce.bot.catalog.get_translations",
+            side_effect=lambda language: translations.get(language, []),
+        )
+        message_catalog.get("home_page")
+
+        with CaptureQueriesContext(connection) as context:
+            assert message_catalog.localize("👤 Profile") == "👤 پروفایل"
+            assert message_catalog.localize("🏠 Home") == "🏠 خانه"
+            assert message_catalog.localize("🏠 Main menu") == "🏠 خانه"
+            assert message_catalog.get_step("👤 Profile") == "user_profile"
+
+        assert context.captured_queries == []
+        # Only the button labels are mapped.
+        assert message_catalog.localize("Profile") == "Profile"
+        assert message_catalog.localize("25000") == "25000"
+        assert message_catalog.localize({}) == {}
+
+    def test_reload_on_save_and_delete(self, messages):
+        message_catalog.get("home_page")
+        loads = catalog_loads.value()
+
+        messages[0].text = "new home"
+        messages[0].save()
+        assert message_catalog.get("home_page").text == "new home"
+
+        messages[1].delete()
+        assert message_catalog.get_step("👤 پروفایل") is None
+        assert catalog_loads.value() == loads + 2
+
+    def test_reload_on_version_change(self, messages, mocker: MockerFixture):
+        catalog = MessageCatalog(check_interval=0.001)
+        catalog.get("home_page")
+        loads = catalog_loads.value()
+
+        # Saved by another process.
+        Message.objects.filter(current_step="home_page").update(text="new home")
+        assert catalog.get("home_page").text == "home"
+
+        clock = mocker.patch("ecommerce.bot.catalog.time.monotonic")
+        clock.return_value = catalog.checked_at + 1
+        get_redis().incr(catalog.version_key)
+
+        assert catalog.get("home_page").text == "new home"
+        assert catalog_loads.value() == loads + 1
+
+    def test_no_reload_on_event_loop(self, messages, mocker: MockerFixture):
+        catalog = MessageCatalog(check_interval=0.001)
+        catalog.get("home_page")
+        loads = catalog_loads.value()
+
+        Message.objects.filter(current_step="home_page").update(text="new home")
+        clock = mocker.patch("ecommerce.bot.catalog.time.monotonic")
+        clock.return_value = catalog.checked_at + 1
+        get_redis().incr(catalog.version_key)
+
+        async def lookup():
+            return catalog.get("home_page").text, catalog.get_step("👤 پروفایل")
+
+        assert run_sync(lookup()) == ("home", "user_profile")
+        assert catalog_loads.value() == loads
+        assert catalog.get("home_page").text == "new home"
+
+    def test_service_filters(self, messages):
+        service = MessageService(type("User", (), {"language": "fa"}))
+
+        assert [msg.current_step for msg in service.filter_user_msgs()] == [
+            "home_page",
+            "user_profile",
+        ]
+        assert [msg.current_step for msg in service.filter_admin_msgs()] == [
+            "admin-home"
+        ]
+        assert run_sync(service.aget_step("👤 پروفایل")) == "user_profile"
@@ -0,0 +1,103 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from pytest_mock.plugin import MockerFixture
+from rest_framework.test import RequestsClient
+
+from ecommerce.telegram.chat_member_cache import (
+    ChatMemberCache,
+    chat_member_hit_ratio,
+    chat_member_lookups,
+)
+from ecommerce.telegram.telegram import Telegram
+
+
+def member_response(status="member"):
+    return {"ok": True, "result": {"status": status, "user": {"id": 111111111}}}
+
+
+def chat_member_update(update_id, status="member"):
+    return {
+        "update_id": update_id,
+        "chat_member": {
+            "chat": {"id": -1001, "username": "Channel", "type": "channel"},
+            "old_chat_member": {"status": "left", "user": {"id": 111111111}},
+            "new_chat_member": {"status": status, "user": {"id": 111111111}},
+        },
+    }
+
+
+class TestChatMemberCache:
+    def test_cache_member(self, fake_bot_api):
+        fake_bot_api.set_response("getChatMember", 200, member_response())
+        hits = chat_member_lookups.value(result="hit")
+
+        first = Telegram().get_chat_member("Channel", 111111111)
+        second = Telegram().get_chat_member("Channel", 111111111)
+
+        assert first == second == member_response()["result"]
+        assert len(fake_bot_api.calls_of("getChatMember")) == 1
+        assert chat_member_lookups.value(result="hit") == hits + 1
+        assert 0 < chat_member_hit_ratio.value() <= 1
+
+    def test_cache_not_found_user(self, fake_bot_api):
+        fake_bot_api.set_response(
+            "getChatMember",
+            400,
+            {"ok": False, "error_code": 400, "description": "Bad Request: user not found"},
+        )
+
+        assert Telegram().get_chat_member("Channel", 111111111) is None
+        assert Telegram().get_chat_member("Channel", 111111111) is None
+        assert len(fake_bot_api.calls_of("getChatMember")) == 1
+
+    def test_chat_error_is_not_cached(self, fake_bot_api):
+        fake_bot_api.set_response(
+            "getChatMember",
+            400,
+            {"ok": False, "error_code": 400, "description": "Bad Request: chat not found"},
+        )
+
+        assert Telegram().get_chat_member("Channel", 111111111) is None
+        assert Telegram().get_chat_member("Channel", 111111111) is None
+        assert len(fake_bot_api.calls_of("getChatMember")) == 2
+
+    def test_negative_ttl(self, mocker: MockerFixture):
+        spy_set = mocker.spy(cache, "set")
+        member_cache = ChatMemberCache(ttl=10, negative_ttl=100)
+
+        member_cache.set("@channel", 1, {"status": "member"})
+        member_cache.set("@channel", 2, {"status": "left"})
+        member_cache.set("@channel", 3, {"status": "restricted", "is_member": False})
+
+        assert [call.kwargs["timeout"] for call in spy_set.call_args_list] == [
+            10,
+            100,
+            100,
+        ]
+
+    def test_api_error_is_not_cached(self, fake_bot_api):
+        fake_bot_api.set_response(
+            "getChatMember", 502, {"ok": False, "error_code": 502}, times=1
+        )
+
+        assert Telegram().get_chat_member("Channel", 111111111) is None
+        Telegram().get_chat_member("Channel", 111111111)
+
+        assert len(fake_bot_api.calls_of("getChatMember")) == 2
+
+
+@pytest.mark.django_db
+def test_invalidate_on_chat_member_update(fake_bot_api, client: RequestsClient):
+    fake_bot_api.set_response("getChatMember", 200, member_response("left"))
+    Telegram().get_chat_member("Channel", 111111111)
+
+    url = reverse("bot:webhook")
+    response = client.post(
+        url, data=chat_member_update(1), content_type="application/json"
+    )
+    fake_bot_api.set_response("getChatMember", 200, member_response())
+
+    assert response.status_code == 200
+    assert Telegram().get_chat_member("Channel", 111111111)["status"] == "member"
+    assert len(fake_bot_api.calls_of("getChatMember")) == 2
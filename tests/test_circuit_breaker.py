@@ -0,0 +1,128 @@
+import pytest
+from pytest_mock.plugin import MockerFixture
+
+from ecommerce.telegram import circuit_breaker
+from ecommerce.telegram.async_telegram import AsyncTelegram, run_sync
+from ecommerce.telegram.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    api_errors,
+    api_latency,
+    circuit_rejected,
+    get_circuit_breaker,
+)
+from ecommerce.telegram.telegram import Telegram
+
+
+@pytest.fixture(autouse=True)
+def reset_breakers(mocker: MockerFixture):
+    mocker.patch.dict(circuit_breaker._breakers, clear=True)
+
+
+@pytest.fixture()
+def clock(mocker: MockerFixture):
+    clock = mocker.patch("ecommerce.telegram.circuit_breaker.time.monotonic")
+    clock.return_value = 100.0
+    return clock
+
+
+def bad_gateway():
+    return {"ok": False, "error_code": 502, "description": "Bad Gateway"}
+
+
+class TestCircuitBreaker:
+    def test_open_after_failures(self, clock):
+        breaker = CircuitBreaker("sendMessage", failure_threshold=3)
+
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.record(False)
+
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker("sendMessage", failure_threshold=2)
+
+        breaker.record(False)
+        breaker.record(True)
+        breaker.record(False)
+
+        assert breaker.state == CLOSED
+
+    def test_probe_after_recovery_timeout(self, clock):
+        breaker = CircuitBreaker(
+            "sendMessage", failure_threshold=1, recovery_timeout=30
+        )
+        breaker.record(False)
+
+        clock.return_value = 131.0
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        # One probe at a time.
+        assert not breaker.allow()
+
+        breaker.record(True)
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+    def test_failed_probe_opens_again(self, clock):
+        breaker = CircuitBreaker(
+            "sendMessage", failure_threshold=1, recovery_timeout=30
+        )
+        breaker.record(False)
+        clock.return_value = 131.0
+
+        assert breaker.allow()
+        breaker.record(False)
+
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+
+class TestTelegramCircuit:
+    def test_fail_fast(self, fake_bot_api, mocker: MockerFixture):
+        mocker.patch.object(get_circuit_breaker("getMe"), "failure_threshold", 2)
+        fake_bot_api.set_response("getMe", 502, bad_gateway())
+        rejected = circuit_rejected.value(method="getMe")
+
+        results = [Telegram().bot("getMe", data={}) for _ in range(3)]
+
+        assert results[:2] == [bad_gateway(), bad_gateway()]
+        assert results[2] is None
+        # The third call did not reach the api.
+        assert len(fake_bot_api.calls_of("getMe")) == 2
+        assert circuit_rejected.value(method="getMe") == rejected + 1
+
+    def test_client_errors_do_not_open(self, fake_bot_api, mocker: MockerFixture):
+        mocker.patch.object(get_circuit_breaker("getChat"), "failure_threshold", 1)
+        fake_bot_api.set_response(
+            "getChat", 400, {"ok": False, "error_code": 400, "description": "not found"}
+        )
+
+        Telegram().bot("getChat", data={})
+        Telegram().bot("getChat", data={})
+
+        assert get_circuit_breaker("getChat").state == CLOSED
+        assert len(fake_bot_api.calls_of("getChat")) == 2
+
+    def test_network_error(self, mocker: MockerFixture):
+        mocker.patch.object(Telegram, "api_url", "http://127.0.0.1:1")
+        errors = api_errors.value(method="getWebhookInfo", error="ConnectionError")
+
+        assert Telegram().bot("getWebhookInfo", data={}) is None
+
+        assert api_errors.value(method="getWebhookInfo", error="ConnectionError") == (
+            errors + 1
+        )
+        assert get_circuit_breaker("getWebhookInfo").failures == 1
+
+    def test_latency_per_method(self, fake_bot_api):
+        count = api_latency.count(method="sendChatAction")
+
+        Telegram().send_chat_action(1)
+        run_sync(AsyncTelegram().send_chat_action(1))
+
+        assert api_latency.count(method="sendChatAction") == count + 2
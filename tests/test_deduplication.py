@@ -0,0 +1,101 @@
+import pytest
+from django.urls import reverse
+from pytest_mock.plugin import MockerFixture
+from rest_framework.test import RequestsClient
+
+from ecommerce.bot.deduplication import UpdateDeduplicator, duplicate_updates
+from ecommerce.bot.models import Message
+from ecommerce.bot.update_queue import MemoryUpdateQueue
+from utils.load_env import config as CONFIG
+
+
+@pytest.fixture()
+def anti_spam_msg():
+    Message.objects.create(text="⚠️ spam", current_step="anti-spam-msg")
+
+
+class TestUpdateDeduplicator:
+    def test_drop_redelivered_update(self):
+        deduplicator = UpdateDeduplicator()
+        dropped = duplicate_updates.value()
+
+        assert deduplicator.is_duplicate(5000) is False
+        assert deduplicator.is_duplicate(5000) is True
+        assert deduplicator.is_duplicate(5001) is False
+        assert duplicate_updates.value() == dropped + 1
+
+    def test_update_without_id(self):
+        deduplicator = UpdateDeduplicator()
+
+        assert deduplicator.is_duplicate(None) is False
+        assert deduplicator.is_duplicate(None) is False
+
+    def test_local_lru_when_redis_is_down(self, mocker: MockerFixture):
+        mocker.patch(
+            "ecommerce.bot.deduplication.cache.add", side_effect=ConnectionError()
+        )
+        deduplicator = UpdateDeduplicator(local_size=2)
+
+        assert deduplicator.is_duplicate(1) is False
+        assert deduplicator.is_duplicate(1) is True
+        deduplicator.is_duplicate(2)
+        deduplicator.is_duplicate(3)
+        # The oldest update id is evicted from the bounded LRU.
+        assert deduplicator.is_duplicate(1) is False
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("anti_spam_msg")
+def test_webhook_process_update_once(mocker: MockerFixture, client: RequestsClient):
+    mocked_text_handler = mocker.patch("ecommerce.bot.views.text_handler")
+    update = {
+        "update_id": 6000,
+        "message": {"chat": {"id": 111111111}, "text": "/start"},
+    }
+
+    url = reverse("bot:webhook")
+    client.post(url, data=update, content_type="application/json")
+    client.post(url, data=update, content_type="application/json")
+
+    mocked_text_handler.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_retry_accepted_when_enqueue_fails(
+    mocker: MockerFixture, client: RequestsClient
+):
+    update_queue = MemoryUpdateQueue()
+    mocker.patch.object(CONFIG, "WEBHOOK_MODE", "queue", create=True)
+    mocker.patch("ecommerce.bot.views.get_update_queue", return_value=update_queue)
+    mocker.patch(
+        "ecommerce.bot.views.admission_controller.admit", return_value=(True, None)
+    )
+    put = mocker.patch.object(
+        update_queue, "put", side_effect=[ConnectionError(), None]
+    )
+    update = {
+        "update_id": 6001,
+        "message": {"chat": {"id": 111111111}, "text": "/start"},
+    }
+
+    url = reverse("bot:webhook")
+    with pytest.raises(ConnectionError):
+        client.post(url, data=update, content_type="application/json")
+
+    # Telegram re-delivers the update that got an error response.
+    response = client.post(url, data=update, content_type="application/json")
+
+    assert response.json() == "ok"
+    assert put.call_count == 2
+
+
+def test_release_local_claim(mocker: MockerFixture):
+    mocker.patch("ecommerce.bot.deduplication.cache.add", side_effect=ConnectionError())
+    mocker.patch(
+        "ecommerce.bot.deduplication.cache.delete", side_effect=ConnectionError()
+    )
+    deduplicator = UpdateDeduplicator()
+
+    assert deduplicator.is_duplicate(7000) is False
+    deduplicator.release(7000)
+    assert deduplicator.is_duplicate(7000) is False
@@ -0,0 +1,53 @@
+import threading
+import time
+from collections import defaultdict
+
+from ecommerce.bot.dispatcher import ChatShardedDispatcher, get_update_chat_id
+
+
+def text_update(update_id, chat_id):
+    return {
+        "update_id": update_id,
+        "message": {"from": {"id": chat_id}, "chat": {"id": chat_id}, "text": "/start"},
+    }
+
+
+class TestChatShardedDispatcher:
+    def test_get_update_chat_id(self):
+        callback_update = {"callback_query": {"from": {"id": 20}, "data": "country-us"}}
+
+        assert get_update_chat_id(text_update(1, 10)) == 10
+        assert get_update_chat_id(callback_update) == 20
+        assert get_update_chat_id({"update_id": 1}) is None
+
+    def test_keep_chat_updates_order(self):
+        processed = defaultdict(list)
+        lock = threading.Lock()
+
+        def handler(update):
+            time.sleep(0.001)
+            with lock:
+                processed[get_update_chat_id(update)].append(update["update_id"])
+
+        dispatcher = ChatShardedDispatcher(handler, workers=4)
+        dispatcher.start()
+        for update_id in range(200):
+            dispatcher.submit(text_update(update_id, chat_id=update_id % 7))
+        dispatcher.stop()
+
+        assert sum(map(len, processed.values())) == 200
+        for update_ids in processed.values():
+            assert update_ids == sorted(update_ids)
+
+    def test_call_on_done_after_handler_error(self):
+        acked = []
+
+        def handler(update):
+            raise ValueError()
+
+        dispatcher = ChatShardedDispatcher(handler, workers=1)
+        dispatcher.start()
+        dispatcher.submit(text_update(1, 10), on_done=lambda: acked.append(1))
+        dispatcher.stop()
+
+        assert acked == [1]
@@ -0,0 +1,23 @@
+import json
+
+import pytest
+
+from utils import json_codec
+
+
+class TestJsonCodec:
+    def test_roundtrip(self):
+        keys = {"inline_keyboard": [[{"text": "🇮🇷 ایران", "callback_data": "country-ir"}]]}
+
+        encoded = json_codec.dumps(keys)
+
+        assert isinstance(encoded, str)
+        assert json.loads(encoded) == keys
+        assert json_codec.loads(encoded.encode()) == keys
+
+    def test_non_str_keys(self):
+        assert json.loads(json_codec.dumps({1: "a"})) == {"1": "a"}
+
+    def test_invalid_json(self):
+        with pytest.raises(ValueError):
+            json_codec.loads(b"{invalid")
@@ -0,0 +1,97 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from pytest_mock.plugin import MockerFixture
+
+from ecommerce.bot.catalog import message_catalog
+from ecommerce.bot.models import Message
+from ecommerce.product.models import AccountSession, Product
+from ecommerce.telegram.handlers.base_handler import BaseHandler
+from ecommerce.telegram.keyboard_cache import (
+    country_keyboard_lookups,
+    country_keyboards,
+)
+from utils import json_codec
+
+
+@pytest.fixture(autouse=True)
+def clear_keyboards(mocker: MockerFixture):
+    mocker.patch.dict(country_keyboards.keyboards, clear=True)
+
+
+@pytest.fixture()
+def stock():
+    Message.objects.create(
+        text="countries", current_step="buy_phone_number", is_inline_keyboard=True
+    )
+    product = Product.objects.create(name="Iran", country_code="ir", price=25000)
+    return AccountSession.objects.create(
+        product=product, status=AccountSession.StatusChoices.active
+    )
+
+
+@pytest.mark.django_db
+class TestCountryKeyboardCache:
+    def test_cached_keyboard(self, stock):
+        msg = message_catalog.get("buy_phone_number")
+        hits = country_keyboard_lookups.value(result="hit")
+        keyboard = country_keyboards.get(msg)
+
+        with CaptureQueriesContext(connection) as context:
+            assert country_keyboards.get(msg) is keyboard
+
+        assert context.captured_queries == []
+        assert country_keyboard_lookups.value(result="hit") == hits + 1
+        assert keyboard.reply_markup == {
+            "inline_keyboard": [
+                [{"text": "25,000 | Iran", "callback_data": "country-ir"}]
+            ]
+        }
+
+    def test_rebuilt_on_stock_change(self, stock):
+        msg = message_catalog.get("buy_phone_number")
+        country_keyboards.get(msg)
+
+        stock.status = AccountSession.StatusChoices.purchased
+        stock.save(update_fields=["status"])
+
+        assert country_keyboards.get(msg).reply_markup is None
+
+    def test_rebuilt_on_version_change(self, stock, mocker: MockerFixture):
+        msg = message_catalog.get("buy_phone_number")
+        country_keyboards.get(msg)
+        build = mocker.spy(country_keyboards, "build")
+
+        # Changed by another process.
+        cache.incr(country_keyboards.version_key)
+        country_keyboards.get(msg)
+
+        assert build.call_count == 1
+
+    def test_keyboard_per_language(self, stock, mocker: MockerFixture):
+        mocker.patch(
+            "ecommerce.bot.catalog.gettext", side_effect=lambda text: f"en:{text}"
+        )
+
+        fa = country_keyboards.get(message_catalog.get("buy_phone_number", "fa"))
+        en = country_keyboards.get(message_catalog.get("buy_phone_number", "en"))
+
+        assert fa.text == "countries"
+        assert en.text == "en:countries"
+        assert set(country_keyboards.keyboards) == {"fa", "en"}
+
+
+@pytest.mark.django_db
+def test_serialized_reply_markup():
+    Message.objects.create(text="home", current_step="home_page", keys="a\nb\nc")
+    msg = message_catalog.get("home_page")
+
+    reply_markup = BaseHandler.generate_keyboards(None, msg)
+
+    assert reply_markup is msg.reply_markup_json
+    assert json_codec.loads(reply_markup) == {
+        "keyboard": [["a", "b"], ["c"]],
+        "resize_keyboard": True,
+        "one_time_keyboard": True,
+    }
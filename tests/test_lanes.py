@@ -0,0 +1,191 @@
+import pytest
+from django.urls import reverse
+from pytest_mock.plugin import MockerFixture
+from rest_framework.test import RequestsClient
+
+from ecommerce.account.models import User
+from ecommerce.bot.lanes import classify_lane, order_by_lane
+from ecommerce.bot.models import Message
+from ecommerce.bot.update_queue import (
+    ADMIN,
+    BROWSING,
+    PURCHASE,
+    MemoryUpdateQueue,
+    WeightedLaneScheduler,
+)
+from utils.load_env import config as CONFIG
+
+
+@pytest.fixture()
+def messages():
+    Message.objects.create(
+        text="profile", current_step="user_profile", key="👤 پروفایل"
+    )
+    Message.objects.create(
+        text="crypto", current_step="crypto-get-amount", key="🪙 کریپتو"
+    )
+    Message.objects.create(text="⚠️ spam", current_step="anti-spam-msg")
+
+
+def text_update(update_id, text, user_id=111111111):
+    chat = {"id": user_id}
+    return {
+        "update_id": update_id,
+        "message": {"chat": chat, "from": chat, "text": text},
+    }
+
+
+def callback_update(update_id, data, user_id=111111111):
+    return {
+        "update_id": update_id,
+        "callback_query": {"id": "1", "from": {"id": user_id}, "data": data},
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("messages")
+class TestClassifyLane:
+    @pytest.mark.parametrize(
+        "update, lane",
+        [
+            (text_update(1, "/start"), BROWSING),
+            (text_update(2, "👤 پروفایل"), BROWSING),
+            (text_update(3, "🪙 کریپتو"), PURCHASE),
+            (callback_update(4, "country-us"), PURCHASE),
+            (callback_update(5, "login_code-+1555"), PURCHASE),
+            (callback_update(6, "block_user-1"), ADMIN),
+        ],
+    )
+    def test_classify(self, update, lane):
+        assert classify_lane(update) == lane
+
+    @pytest.mark.parametrize(
+        "step, lane",
+        [
+            ("crypto-get-amount", PURCHASE),
+            ("admin-get-user-info", ADMIN),
+            ("home_page", BROWSING),
+        ],
+    )
+    def test_classify_input_by_user_step(self, step, lane):
+        User.objects.create(username="user", user_id=2000, step=step)
+
+        assert classify_lane(text_update(7, "200000", user_id=2000)) == lane
+
+
+class TestWeightedLanes:
+    def test_scheduler_weights(self):
+        scheduler = WeightedLaneScheduler({PURCHASE: 3, ADMIN: 0, BROWSING: 1})
+        picked = [scheduler.order()[0] for _ in range(8)]
+
+        assert picked.count(PURCHASE) == 6
+        assert picked.count(BROWSING) == 2
+
+    def test_drain_by_weight(self):
+        update_queue = MemoryUpdateQueue(
+            WeightedLaneScheduler({PURCHASE: 2, ADMIN: 1, BROWSING: 1})
+        )
+        for update_id in range(10):
+            update_queue.put({"update_id": update_id}, lane=BROWSING)
+        update_queue.put({"update_id": 100}, lane=PURCHASE)
+        update_queue.put({"update_id": 101}, lane=PURCHASE)
+
+        drained = [update_queue.get(timeout=0)[1]["update_id"] for _ in range(4)]
+
+        # The purchases skip the browsing backlog, the backlog still progresses.
+        assert drained.index(100) < 2
+        assert 101 in drained
+        assert 0 in drained
+        assert update_queue.depth() == 8
+
+    def test_idle_lanes_do_not_block(self):
+        update_queue = MemoryUpdateQueue()
+        update_queue.put({"update_id": 1}, lane=BROWSING)
+
+        assert update_queue.get(timeout=0)[1] == {"update_id": 1}
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("messages")
+def test_webhook_enqueue_in_lane(mocker: MockerFixture, client: RequestsClient):
+    update_queue = MemoryUpdateQueue()
+    mocker.patch("ecommerce.bot.views.get_update_queue", return_value=update_queue)
+    mocker.patch.object(CONFIG, "WEBHOOK_MODE", "queue", create=True)
+
+    url = reverse("bot:webhook")
+    client.post(
+        url, data=callback_update(8, "country-us"), content_type="application/json"
+    )
+
+    assert len(update_queue.lanes[PURCHASE]) == 1
+
+
+@pytest.mark.parametrize("queue_fixture", ["redis_queue", None])
+class TestChatOrder:
+    @pytest.fixture()
+    def update_queue(self, request, queue_fixture):
+        if queue_fixture:
+            return request.getfixturevalue(queue_fixture)
+        return MemoryUpdateQueue()
+
+    def drain(self, update_queue):
+        drained = []
+        while item := update_queue.get(timeout=0):
+            token, update = item
+            drained.append(update["update_id"])
+            update_queue.ack(token)
+        return drained
+
+    def test_keep_chat_order_across_lanes(self, update_queue):
+        update_queue.put(text_update(1, "/start"), lane=BROWSING)
+        update_queue.put(callback_update(2, "country-us"), lane=PURCHASE)
+        update_queue.put(callback_update(3, "country-us", user_id=2000), lane=PURCHASE)
+
+        # The purchase of the first user waits for its `/start`.
+        assert self.drain(update_queue) == [3, 1, 2]
+
+    def test_unpin_chat_after_ack(self, update_queue):
+        update_queue.put(text_update(1, "/start"), lane=BROWSING)
+        token, _ = update_queue.get(timeout=0)
+        # Pinned to the browsing lane of the processing `/start`.
+        update_queue.put(callback_update(2, "country-us"), lane=PURCHASE)
+        update_queue.ack(token)
+        assert self.drain(update_queue) == [2]
+
+        update_queue.put(text_update(3, "/start", user_id=2000), lane=BROWSING)
+        update_queue.put(callback_update(4, "country-us"), lane=PURCHASE)
+
+        assert self.drain(update_queue) == [4, 3]
+
+    def test_recover_to_chat_lane(self, update_queue):
+        update_queue.put(text_update(1, "/start"), lane=BROWSING)
+        update_queue.get(timeout=0)
+        update_queue.put(callback_update(2, "country-us"), lane=PURCHASE)
+        update_queue.recover()
+
+        assert self.drain(update_queue) == [1, 2]
+
+    def test_recover_in_flight_updates_in_order(self, update_queue):
+        for update_id in (1, 2, 3):
+            update_queue.put(text_update(update_id, "/start"), lane=BROWSING)
+            update_queue.get(timeout=0)
+        update_queue.put(callback_update(4, "country-us"), lane=PURCHASE)
+
+        assert update_queue.recover() == 3
+        assert self.drain(update_queue) == [1, 2, 3, 4]
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("messages")
+def test_order_polling_batch_by_chat():
+    updates = [
+        text_update(1, "/start", user_id=1000),
+        callback_update(2, "country-us", user_id=1000),
+        text_update(3, "/start", user_id=2000),
+        callback_update(4, "country-us", user_id=3000),
+        callback_update(5, "block_user-1", user_id=2000),
+    ]
+
+    ordered = [update["update_id"] for update in order_by_lane(updates)]
+
+    assert ordered == [4, 1, 2, 3, 5]
@@ -0,0 +1,24 @@
+from utils.metrics import Gauge, Histogram, render
+
+
+def test_gauge_set():
+    gauge = Gauge("test_gauge", "Test gauge.")
+    gauge.set(5)
+    gauge.set(2)
+
+    assert gauge.value() == 2
+    assert "test_gauge 2" in render()
+
+
+def test_histogram_buckets():
+    histogram = Histogram("test_latency_seconds", "Test histogram.", buckets=(0.1, 1))
+    histogram.observe(0.05, update_class="low")
+    histogram.observe(0.5, update_class="low")
+    histogram.observe(3, update_class="low")
+
+    output = render()
+    assert histogram.count(update_class="low") == 3
+    assert 'test_latency_seconds_bucket{update_class="low",le="0.1"} 1' in output
+    assert 'test_latency_seconds_bucket{update_class="low",le="1"} 2' in output
+    assert 'test_latency_seconds_bucket{update_class="low",le="+Inf"} 3' in output
+    assert 'test_latency_seconds_count{update_class="low"} 3' in output
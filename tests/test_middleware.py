@@ -0,0 +1,81 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from pytest_mock.plugin import MockerFixture
+from rest_framework.test import RequestsClient
+
+from utils import json_codec
+from utils.load_env import config as CONFIG
+
+
+@pytest.fixture()
+def message_update():
+    return {
+        "update_id": 8000,
+        "message": {
+            "message_id": 1,
+            "from": {"id": 111111111},
+            "chat": {"id": 111111111},
+            "text": "/start",
+        },
+    }
+
+
+@pytest.mark.django_db
+class TestAntiSpamerMiddleware:
+    def test_parse_webhook_update_once(
+        self, message_update, mocker: MockerFixture, client: RequestsClient
+    ):
+        mocked_text_handler = mocker.patch("ecommerce.bot.views.text_handler")
+        spy_loads = mocker.spy(json_codec, "loads")
+
+        url = reverse("bot:webhook")
+        client.post(url, data=message_update, content_type="application/json")
+
+        mocked_text_handler.assert_called_once_with(message_update["message"])
+        assert spy_loads.call_count == 1
+        assert cache.get("spam_count_111111111") == 2
+
+    def test_skip_other_routes(self, message_update, client: RequestsClient):
+        url = reverse("payment:verify-cryptomus-txn")
+        client.post(url, data=message_update, content_type="application/json")
+
+        assert cache.get("spam_count_111111111") is None
+
+
+@pytest.mark.django_db
+class TestWebhookSecretTokenMiddleware:
+    @pytest.fixture(autouse=True)
+    def secret_token(self, mocker: MockerFixture):
+        mocker.patch.object(CONFIG, "WEBHOOK_SECRET_TOKEN", "secret-token", create=True)
+
+    @pytest.mark.parametrize("headers", [{}, {"HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN": "x"}])
+    def test_reject_invalid_token(
+        self, headers, message_update, mocker: MockerFixture, client: RequestsClient
+    ):
+        mocked_text_handler = mocker.patch("ecommerce.bot.views.text_handler")
+
+        url = reverse("bot:webhook")
+        response = client.post(
+            url, data=message_update, content_type="application/json", **headers
+        )
+
+        assert response.status_code == 403
+        mocked_text_handler.assert_not_called()
+        assert cache.get("spam_count_111111111") is None
+
+    def test_accept_valid_token(
+        self, message_update, mocker: MockerFixture, client: RequestsClient
+    ):
+        mocked_text_handler = mocker.patch("ecommerce.bot.views.text_handler")
+
+        url = reverse("bot:webhook")
+        response = client.post(
+            url,
+            data=message_update,
+            content_type="application/json",
+            HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN="secret-token",
+        )
+
+        assert response.status_code == 200
+        mocked_text_handler.assert_called_once()
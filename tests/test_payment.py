@@ -520,7 +520,7 @@ class TestVerifyZarinpalTransaction:
             return_value=success_zarinpal_txn_response,
         )
         mocked_send_msg = mocker.patch(
-            "ecommerce.telegram.telegram.Telegram.send_message"
+            "ecommerce.telegram.async_telegram.AsyncTelegram.send_message"
         )
         mocked_open_file = mocker.patch(
             "ecommerce.payment.views.open", mocker.mock_open()
@@ -649,7 +649,7 @@ class TestVerifyCryptomusTransaction:
         mocker: MockerFixture,
     ):
         mocked_send_msg = mocker.patch(
-            "ecommerce.telegram.telegram.Telegram.send_message"
+            "ecommerce.telegram.async_telegram.AsyncTelegram.send_message"
         )
         mocked_open_file = mocker.patch(
             "ecommerce.payment.views.open", mocker.mock_open()
@@ -0,0 +1,57 @@
+from pytest_mock.plugin import MockerFixture
+
+from ecommerce.bot.dispatcher import ChatShardedDispatcher
+from ecommerce.bot.polling import PollingRunner
+from ecommerce.telegram.telegram import Telegram
+
+
+def text_update(update_id, chat_id=111111111):
+    return {
+        "update_id": update_id,
+        "message": {"from": {"id": chat_id}, "chat": {"id": chat_id}, "text": "/start"},
+    }
+
+
+class TestPollingRunner:
+    def test_dispatch_updates_batch(self, fake_bot_api):
+        processed = []
+        dispatcher = ChatShardedDispatcher(processed.append, workers=2)
+        dispatcher.start()
+        for update_id in (10, 11, 12):
+            fake_bot_api.add_update(text_update(update_id))
+
+        runner = PollingRunner(Telegram(), dispatcher, batch_size=2, timeout=0)
+        assert runner.poll_once() == 2
+        assert runner.poll_once() == 1
+        assert runner.poll_once() == 0
+        dispatcher.stop()
+
+        assert [update["update_id"] for update in processed] == [10, 11, 12]
+        get_updates_calls = fake_bot_api.calls_of("getUpdates")
+        assert get_updates_calls[0]["limit"] == "2"
+        assert "offset" not in get_updates_calls[0]
+        assert get_updates_calls[1]["offset"] == "12"
+        assert get_updates_calls[2]["offset"] == "13"
+
+    def test_skip_duplicate_updates(self, fake_bot_api):
+        processed = []
+        dispatcher = ChatShardedDispatcher(processed.append, workers=1)
+        dispatcher.start()
+        fake_bot_api.add_update(text_update(20))
+
+        runner = PollingRunner(Telegram(), dispatcher, timeout=0)
+        runner.poll_once()
+        # Telegram returns the same update again if the offset is lost.
+        runner.offset = None
+        runner.poll_once()
+        dispatcher.stop()
+
+        assert len(processed) == 1
+
+    def test_retry_on_api_error(self, fake_bot_api, mocker: MockerFixture):
+        mocked_sleep = mocker.patch("ecommerce.bot.polling.time.sleep")
+        fake_bot_api.set_response("getUpdates", 502, {"ok": False})
+        runner = PollingRunner(Telegram(), ChatShardedDispatcher(print), retry_delay=3)
+
+        assert runner.poll_once() == 0
+        mocked_sleep.assert_called_once_with(3)
@@ -0,0 +1,28 @@
+import time
+
+from pytest_mock.plugin import MockerFixture
+
+from ecommerce.telegram.progress import ChatActionProgress
+
+
+class TestChatActionProgress:
+    def test_send_chat_action(self, mocker: MockerFixture):
+        bot = mocker.Mock()
+
+        with ChatActionProgress(bot, 111111111):
+            pass
+
+        bot.send_chat_action.assert_called_once_with(111111111, "typing")
+        bot.send_message.assert_not_called()
+        bot.delete_message.assert_not_called()
+
+    def test_refresh_long_steps(self, mocker: MockerFixture):
+        bot = mocker.Mock()
+
+        with ChatActionProgress(bot, 111111111, interval=0.05):
+            time.sleep(0.18)
+        calls = bot.send_chat_action.call_count
+        time.sleep(0.1)
+
+        assert calls >= 3
+        assert bot.send_chat_action.call_count == calls
@@ -0,0 +1,102 @@
+import time
+
+import pytest
+from pytest_mock.plugin import MockerFixture
+
+from ecommerce.telegram.async_telegram import AsyncTelegram, run_sync
+from ecommerce.telegram.rate_limiter import OutboundRateLimiter, throttled_calls
+from ecommerce.telegram.telegram import Telegram
+
+
+@pytest.fixture()
+def too_many_requests():
+    return {
+        "ok": False,
+        "error_code": 429,
+        "description": "Too Many Requests: retry after 1",
+        "parameters": {"retry_after": 1},
+    }
+
+
+class TestOutboundRateLimiter:
+    def test_chat_burst(self):
+        limiter = OutboundRateLimiter()
+        limiter.chat_burst = 2
+
+        assert limiter.try_acquire(3000) == 0
+        assert limiter.try_acquire(3000) == 0
+        assert 0 < limiter.try_acquire(3000) <= 1
+        # Other chats are not limited.
+        assert limiter.try_acquire(3001) == 0
+
+    def test_global_rate(self):
+        limiter = OutboundRateLimiter()
+        limiter.global_rate = 3
+
+        waits = [limiter.try_acquire(chat_id) for chat_id in range(4000, 4004)]
+
+        assert waits[:3] == [0, 0, 0]
+        assert waits[3] > 0
+
+    def test_group_rate(self):
+        limiter = OutboundRateLimiter()
+
+        waits = [limiter.try_acquire(-1005000) for _ in range(4)]
+
+        assert waits[:3] == [0, 0, 0]
+        # 20 messages per minute.
+        assert 2 < waits[3] <= 3
+
+    def test_extra_bucket(self):
+        limiter = OutboundRateLimiter()
+
+        waits = [limiter.try_acquire_bucket("broadcast", 2) for _ in range(3)]
+
+        assert waits[:2] == [0, 0]
+        assert 0 < waits[2] <= 0.5
+        # The bucket does not use the global tokens.
+        assert limiter.try_acquire(5000) == 0
+
+    def test_block_chat(self):
+        limiter = OutboundRateLimiter()
+        limiter.block(6000, 2)
+
+        assert 1 < limiter.try_acquire(6000) <= 2
+        assert limiter.try_acquire(6001) == 0
+
+    def test_acquire_when_redis_is_down(self, mocker: MockerFixture):
+        limiter = OutboundRateLimiter()
+        limiter.script = mocker.Mock(side_effect=ConnectionError())
+
+        assert limiter.try_acquire(7000) == 0
+
+
+class TestRetryAfter:
+    def test_retry_throttled_call(self, fake_bot_api, too_many_requests):
+        fake_bot_api.set_response("sendMessage", 429, too_many_requests, times=1)
+        throttled = throttled_calls.value()
+
+        started_at = time.monotonic()
+        result = Telegram().send_message(8000, "hello")
+
+        assert result["ok"] is True
+        assert time.monotonic() - started_at >= 0.9
+        assert len(fake_bot_api.calls_of("sendMessage")) == 2
+        assert throttled_calls.value() == throttled + 1
+
+    def test_async_retry_throttled_call(self, fake_bot_api, too_many_requests):
+        fake_bot_api.set_response("sendMessage", 429, too_many_requests, times=1)
+
+        result = run_sync(AsyncTelegram().send_message(8001, "hello"))
+
+        assert result["ok"] is True
+        assert len(fake_bot_api.calls_of("sendMessage")) == 2
+
+    def test_skip_long_retry_after(self, fake_bot_api, too_many_requests):
+        too_many_requests["parameters"]["retry_after"] = 300
+        fake_bot_api.set_response("sendMessage", 429, too_many_requests, times=1)
+
+        result = Telegram().send_message(8002, "hello")
+
+        assert result["error_code"] == 429
+        assert len(fake_bot_api.calls_of("sendMessage")) == 1
@@ -0,0 +1,201 @@
+import asyncio
+import time
+
+import pytest
+from pytest_mock.plugin import MockerFixture
+
+from ecommerce.telegram.async_telegram import AsyncTelegram, run_sync
+from ecommerce.telegram.file_id_cache import FileIdCache, file_id_lookups
+from ecommerce.telegram.telegram import Telegram, get_session
+from utils.redis_client import get_redis
+
+
+@pytest.fixture()
+def document(tmp_path):
+    document = tmp_path / "export.txt"
+    document.write_text("+1555")
+    return document
+
+
+def uploads(api) -> list:
+    return [
+        params["chat_id"]
+        for params in api.calls_of("sendDocument")
+        if isinstance(params["document"], dict)
+    ]
+
+
+class TestTelegramSession:
+    def test_shared_session(self):
+        assert Telegram().session is Telegram().session is get_session()
+
+    def test_send_message(self, fake_bot_api):
+        result = Telegram().send_message(111111111, "hello")
+
+        assert result["result"]["text"] == "hello"
+        assert fake_bot_api.calls_of("sendMessage")[0]["chat_id"] == "111111111"
+
+    def test_get_with_timeout(self, fake_bot_api, mocker: MockerFixture):
+        spy_get = mocker.spy(get_session(), "get")
+
+        Telegram().bot("getMe", data={}, method="GET")
+
+        assert spy_get.call_args.kwargs["timeout"] == Telegram.timeout
+
+    def test_download_file_to(self, fake_bot_api, tmp_path):
+        fake_bot_api.set_response(
+            "getFile", 200, {"ok": True, "result": {"file_path": "documents/a.zip"}}
+        )
+        fake_bot_api.file_content = b"x" * 200_000
+        path = tmp_path / "a.zip"
+
+        with open(path, "wb") as file:
+            size = Telegram().download_file_to("file-id", file)
+
+        assert size == 200_000
+        assert path.read_bytes() == fake_bot_api.file_content
+
+    def test_download_file_over_max_size(
+        self, fake_bot_api, tmp_path, mocker: MockerFixture
+    ):
+        spy_get = mocker.spy(get_session(), "get")
+        fake_bot_api.set_response(
+            "getFile",
+            200,
+            {"ok": True, "result": {"file_path": "documents/a.zip", "file_size": 101}},
+        )
+
+        with open(tmp_path / "a.zip", "wb") as file:
+            assert Telegram().download_file_to("file-id", file, max_size=100) is None
+
+        # The file is not requested.
+        assert spy_get.call_count == 1
+
+    def test_download_file_over_content_length(self, fake_bot_api, tmp_path):
+        fake_bot_api.set_response(
+            "getFile", 200, {"ok": True, "result": {"file_path": "documents/a.zip"}}
+        )
+        fake_bot_api.file_content = b"x" * 101
+
+        with open(tmp_path / "a.zip", "wb") as file:
+            assert Telegram().download_file_to("file-id", file, max_size=100) is None
+
+        assert (tmp_path / "a.zip").read_bytes() == b""
+
+
+class TestAsyncTelegram:
+    def test_send_messages_concurrently(self, fake_bot_api):
+        fake_bot_api.latency = 0.2
+        messages = [(chat_id, f"hello {chat_id}") for chat_id in range(1, 6)]
+
+        started_at = time.perf_counter()
+        results = run_sync(AsyncTelegram().send_messages(messages))
+
+        assert time.perf_counter() - started_at < 0.8
+        assert [result["result"]["text"] for result in results] == [
+            text for _, text in messages
+        ]
+
+    def test_concurrency_limit(self, fake_bot_api, mocker: MockerFixture):
+        mocker.patch.object(AsyncTelegram, "concurrency", 1)
+        fake_bot_api.latency = 0.1
+        messages = [(chat_id, "hello") for chat_id in range(1, 4)]
+
+        started_at = time.perf_counter()
+        # A new loop, so the client is created with the patched limit.
+        asyncio.run(AsyncTelegram().send_messages(messages))
+
+        assert time.perf_counter() - started_at >= 0.3
+
+    def test_client_timeout(self, mocker: MockerFixture):
+        mocker.patch.object(AsyncTelegram, "timeout", (3.0, 40.0))
+
+        async def get_timeout():
+            return AsyncTelegram().client.timeout
+
+        timeout = asyncio.run(get_timeout())
+
+        assert (timeout.connect, timeout.read) == (3.0, 40.0)
+
+    def test_copy_message(self, fake_bot_api):
+        run_sync(AsyncTelegram().copy_message(1, 2, 3))
+
+        assert fake_bot_api.calls_of("copyMessage") == [
+            {"chat_id": "1", "from_chat_id": "2", "message_id": "3"}
+        ]
+
+    def test_download_file(self, fake_bot_api):
+        fake_bot_api.set_response(
+            "getFile", 200, {"ok": True, "result": {"file_path": "documents/a.session"}}
+        )
+        fake_bot_api.file_content = b"session"
+
+        assert run_sync(AsyncTelegram().download_file("file-id")) == b"session"
+
+    def test_download_file_to_over_max_size(self, fake_bot_api, tmp_path):
+        fake_bot_api.set_response(
+            "getFile", 200, {"ok": True, "result": {"file_path": "documents/a.zip"}}
+        )
+        fake_bot_api.file_content = b"x" * 101
+
+        with open(tmp_path / "a.zip", "wb") as file:
+            size = run_sync(AsyncTelegram().download_file_to("file-id", file, 100))
+
+        assert size is None
+
+    def test_send_document(self, fake_bot_api, tmp_path):
+        document = tmp_path / "numbers.txt"
+        document.write_text("+1555")
+
+        result = run_sync(AsyncTelegram().send_document(1, document))
+
+        assert result["ok"] is True
+        assert len(fake_bot_api.calls_of("sendDocument")) == 1
+
+    def test_send_documents_with_one_upload(self, fake_bot_api, document):
+        results = run_sync(AsyncTelegram().send_documents([1, 2, 3], document))
+
+        assert [result["ok"] for result in results] == [True, True, True]
+        assert uploads(fake_bot_api) == ["1"]
+        assert len(fake_bot_api.calls_of("sendDocument")) == 3
+
+
+@pytest.mark.usefixtures("disable_rate_limit")
+class TestFileIdCache:
+    def test_reuse_file_id(self, fake_bot_api, document):
+        hits = file_id_lookups.value(result="hit")
+
+        first = Telegram().send_document(1, document, caption="export")
+        second = Telegram().send_document(2, document)
+
+        assert uploads(fake_bot_api) == ["1"]
+        calls = fake_bot_api.calls_of("sendDocument")
+        assert calls[0]["document"] == {"file_name": "export.txt", "content": b"+1555"}
+        assert calls[0]["caption"] == "export"
+        assert calls[1]["document"] == first["result"]["document"]["file_id"]
+        assert second["ok"] is True
+        assert file_id_lookups.value(result="hit") == hits + 1
+
+    def test_changed_content_is_uploaded(self, fake_bot_api, document):
+        Telegram().send_document(1, document)
+        document.write_text("+1666")
+        Telegram().send_document(2, document)
+
+        assert uploads(fake_bot_api) == ["1", "2"]
+
+    def test_upload_again_on_invalid_file_id(self, fake_bot_api, document):
+        cache = FileIdCache()
+        digest = cache.get_digest(document)
+        get_redis().hset(FileIdCache.key, digest, "stale-file-id")
+        fake_bot_api.set_response(
+            "sendDocument",
+            400,
+            {"ok": False, "error_code": 400, "description": "wrong file identifier"},
+            times=1,
+        )
+
+        result = Telegram().send_document(1, document)
+
+        assert result["ok"] is True
+        assert uploads(fake_bot_api) == ["1"]
+        assert cache.get(digest) == result["result"]["document"]["file_id"]
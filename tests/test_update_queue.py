@@ -0,0 +1,124 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from pytest_mock.plugin import MockerFixture
+from rest_framework.test import RequestsClient
+
+from ecommerce.bot.models import Message
+from ecommerce.bot.update_queue import MemoryUpdateQueue
+from ecommerce.bot.views import handle_update
+from utils.load_env import config as CONFIG
+
+
+@pytest.fixture()
+def anti_spam_msg():
+    Message.objects.create(text="⚠️ spam", current_step="anti-spam-msg")
+
+
+@pytest.fixture()
+def memory_queue(mocker: MockerFixture):
+    update_queue = MemoryUpdateQueue()
+    mocker.patch("ecommerce.bot.views.get_update_queue", return_value=update_queue)
+    mocker.patch.object(CONFIG, "WEBHOOK_MODE", "queue", create=True)
+    return update_queue
+
+
+@pytest.fixture()
+def start_update():
+    return {
+        "update_id": 1000,
+        "message": {
+            "message_id": 1,
+            "chat": {"id": 111111111},
+            "from": {"id": 111111111},
+            "text": "/start",
+        },
+    }
+
+
+class TestMemoryUpdateQueue:
+    def test_get_and_ack(self, start_update):
+        update_queue = MemoryUpdateQueue()
+        update_queue.put(start_update)
+        assert update_queue.depth() == 1
+
+        token, update = update_queue.get(timeout=1)
+        assert update == start_update
+        assert update_queue.depth() == 0
+
+        update_queue.ack(token)
+        assert update_queue.recover() == 0
+
+    def test_recover_unacked_updates(self, start_update):
+        update_queue = MemoryUpdateQueue()
+        update_queue.put(start_update)
+        update_queue.get(timeout=1)
+
+        assert update_queue.recover() == 1
+        assert update_queue.depth() == 1
+
+    def test_get_from_empty_queue(self):
+        assert MemoryUpdateQueue().get(timeout=0.01) is None
+
+
+class TestRedisUpdateQueueConsumer:
+    def test_one_owner_per_consumer(self, redis_queue):
+        update_queue = redis_queue
+
+        assert update_queue.acquire_consumer("host:1") is True
+        assert update_queue.acquire_consumer("host:2") is False
+        # The owner renews its lease.
+        assert update_queue.acquire_consumer("host:1") is True
+
+        update_queue.release_consumer("host:2")
+        assert update_queue.acquire_consumer("host:2") is False
+        update_queue.release_consumer("host:1")
+        assert update_queue.acquire_consumer("host:2") is True
+
+    def test_runworkers_refuse_running_consumer(
+        self, start_update, redis_queue, mocker: MockerFixture
+    ):
+        update_queue = redis_queue
+        update_queue.put(start_update)
+        update_queue.get(timeout=0)
+        update_queue.acquire_consumer("other-host:1")
+        mocker.patch(
+            "ecommerce.bot.management.commands.runworkers.get_update_queue",
+            return_value=update_queue,
+        )
+
+        with pytest.raises(CommandError):
+            call_command("runworkers")
+
+        # The in-flight update of the running process is not recovered.
+        assert update_queue.depth() == 0
+
+
+@pytest.mark.usefixtures("anti_spam_msg")
+class TestQueueWebhook:
+    pytestmark = pytest.mark.django_db
+
+    def test_webhook_enqueue_update(
+        self, memory_queue, start_update, mocker: MockerFixture, client: RequestsClient
+    ):
+        mocked_text_handler = mocker.patch("ecommerce.bot.views.text_handler")
+
+        url = reverse("bot:webhook")
+        response = client.post(url, data=start_update, content_type="application/json")
+
+        assert response.status_code == 200
+        assert memory_queue.depth() == 1
+        mocked_text_handler.assert_not_called()
+
+    def test_webhook_skip_unknown_update(self, memory_queue, client: RequestsClient):
+        url = reverse("bot:webhook")
+        client.post(url, data={"update_id": 1}, content_type="application/json")
+
+        assert memory_queue.depth() == 0
+
+    def test_handle_queued_update(self, start_update, mocker: MockerFixture):
+        mocked_text_handler = mocker.patch("ecommerce.bot.views.text_handler")
+
+        assert handle_update(start_update) == "ok"
+        mocked_text_handler.assert_called_once_with(start_update["message"])
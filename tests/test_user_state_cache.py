@@ -0,0 +1,258 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from pytest_mock.plugin import MockerFixture
+from rest_framework.test import RequestsClient
+
+from ecommerce.account.models import User
+from ecommerce.account.state_cache import (
+    CachedUserQuerySet,
+    UserState,
+    user_state_lookups,
+    user_states,
+    user_steps_flushed,
+)
+from ecommerce.bot.models import Message
+from ecommerce.payment.models import Transaction
+from ecommerce.payment.services import ZarinPalPaymentService
+from ecommerce.product.models import AccountSession, Product
+from ecommerce.product.services import OrderService
+from ecommerce.telegram.async_telegram import run_sync
+from utils.redis_client import get_redis
+
+
+@pytest.fixture()
+def user():
+    return User.objects.create(
+        username="user", user_id=111111111, language="fa", step="home_page"
+    )
+
+
+@pytest.mark.django_db
+class TestUserStateCache:
+    def test_cached_state(self, user):
+        hits = user_state_lookups.value(result="hit")
+        user_states.get(111111111)
+
+        with CaptureQueriesContext(connection) as context:
+            state = user_states.get(111111111)
+
+        assert context.captured_queries == []
+        assert user_state_lookups.value(result="hit") == hits + 1
+        assert (state.pk, state.step, state.language) == (user.pk, "home_page", "fa")
+        assert (state.is_active, state.is_staff, state.balance) == (True, False, 10000)
+        assert user_states.get(222222222) is None
+
+    def test_other_fields_load_the_user(self, user):
+        state = user_states.get(111111111)
+
+        with CaptureQueriesContext(connection) as context:
+            assert state.username == "user"
+            assert state.username == "user"
+
+        assert len(context.captured_queries) == 1
+
+    def test_write_behind_step(self, user):
+        flushed = user_steps_flushed.value()
+        CachedUserQuerySet(111111111).update(step="user_profile")
+        CachedUserQuerySet(111111111).update(step="select_amount")
+
+        assert user_states.get(111111111).step == "select_amount"
+        assert User.objects.get(pk=user.pk).step == "home_page"
+
+        assert user_states.flush() == 1
+        assert User.objects.get(pk=user.pk).step == "select_amount"
+        assert user_steps_flushed.value() == flushed + 1
+        assert user_states.flush() == 0
+
+    def test_flush_one_query_per_step(self, user):
+        User.objects.create(username="user-2", user_id=2)
+        User.objects.create(username="user-3", user_id=3)
+        for user_id, step in ((111111111, "a"), (2, "a"), (3, "b")):
+            user_states.set_step(user_id, step)
+
+        with CaptureQueriesContext(connection) as context:
+            assert user_states.flush() == 3
+
+        updates = [q for q in context.captured_queries if "UPDATE" in q["sql"]]
+        assert len(updates) == 2
+        assert dict(User.objects.values_list("user_id", "step")) == {
+            111111111: "a",
+            2: "a",
+            3: "b",
+        }
+
+    def test_load_takes_pending_step(self, user):
+        user_states.set_step(111111111, "user_profile")
+        get_redis().delete(user_states.key.format(111111111))
+
+        assert user_states.get(111111111).step == "user_profile"
+
+    def test_resume_crashed_flush(self, user):
+        get_redis().hset(user_states.flushing_key, 111111111, "user_profile")
+
+        assert user_states.flush() == 1
+        assert User.objects.get(pk=user.pk).step == "user_profile"
+        assert not get_redis().exists(user_states.flushing_key)
+
+    def test_update_other_fields(self, user):
+        user_qs = CachedUserQuerySet(111111111)
+        state = user_qs.first()
+
+        user_qs.update(language="en")
+        state.refresh_from_db()
+
+        assert User.objects.get(pk=user.pk).language == "en"
+        assert state.language == "en"
+        assert user_qs.first().language == "en"
+
+    def test_balance_save_drops_state(self, user):
+        user_states.get(111111111)
+
+        user.balance = 500
+        user.save(update_fields=["balance"])
+
+        assert user_states.get(111111111).balance == 500
+
+    def test_redis_down(self, user, mocker: MockerFixture):
+        mocker.patch(
+            "ecommerce.account.state_cache.get_redis", side_effect=ConnectionError
+        )
+
+        user_states.set_step(111111111, "user_profile")
+
+        assert user_states.get(111111111).step == "user_profile"
+        assert User.objects.get(pk=user.pk).step == "user_profile"
+
+    def test_async_lookup(self, user):
+        user_states.get(111111111)
+
+        state = run_sync(CachedUserQuerySet(111111111).afirst())
+
+        assert state.step == "home_page"
+
+    def test_state_of_new_user(self, user):
+        state = UserState.from_user(user)
+
+        with CaptureQueriesContext(connection) as context:
+            assert state.get_user() is user
+            assert (state.pk, state.step, state.language) == (
+                user.pk,
+                "home_page",
+                "fa",
+            )
+        assert context.captured_queries == []
+
+
+def text_update(update_id, text):
+    chat = {"id": 111111111, "first_name": "test"}
+    return {
+        "update_id": update_id,
+        "message": {"message_id": update_id, "chat": chat, "from": chat, "text": text},
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("disable_rate_limit")
+def test_browsing_update_without_queries(user, fake_bot_api, client: RequestsClient):
+    Message.objects.create(text="help", current_step="help-msg", key="❓ راهنما")
+    url = reverse("bot:webhook")
+    client.post(url, data=text_update(1, "❓ راهنما"), content_type="application/json")
+
+    with CaptureQueriesContext(connection) as context:
+        response = client.post(
+            url, data=text_update(2, "❓ راهنما"), content_type="application/json"
+        )
+
+    assert response.status_code == 200
+    assert context.captured_queries == []
+    assert [call["text"] for call in fake_bot_api.calls_of("sendMessage")] == [
+        "help",
+        "help",
+    ]
+    assert user_states.get(111111111).step == "help-msg"
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("disable_rate_limit")
+class TestPaymentStepsWithCachedState:
+    @pytest.fixture(autouse=True)
+    def payment_msgs(self):
+        keys = "💳 درگاه پرداخت :{callback}:{url}"
+        Message.objects.create(
+            text="rial", current_step="rial-payment", keys=keys, is_inline_keyboard=True
+        )
+        Message.objects.create(
+            text="crypto",
+            current_step="crypto-payment",
+            keys=keys,
+            is_inline_keyboard=True,
+        )
+        Message.objects.create(text="evcode", current_step="perfectmoney-get-evcode")
+
+    def post_input(self, user, step, text, client: RequestsClient):
+        User.objects.filter(pk=user.pk).update(step=step)
+        # The handlers get the cached `UserState`.
+        assert user_states.get(user.user_id).step == step
+        url = reverse("bot:webhook")
+        client.post(url, data=text_update(1, text), content_type="application/json")
+
+    def test_rial_amount(self, user, fake_bot_api, mocker: MockerFixture, client):
+        mocker.patch(
+            "ecommerce.payment.views.ZarinpalCreateTransaction.send_data",
+            return_value={"data": {"authority": "A0000001"}, "errors": []},
+        )
+
+        self.post_input(user, "rial-get-amount", "200000", client)
+
+        payment = ZarinPalPaymentService().get_payment(authority="A0000001")
+        assert payment.transaction.payer == user
+        assert fake_bot_api.calls_of("sendMessage")[-1]["text"] == "rial"
+
+    def test_crypto_amount(self, user, fake_bot_api, mocker: MockerFixture, client):
+        mocker.patch(
+            "ecommerce.payment.views.CryptomusCreateTransaction.send_data",
+            return_value={"url": "https://pay.cryptomus.com/pay/1"},
+        )
+
+        self.post_input(user, "crypto-get-amount", "1", client)
+
+        assert Transaction.objects.get(payer=user).amount_usd == 1
+        assert fake_bot_api.calls_of("sendMessage")[-1]["text"] == "crypto"
+
+    def test_perfectmoney_evoucher(self, user, fake_bot_api, client):
+        self.post_input(user, "perfectmoney-get-evoucher", "0123456789", client)
+
+        assert Transaction.objects.get(payer=user).perfectmoney.evoucher == (
+            "0123456789"
+        )
+        assert fake_bot_api.calls_of("sendMessage")[-1]["text"] == "evcode"
+        assert user_states.get(user.user_id).step == "perfectmoney-get-activation-code"
+
+
+@pytest.mark.django_db
+class TestCreateOrder:
+    @pytest.fixture()
+    def sessions(self):
+        product = Product.objects.create(name="Iran", country_code="ir", price=80)
+        return [
+            AccountSession.objects.create(
+                product=product, status=AccountSession.StatusChoices.active
+            )
+            for _ in range(2)
+        ]
+
+    def test_balance_not_overdrawn(self, user, sessions):
+        User.objects.filter(pk=user.pk).update(balance=100)
+        # Both purchases passed the balance validator with the same state.
+        state = user_states.get(user.user_id)
+
+        assert OrderService().create_order(sessions[0], state)
+        assert OrderService().create_order(sessions[1], state) is False
+
+        assert User.objects.get(pk=user.pk).balance == 20
+        assert user_states.get(user.user_id).balance == 20
+        # The session of the refused purchase is still on sale.
+        sessions[1].refresh_from_db()
+        assert sessions[1].status == AccountSession.StatusChoices.active
@@ -0,0 +1,124 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+from django.urls import reverse
+from pytest_mock.plugin import MockerFixture
+from rest_framework.test import RequestsClient
+
+from ecommerce.bot.models import Message
+from ecommerce.telegram import async_telegram
+from ecommerce.telegram.async_telegram import AsyncTelegram
+from ecommerce.telegram.telegram import Telegram
+from ecommerce.telegram.webhook_reply import awebhook_reply, webhook_reply
+from utils.load_env import config as CONFIG
+
+User = get_user_model()
+
+pytestmark = pytest.mark.usefixtures("disable_rate_limit")
+
+
+@pytest.fixture()
+def reply_mode(mocker: MockerFixture):
+    mocker.patch.object(CONFIG, "WEBHOOK_REPLY_MODE", "on", create=True)
+
+
+def start_update(update_id, chat_id=111111111):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": 1,
+            "from": {"id": chat_id},
+            "chat": {"id": chat_id, "first_name": "test"},
+            "text": "/start",
+        },
+    }
+
+
+class TestWebhookReply:
+    def test_hold_last_call(self, fake_bot_api):
+        with webhook_reply() as reply:
+            Telegram().send_message(1, "first")
+            Telegram().send_message(1, "second")
+            response = reply.take()
+
+        # The first call is sent before the second one is held.
+        assert [call["text"] for call in fake_bot_api.calls_of("sendMessage")] == ["first"]
+        assert response["method"] == "sendMessage"
+        assert response["text"] == "second"
+
+    def test_send_call_when_result_is_read(self, fake_bot_api):
+        with webhook_reply() as reply:
+            result = Telegram().send_message(1, "please wait")
+            message_id = result["result"]["message_id"]
+            response = reply.take()
+
+        assert message_id == 1
+        assert response is None
+
+    def test_skip_ineligible_calls(self, fake_bot_api):
+        with webhook_reply() as reply:
+            Telegram().delete_message(1, 10)
+            response = reply.take()
+
+        assert response is None
+        assert len(fake_bot_api.calls_of("deleteMessage")) == 1
+
+    def test_send_untaken_call(self, fake_bot_api):
+        with webhook_reply():
+            Telegram().send_message(1, "hello")
+
+        assert len(fake_bot_api.calls_of("sendMessage")) == 1
+
+    def test_async_send_untaken_call(self, fake_bot_api, mocker: MockerFixture):
+        run_sync = mocker.spy(async_telegram, "run_sync")
+
+        async def handle():
+            async with awebhook_reply():
+                result = await AsyncTelegram().send_message(1, "hello")
+                await result.aresolve()
+                await AsyncTelegram().send_message(1, "bye")
+
+        async_to_sync(handle)()
+
+        assert [call["text"] for call in fake_bot_api.calls_of("sendMessage")] == ["hello", "bye"]
+        run_sync.assert_not_called()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("reply_mode")
+class TestWebhookReplyMode:
+    @pytest.fixture(autouse=True)
+    def messages(self):
+        Message.objects.create(text="⚠️ spam", current_step="anti-spam-msg")
+        Message.objects.create(
+            text="سلام", current_step="home_page", key="/start", keys="👤 پروفایل"
+        )
+        User.objects.create(username="test-user", user_id=111111111, language="fa")
+
+    def test_webhook_response(self, fake_bot_api, client: RequestsClient):
+        url = reverse("bot:webhook")
+        response = client.post(url, data=start_update(9000), content_type="application/json")
+
+        assert response.json() == {
+            "method": "sendMessage",
+            "chat_id": 111111111,
+            "text": "سلام",
+            "parse_mode": "html",
+            "disable_web_page_preview": True,
+            "reply_markup": {
+                "keyboard": [["👤 پروفایل"]],
+                "resize_keyboard": True,
+                "one_time_keyboard": True,
+            },
+        }
+        assert fake_bot_api.calls == []
+
+    def test_async_webhook_response(self, fake_bot_api):
+        url = reverse("bot:async-webhook")
+        response = async_to_sync(AsyncClient().post)(
+            url, data=start_update(9001), content_type="application/json"
+        )
+
+        assert response.json()["text"] == "سلام"
+        assert fake_bot_api.calls == []
@@ -0,0 +1,165 @@
+"""A local stand-in of the telegram Bot API, used to run the bot clients,
+the polling runner and the benchmarks offline.
+
+    api = FakeBotAPI(latency=0.01).start()
+    Telegram.api_url = api.url
+    ...
+    api.stop()
+"""
+import json
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+
+class FakeBotAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Send the headers and body in one segment, keep-alive clients otherwise
+    # wait for the delayed ACK.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_params(self) -> dict:
+        url = urlparse(self.path)
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        content_type = self.headers.get("Content-Type", "")
+        if body and "application/json" in content_type:
+            params.update(json.loads(body))
+        elif body and "application/x-www-form-urlencoded" in content_type:
+            params.update(parse_qsl(body.decode()))
+        elif body and "multipart/form-data" in content_type:
+            params.update(self._read_multipart(content_type, body))
+        return params
+
+    @staticmethod
+    def _read_multipart(content_type: str, body: bytes) -> dict:
+        """Return the form fields, the uploaded files as `{"file_name", "content"}`."""
+        headers = f"Content-Type: {content_type}\r\n\r\n".encode()
+        message = BytesParser(policy=default_policy).parsebytes(headers + body)
+        params = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            content = part.get_payload(decode=True)
+            if part.get_filename():
+                params[name] = {"file_name": part.get_filename(), "content": content}
+            else:
+                params[name] = content.decode()
+        return params
+
+    def _send(self, status: int, body: bytes, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        api = self.server.api
+        path = urlparse(self.path).path
+        if path.startswith("/file/"):
+            return self._send(200, api.file_content, "application/octet-stream")
+
+        method = path.rsplit("/", 1)[-1]
+        params = self._read_params()
+        if api.latency:
+            time.sleep(api.latency)
+
+        status, response = api.call(method, params)
+        self._send(status, json.dumps(response).encode())
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+class FakeBotAPIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class FakeBotAPI:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.server = FakeBotAPIServer((host, port), FakeBotAPIHandler)
+        self.server.api = self
+        self.latency = latency
+        self.file_content = b""
+        self.updates = []
+        self.calls = []
+        self.responses = {}
+        self.message_id = 0
+        self.condition = threading.Condition()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add_update(self, update: dict):
+        with self.condition:
+            self.updates.append(update)
+            self.condition.notify_all()
+
+    def set_response(self, method: str, status: int, response: dict, times=None):
+        """Override the response of the next `method` calls (`times` calls if set)."""
+        self.responses[method] = [status, response, times]
+
+    def calls_of(self, method: str) -> list:
+        return [params for name, params in self.calls if name == method]
+
+    def call(self, method: str, params: dict):
+        with self.condition:
+            self.calls.append((method, params))
+
+        with self.condition:
+            override = self.responses.get(method)
+            if override is not None:
+                status, response, times = override
+                if times is not None:
+                    override[2] -= 1
+                    if override[2] <= 0:
+                        del self.responses[method]
+                return status, response
+
+        if method == "getUpdates":
+            return 200, {"ok": True, "result": self._get_updates(params)}
+
+        with self.condition:
+            self.message_id += 1
+            message_id = self.message_id
+        result = {
+            "message_id": message_id,
+            "chat": {"id": params.get("chat_id")},
+            "text": params.get("text", ""),
+        }
+        if method == "sendDocument":
+            # A sent file_id is returned as is, the uploads get a new one.
+            document = params.get("document")
+            file_id = document if isinstance(document, str) else f"document-{message_id}"
+            result["document"] = {"file_id": file_id}
+        return 200, {"ok": True, "result": result}
+
+    def _get_updates(self, params: dict) -> list:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = min(float(params.get("timeout") or 0), 1)
+        with self.condition:
+            # Confirm the updates older than the offset
+            self.updates = [u for u in self.updates if u["update_id"] >= offset]
+            if not self.updates and timeout:
+                self.condition.wait(timeout)
+            return self.updates[:limit]
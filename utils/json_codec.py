@@ -0,0 +1,41 @@
+"""JSON codec of the webhook updates and the Bot API payloads.
+
+orjson is used when it is installed (`pip install orjson`), otherwise the
+stdlib json. Both produce compact UTF-8 JSON that telegram accepts.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+
+if orjson:
+
+    def loads(data):
+        """Decode `data` (bytes or str), raise `ValueError` on invalid JSON."""
+        return orjson.loads(data)
+
+    def dumps_bytes(obj) -> bytes:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # Non-str dict keys or ints out of the 64-bit range.
+            return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+else:
+
+    def loads(data):
+        """Decode `data` (bytes or str), raise `ValueError` on invalid JSON."""
+        return json.loads(data)
+
+    def dumps_bytes(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def dumps(obj) -> str:
+    """Encode `obj` as a str, for the form fields like `reply_markup`."""
+    return dumps_bytes(obj).decode()
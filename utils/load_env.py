@@ -10,4 +10,11 @@ class Config:
             for key, value in config[section_name].items():
                 setattr(self, key.upper(), value)
 
-config = Config()
\ No newline at end of file
+    def get(self, key, default=None):
+        """Return the optional ``key`` or ``default`` when it isn't configured."""
+        value = getattr(self, key, None)
+        if value is None or value == "":
+            return default
+        return value
+
+config = Config()
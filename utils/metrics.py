@@ -0,0 +1,102 @@
+import threading
+
+_registry = {}
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Process-local monotonic counter, rendered in the prometheus text format."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+        self.lock = threading.Lock()
+        _registry[name] = self
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [(self.name, labels, value) for labels, value in items]
+
+
+class Gauge(Counter):
+    """Process-local value that can go up and down (e.g. queue depth)."""
+
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram:
+    """Process-local histogram with cumulative buckets, e.g. latencies in seconds."""
+
+    type_name = "histogram"
+    default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name: str, documentation: str, buckets=default_buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., sum, count]
+        self.values = {}
+        self.lock = threading.Lock()
+        _registry[name] = self
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            data = self.values.get(key)
+            if data is None:
+                data = self.values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def count(self, **labels):
+        data = self.values.get(tuple(sorted(labels.items())))
+        return data[-1] if data else 0
+
+    def samples(self):
+        with self.lock:
+            items = [(labels, list(data)) for labels, data in self.values.items()]
+        samples = []
+        for labels, data in items:
+            for bound, value in zip(self.buckets, data):
+                samples.append((f"{self.name}_bucket", labels + (("le", bound),), value))
+            samples.append((f"{self.name}_bucket", labels + (("le", "+Inf"),), data[-1]))
+            samples.append((f"{self.name}_sum", labels, data[-2]))
+            samples.append((f"{self.name}_count", labels, data[-1]))
+        return samples
+
+
+def render() -> str:
+    """Render all registered metrics in the prometheus text format."""
+    lines = []
+    for metric in list(_registry.values()):
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,35 +1,116 @@
-import json
+import hmac
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.core.cache import cache
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseForbidden
+from django.urls import reverse
 
-from ecommerce.bot.models import Message
+from ecommerce.bot.catalog import message_catalog
+from ecommerce.bot.services import MessageService
+from ecommerce.telegram.async_telegram import AsyncTelegram
 from ecommerce.telegram.telegram import Telegram
+from utils import json_codec
+from utils.load_env import config as CONFIG
+
+
+def get_request_update(request) -> dict:
+    """Return the telegram update of the request, the body is parsed only once
+    and shared between the middlewares and the webhook views.
+    """
+    update = getattr(request, "update", None)
+    if update is None:
+        try:
+            update = json_codec.loads(request.body or b"{}")
+        except ValueError:
+            update = {}
+        if not isinstance(update, dict):
+            update = {}
+        request.update = update
+    return update
+
+
+class WebhookSecretTokenMiddleware:
+    """Reject the webhook requests without the `WEBHOOK_SECRET_TOKEN` that
+    telegram sends in the `X-Telegram-Bot-Api-Secret-Token` header (registered
+    by `manage.py setwebhook`), before the body is read or parsed.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.secret_token = CONFIG.get("WEBHOOK_SECRET_TOKEN", "").encode()
+        self.webhook_path = None
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def is_rejected(self, request):
+        if not self.secret_token:
+            return False
+
+        if self.webhook_path is None:
+            self.webhook_path = reverse("bot:webhook")
+        if not request.path_info.startswith(self.webhook_path):
+            return False
+
+        token = request.META.get("HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN", "")
+        return not hmac.compare_digest(token.encode(), self.secret_token)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        if self.is_rejected(request):
+            return HttpResponseForbidden()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.is_rejected(request):
+            return HttpResponseForbidden()
+        return await self.get_response(request)
 
 
 class AntiSpamerMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
         self.bot = Telegram()
-        self.anti_spm_err_msg = Message.objects.get(current_step="anti-spam-msg")
+        self.webhook_path = None
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            # Keep the ASGI webhook on the event loop.
+            markcoroutinefunction(self)
+
+    def get_user_id(self, request):
+        """Return the sender of the webhook updates, other routes are skipped."""
+        if self.webhook_path is None:
+            self.webhook_path = reverse("bot:webhook")
+        if not request.path_info.startswith(self.webhook_path):
+            return None
+
+        update = get_request_update(request)
+        message = update.get("message")
+        if not isinstance(message, dict):
+            return None
+        return message.get("from", {}).get("id")
 
     def __call__(self, request):
-        update = request.body.decode()
-        if not update:
-            return self.get_response(request)
+        if self.async_mode:
+            return self.__acall__(request)
 
-        try:
-            update = json.loads(request.body.decode())
-            user_id = update.get("message", {}).get("from", {}).get("id")
-            if not user_id:
-                return self.get_response(request)
-        except Exception:
+        user_id = self.get_user_id(request)
+        if not user_id:
             return self.get_response(request)
 
         key = f"spam_count_{user_id}"
         spam_count = cache.get_or_set(key, 1, timeout=20)
         if spam_count >= 10:
-            self.bot.send_message(chat_id=user_id, text=self.anti_spm_err_msg.text)
+            anti_spm_err_msg = message_catalog.get("anti-spam-msg")
+            self.bot.send_message(chat_id=user_id, text=anti_spm_err_msg.text)
             # Limit user for 15 second if send 10 msg in 20 second.
             cache.set(key, 11, timeout=15)
             return HttpResponse("Bad", status=429)
@@ -37,3 +118,23 @@ class AntiSpamerMiddleware:
             cache.incr(key)
 
         return self.get_response(request)
+
+    async def __acall__(self, request):
+        user_id = self.get_user_id(request)
+        if not user_id:
+            return await self.get_response(request)
+
+        key = f"spam_count_{user_id}"
+        spam_count = await cache.aget_or_set(key, 1, timeout=20)
+        if spam_count >= 10:
+            await MessageService.arefresh()
+            anti_spm_err_msg = message_catalog.get("anti-spam-msg")
+            await AsyncTelegram().send_message(
+                chat_id=user_id, text=anti_spm_err_msg.text
+            )
+            await cache.aset(key, 11, timeout=15)
+            return HttpResponse("Bad", status=429)
+        else:
+            await cache.aincr(key)
+
+        return await self.get_response(request)
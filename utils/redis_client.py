@@ -0,0 +1,16 @@
+import redis
+
+from utils.load_env import config as CONFIG
+
+_connection = None
+
+
+def get_redis() -> redis.Redis:
+    """Return the process-wide redis client used by the bot infrastructure
+    (update queue, locks, counters). The connection pool is shared by all threads.
+    """
+    global _connection
+    if _connection is None:
+        url = CONFIG.get("REDIS_URL", "redis://127.0.0.1:6379/4")
+        _connection = redis.Redis.from_url(url)
+    return _connection